@@ -0,0 +1,215 @@
+"""
+Вывод программы сразу в ast.Module и объект кода; номера строк те же,
+что у текстового вывода (ProgramIR.emit), ошибки разбора — с ID блока.
+"""
+import ast
+import importlib.util
+import marshal
+import os
+from functools import lru_cache
+
+import CodeOptimizer
+import ProgramIR
+from code_generator import CodeGenerator
+
+
+class BlockSyntaxError(ValueError):
+    """Синтаксическая ошибка в тексте блока node_id."""
+
+    def __init__(self, node_id, message):
+        super().__init__(f"Блок {node_id}: синтаксическая ошибка: {message}")
+        self.node_id = node_id
+
+
+# как разбирается текст блока каждого вида
+_MODES = {
+    'stmt':  lambda text: ast.parse(text).body,
+    'expr':  lambda text: ast.parse(text, mode='eval').body,
+    'for':   lambda text: ast.parse(f"for {text}:\n    pass").body[0],
+    'print': lambda text: ast.parse(f"print({text})", mode='eval').body,
+    'input': lambda text: ast.parse(f"{text} = input()").body[0],
+    # то же в режиме быстрого ввода/вывода (ProgramIR.io_forms)
+    'read':  lambda text: ast.parse(f"{text} = _read()").body[0],
+    'write': lambda text: ast.parse(f"print({text}, file=_out)", mode='eval').body,
+}
+
+
+@lru_cache(maxsize=4096)
+def _parse(kind, text):
+    try:
+        return _MODES[kind](text), None
+    except SyntaxError as e:
+        return None, e.msg
+    except (RecursionError, MemoryError, ValueError) as e:
+        # слишком глубокая вложенность, нулевой байт и т. п.
+        return None, str(e) or type(e).__name__
+
+
+def check(kind, text):
+    """Текст ошибки разбора text как kind ('stmt', 'expr', 'for', 'print') или None."""
+    return _parse(kind, text)[1]
+
+
+def _clone(node, lineno, indent):
+    """Копия дерева разбора на строке lineno со сдвигом колонок на indent."""
+    cls = node.__class__
+    new = cls.__new__(cls)
+    for name in node._fields:
+        value = getattr(node, name, None)
+        if value.__class__ is list:
+            value = [_clone(v, lineno, indent) if isinstance(v, ast.AST) else v
+                     for v in value]
+        elif isinstance(value, ast.AST):
+            value = _clone(value, lineno, indent)
+        setattr(new, name, value)
+    if node._attributes:
+        new.lineno = new.end_lineno = lineno
+        new.col_offset = node.col_offset + indent
+        new.end_col_offset = node.end_col_offset + indent
+    return new
+
+
+def _fragment(kind, text, node_id, lineno, indent):
+    tree, error = _parse(kind, text)
+    if error is not None:
+        raise BlockSyntaxError(node_id, error)
+    # дерево из кэша не изменяется: в модуль попадает его копия
+    if tree.__class__ is list:
+        return [_clone(t, lineno, indent) for t in tree]
+    return _clone(tree, lineno, indent)
+
+
+def _at(node, lineno, indent):
+    node.lineno = node.end_lineno = lineno
+    node.col_offset = indent
+    node.end_col_offset = indent
+    return node
+
+
+def build_module(program, source_map=None, fast_io=False):
+    """
+    ast.Module для дерева program, эквивалентный тексту ProgramIR.emit
+    (с теми же source_map и fast_io).
+    """
+    mapping = source_map is not None
+    lead = ProgramIR.prologue(fast_io)
+    if mapping:
+        source_map.extend([None] * (len(lead) + 1))
+    # служебные строки разбираются целиком: они в начале файла, номера верны
+    head = ast.parse('\n'.join(lead)).body
+    input_kind, print_kind = ('read', 'write') if fast_io else ('input', 'print')
+    first = line = len(lead) + 1   # строка 'def main():'
+    main_body = []
+    hollow = []                    # (тело, ID блока) для ACTION без операторов
+    # работа в порядке LIFO: ('block', операторы, номер первого
+    # необработанного, куда добавлять, отступ, владелец pass) или ('else', …)
+    work = [('block', program.body, 0, main_body, 4, program.node_id)]
+    while work:
+        kind, stmts, i, out, indent, owner = work.pop()
+        if kind == 'else':
+            line += 1
+            if mapping:
+                source_map.append(owner)
+            continue
+        if not stmts:
+            line += 1
+            if mapping:
+                source_map.append(owner)
+            out.append(_at(ast.Pass(), line, indent))
+            continue
+        # операторы блока разворачиваются по одному, чтобы вложенные блоки
+        # получили свои строки раньше следующих соседей
+        node = stmts[i]
+        if i + 1 < len(stmts):
+            work.append(('block', stmts, i + 1, out, indent, owner))
+        cls = node.__class__
+        nid = node.node_id
+        if cls is ProgramIR.Input:
+            for v in node.names:
+                line += 1
+                if mapping:
+                    source_map.append(nid)
+                out.append(_fragment(input_kind, v, nid, line, indent))
+            continue
+        line += 1
+        if mapping:
+            source_map.append(nid)
+        if cls is ProgramIR.Action:
+            parsed = _fragment('stmt', node.text, nid, line, indent)
+            if not parsed:
+                # только комментарий: тело может остаться пустым
+                hollow.append((out, nid))
+            out.extend(parsed)
+        elif cls is ProgramIR.Output:
+            call = _fragment(print_kind, node.expr, nid, line, indent)
+            out.append(_at(ast.Expr(call), line, indent))
+        elif cls is ProgramIR.If:
+            test = _fragment('expr', node.cond, nid, line, indent + 3)
+            stmt = _at(ast.If(test=test, body=[], orelse=[]), line, indent)
+            out.append(stmt)
+            if node.orelse:
+                work.append(('block', node.orelse, 0, stmt.orelse, indent + 4, nid))
+                work.append(('else', None, 0, None, indent, nid))
+            work.append(('block', node.body, 0, stmt.body, indent + 4, nid))
+        elif node.kind == 'while':
+            test = _fragment('expr', node.header, nid, line, indent + 6)
+            stmt = _at(ast.While(test=test, body=[], orelse=[]), line, indent)
+            out.append(stmt)
+            work.append(('block', node.body, 0, stmt.body, indent + 4, nid))
+        else:
+            loop = _fragment('for', node.header, nid, line, indent)
+            loop.body = []
+            out.append(loop)
+            work.append(('block', node.body, 0, loop.body, indent + 4, nid))
+    for body, nid in hollow:
+        if not body:
+            raise BlockSyntaxError(nid, "в теле нет операторов (только комментарий)")
+    main = ast.FunctionDef(
+        name='main', args=ast.arguments(posonlyargs=[], args=[], kwonlyargs=[],
+                                        kw_defaults=[], defaults=[]),
+        body=main_body, decorator_list=[], returns=None, type_comment=None,
+        lineno=first, col_offset=0, end_lineno=line, end_col_offset=0)
+    # пустая строка и запуск main(), как в текстовом выводе
+    tail = ProgramIR.trailer(fast_io)
+    if mapping:
+        source_map.extend([None] * len(tail))
+    guard = ast.parse('\n'.join(tail[1:])).body[0]
+    ast.increment_lineno(guard, line + 1)
+    return ast.Module(body=head + [main, guard], type_ignores=[])
+
+
+def compile_program(program, filename='<diagram>', source_map=None, fast_io=False):
+    """Объект кода для дерева program; ошибки компиляции — BlockSyntaxError."""
+    if source_map is None:
+        source_map = []
+    module = build_module(program, source_map, fast_io)
+    try:
+        return compile(module, filename, 'exec')
+    except SyntaxError as e:
+        # например, break вне цикла: разбор блока прошёл, компиляция — нет
+        node_id = source_map[e.lineno - 1] if e.lineno and e.lineno <= len(source_map) else None
+        raise BlockSyntaxError(node_id, e.msg) from None
+
+
+def compile_graph(graph, optimize=False, filename='<diagram>', source_map=None,
+                  fast_io=False):
+    """Объект кода программы по графу (с CodeOptimizer при optimize)."""
+    program = CodeGenerator.build_ir(graph)
+    if optimize:
+        program = CodeOptimizer.optimize(program)
+    return compile_program(program, filename, source_map, fast_io)
+
+
+def write_pyc(code, path):
+    """
+    Записывает объект кода в .pyc без исходника (запускается как
+    python файл.pyc тем же интерпретатором).
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(importlib.util.MAGIC_NUMBER)
+        # флаги 0 — проверка по времени; время и размер исходника неизвестны
+        f.write(bytes(12))
+        marshal.dump(code, f)
+    os.replace(tmp, path)
@@ -0,0 +1,196 @@
+"""
+Профилирование программы по блокам схемы: она выполняется в отдельном
+процессе под трассировщиком, счётчики строк сводятся к блокам.
+"""
+import json
+import marshal
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+import AstBackend
+from GraphModel import GraphModel
+
+# hits — ID блока -> число выполнений, time — ID блока -> секунды;
+# error — почему прогон остановлен (превышено время) или None
+Profile = namedtuple('Profile', 'hits time stdout stderr returncode error',
+                     defaults=(None,))
+
+# дочерний процесс: объект кода из marshal; для строк программы — число
+# выполнений и время до следующего события (вместе с вызванными функциями)
+_DRIVER = r'''
+import json, sys, time
+import marshal
+with open(sys.argv[1], 'rb') as f:
+    code = marshal.load(f)
+out, path = sys.argv[2], code.co_filename
+hits, spent = {}, {}
+clock = time.perf_counter
+last = [0, 0.0]
+
+def local(frame, event, arg):
+    if event == 'line' or event == 'return':
+        now = clock()
+        if last[0]:
+            spent[last[0]] = spent.get(last[0], 0.0) + now - last[1]
+        if event == 'line':
+            n = frame.f_lineno
+            hits[n] = hits.get(n, 0) + 1
+            last[0] = n
+        else:
+            # дальше время снова идёт строке вызвавшего кадра
+            back = frame.f_back
+            last[0] = back.f_lineno if back and back.f_code.co_filename == path else 0
+        # время самого трассировщика не приписывается строке
+        last[1] = clock()
+    return local
+
+def call(frame, event, arg):
+    return local if frame.f_code.co_filename == path else None
+
+sys.settrace(call)
+try:
+    exec(code, {'__name__': '__main__'})
+finally:
+    sys.settrace(None)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump({'hits': hits, 'time': spent}, f)
+'''
+
+
+def by_block(line_hits, line_time, source_map):
+    """
+    Сводит счётчики строк (номера с 1) к блокам. Число выполнений блока —
+    по его первой строке (у INPUT их несколько), время — сумма по строкам.
+    """
+    hits, spent, first = {}, {}, {}
+    for lineno, node_id in enumerate(source_map, 1):
+        if node_id is None:
+            continue
+        first.setdefault(node_id, lineno)
+        spent[node_id] = spent.get(node_id, 0.0) + line_time.get(lineno, 0.0)
+    for node_id, lineno in first.items():
+        hits[node_id] = line_hits.get(lineno, 0)
+    return hits, spent
+
+
+class ProfileRun:
+    """
+    Незавершённый прогон профилировщика. poll() не блокирует: его можно
+    вызывать из root.after, пока он не вернёт Profile. Прогон дольше
+    timeout секунд останавливается; Profile тогда содержит error и
+    счётчики, накопленные к остановке.
+    """
+    STOP_GRACE = 1.0    # с: сколько ждать записи счётчиков после прерывания
+
+    def __init__(self, code, source_map, stdin='', timeout=None):
+        self.source_map = source_map
+        self.timeout = timeout
+        self.__deadline = time.monotonic() + timeout if timeout is not None else None
+        self.__error = None
+        self.__dir = tempfile.TemporaryDirectory(prefix='rgz-profile-')
+        d = self.__dir.name
+        self.__result = os.path.join(d, 'profile.json')
+        program = os.path.join(d, 'program.bin')
+        with open(program, 'wb') as f:
+            marshal.dump(code, f)
+        # stdin/stdout через файлы: большой ввод и вывод не упираются в буфер канала
+        with open(os.path.join(d, 'stdin.txt'), 'w', encoding='utf-8') as f:
+            f.write(stdin)
+        self.__files = [open(os.path.join(d, name), mode, encoding='utf-8')
+                        for name, mode in (('stdin.txt', 'r'), ('stdout.txt', 'w+'),
+                                           ('stderr.txt', 'w+'))]
+        self.__proc = subprocess.Popen(
+            [sys.executable, '-c', _DRIVER, program, self.__result],
+            stdin=self.__files[0], stdout=self.__files[1], stderr=self.__files[2], cwd=d)
+
+    def poll(self):
+        """Profile, если программа завершилась или время вышло, иначе None."""
+        if self.__proc.poll() is None:
+            if self.__deadline is None or time.monotonic() < self.__deadline:
+                return None
+            self.__stop()
+        return self.__collect()
+
+    def wait(self):
+        try:
+            self.__proc.wait(self.timeout)
+        except subprocess.TimeoutExpired:
+            self.__stop()
+        return self.__collect()
+
+    def cancel(self):
+        if self.__proc.poll() is None:
+            self.__proc.kill()
+            self.__proc.wait()
+        self.__cleanup()
+
+    def __stop(self):
+        self.__error = f"Программа не завершилась за {self.timeout:g} с и остановлена"
+        if os.name == 'posix':
+            # прерывание: драйвер успевает записать счётчики — видно, где программа крутилась
+            self.__proc.send_signal(signal.SIGINT)
+            try:
+                self.__proc.wait(self.STOP_GRACE)
+                return
+            except subprocess.TimeoutExpired:
+                pass
+        self.__proc.kill()
+        self.__proc.wait()
+
+    def __collect(self):
+        try:
+            line_hits, line_time = {}, {}
+            data = None
+            if os.path.exists(self.__result):
+                with open(self.__result, encoding='utf-8') as f:
+                    try:
+                        data = json.load(f)
+                    except ValueError:
+                        pass    # драйвер убит во время записи — счётчиков нет
+            if data is not None:
+                line_hits = {int(k): v for k, v in data['hits'].items()}
+                line_time = {int(k): v for k, v in data['time'].items()}
+            out, err = self.__files[1], self.__files[2]
+            out.seek(0)
+            err.seek(0)
+            hits, spent = by_block(line_hits, line_time, self.source_map)
+            return Profile(hits, spent, out.read(), err.read(), self.__proc.returncode,
+                           self.__error)
+        finally:
+            self.__cleanup()
+
+    def __cleanup(self):
+        for f in self.__files:
+            f.close()
+        self.__files = []
+        self.__dir.cleanup()
+
+
+def start(models, stdin='', timeout=None, optimize=False, fast_io=False):
+    """
+    Компилирует программу по копии моделей (AstBackend) и запускает прогон.
+    Ошибки схемы и синтаксиса блоков — ValueError.
+    """
+    source_map = []
+    code = AstBackend.compile_graph(GraphModel.snapshot(models), optimize,
+                                   '<diagram>', source_map, fast_io)
+    return ProfileRun(code, source_map, stdin, timeout)
+
+
+def profile(lines, source_map, stdin='', timeout=None):
+    """Выполняет программу из строк lines и возвращает Profile (блокирующий вызов)."""
+    code = compile('\n'.join(lines), '<diagram>', 'exec')
+    return ProfileRun(code, source_map, stdin, timeout).wait()
+
+
+def heat_color(share):
+    """Цвет заливки для доли времени share (0…1): от светло‑жёлтого к красному."""
+    share = min(max(share, 0.0), 1.0)
+    g = int(250 - 190 * share)
+    b = int(200 - 160 * share)
+    return f'#ff{g:02x}{b:02x}'
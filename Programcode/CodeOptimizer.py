@@ -0,0 +1,327 @@
+"""
+Оптимизация дерева программы (ProgramIR) перед выводом: свёртка константных
+условий, удаление мёртвых ветвей и лишних pass, вынос инвариантов из циклов.
+"""
+import ast
+from collections import Counter
+
+from ProgramIR import Action, Input, Output, If, Loop, blocks
+
+_UNKNOWN = object()
+
+# текст блока не разбирается: синтаксис, слишком глубокая вложенность и т. п.
+_PARSE_ERRORS = (SyntaxError, RecursionError, MemoryError, ValueError)
+
+# узлы выражения, которое можно вычислить при генерации
+_FOLDABLE = (ast.Expression, ast.Constant, ast.UnaryOp, ast.BinOp, ast.BoolOp,
+             ast.Compare, ast.Not, ast.USub, ast.UAdd, ast.Invert,
+             ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod,
+             ast.And, ast.Or, ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+# узлы выражения без побочных эффектов, значение которого зависит
+# только от прочитанных имён
+_INVARIANT = _FOLDABLE + (ast.Name, ast.Load, ast.Tuple, ast.IfExp,
+                          ast.Is, ast.IsNot, ast.In, ast.NotIn, ast.Pow)
+
+# … и которое к тому же не может бросить исключение
+_SAFE = (ast.Expression, ast.Constant, ast.Tuple, ast.Load, ast.BoolOp, ast.And,
+         ast.Or, ast.UnaryOp, ast.Not, ast.Compare, ast.Is, ast.IsNot)
+
+
+def _parse_expr(text):
+    try:
+        return ast.parse(text, mode='eval')
+    except _PARSE_ERRORS:
+        return None
+
+
+def _only(tree, allowed):
+    return all(isinstance(n, allowed) for n in ast.walk(tree))
+
+
+def const_value(text):
+    """Значение выражения из числовых и логических констант или _UNKNOWN."""
+    tree = _parse_expr(text)
+    if tree is None or not _only(tree, _FOLDABLE):
+        return _UNKNOWN
+    # только числа и логические значения: без строк нет и "a" * 10**9
+    for n in ast.walk(tree):
+        if isinstance(n, ast.Constant) and not isinstance(n.value, (int, float, bool)):
+            return _UNKNOWN
+    try:
+        return eval(compile(tree, '<const>', 'eval'), {'__builtins__': {}})
+    except Exception:
+        return _UNKNOWN
+
+
+def _mutates(tree):
+    """
+    Может ли код изменить объект на месте: вызов, запись в индекс или
+    атрибут, составное присваивание (x += … у списка).
+    """
+    for n in ast.walk(tree):
+        if isinstance(n, (ast.Call, ast.AugAssign)):
+            return True
+        if isinstance(n, (ast.Subscript, ast.Attribute)) and not isinstance(n.ctx, ast.Load):
+            return True
+    return False
+
+
+def _for_parts(header):
+    """(цель, итерируемое) заголовка for или None."""
+    try:
+        loop = ast.parse(f"for {header}:\n    pass").body[0]
+    except _PARSE_ERRORS:
+        return None
+    return loop.target, loop.iter
+
+
+def _literal_size(node):
+    """Длина итерируемого литерала (кортеж, список, строка) или None."""
+    if isinstance(node, (ast.Tuple, ast.List, ast.Set)):
+        if any(isinstance(e, ast.Starred) for e in node.elts):
+            return None
+        return len(node.elts)
+    if isinstance(node, ast.Dict):
+        return None if None in node.keys else len(node.keys)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (str, bytes)):
+        return len(node.value)
+    return None
+
+
+class _Names:
+    """
+    Имена, которые читают и записывают операторы дерева. Разбор каждого
+    текста кэшируется; ok=False, если хоть один текст не разобрался или
+    в программе есть global/nonlocal (тогда вынос небезопасен).
+    """
+
+    def __init__(self, program):
+        self.ok = True
+        self.cache = {}
+        self.trees = {}
+        self.total_reads = Counter()
+        self.total_writes = Counter()
+        for block in blocks(program):
+            for node in block:
+                reads, writes = self.own(node)
+                self.total_reads.update(reads)
+                self.total_writes.update(writes)
+
+    def own(self, node):
+        """Чтения и записи самого оператора (без вложенных блоков)."""
+        got = self.cache.get(node)
+        if got is not None:
+            return got
+        cls = node.__class__
+        reads, writes = Counter(), Counter()
+        tree = None
+        if cls is Input:
+            writes.update(node.names)
+        elif cls is Output:
+            tree = _parse_expr(node.expr)
+        elif cls is If:
+            tree = _parse_expr(node.cond)
+        elif cls is Loop and node.kind == 'while':
+            tree = _parse_expr(node.header)
+        elif cls is Loop:
+            parts = _for_parts(node.header)
+            tree = ast.Module(body=[ast.Expr(p) for p in parts], type_ignores=[]) if parts else None
+        else:
+            try:
+                tree = ast.parse(node.text)
+            except _PARSE_ERRORS:
+                tree = None
+        self.trees[node] = tree
+        if cls is not Input:
+            if tree is None:
+                self.ok = False
+            else:
+                for n in ast.walk(tree):
+                    if isinstance(n, (ast.Global, ast.Nonlocal)):
+                        self.ok = False
+                    elif isinstance(n, ast.Name):
+                        (reads if isinstance(n.ctx, ast.Load) else writes)[n.id] += 1
+        got = self.cache[node] = (reads, writes)
+        return got
+
+    def mutates(self, node):
+        """
+        Может ли оператор вместе с вложенными изменить объект на месте
+        (вызов, x[i] = …, x.a = …, x += …; см. _mutates). Заголовок
+        for по range(…) с непереопределённым range проверяется по аргументам.
+        """
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            self.own(n)
+            cls = n.__class__
+            tree = self.trees[n]
+            if cls is Input:
+                pass
+            elif tree is None:
+                return True
+            elif cls is Loop and n.kind == 'for':
+                target, it = (e.value for e in tree.body)
+                if (isinstance(it, ast.Call) and isinstance(it.func, ast.Name)
+                        and it.func.id == 'range' and not self.total_writes['range']):
+                    parts = [target, *it.args, *(k.value for k in it.keywords)]
+                else:
+                    parts = [target, it]
+                if any(_mutates(p) for p in parts):
+                    return True
+            elif _mutates(tree):
+                return True
+            if cls is If:
+                stack.extend(n.body)
+                stack.extend(n.orelse)
+            elif cls is Loop:
+                stack.extend(n.body)
+        return False
+
+    def deep(self, node):
+        """Чтения и записи оператора вместе со всеми вложенными."""
+        reads, writes = Counter(), Counter()
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            r, w = self.own(n)
+            reads.update(r)
+            writes.update(w)
+            if n.__class__ is If:
+                stack.extend(n.body)
+                stack.extend(n.orelse)
+            elif n.__class__ is Loop:
+                stack.extend(n.body)
+        return reads, writes
+
+
+def _assignment(node):
+    """(цель, выражение) для ACTION вида name = expr, иначе None."""
+    if node.__class__ is not Action:
+        return None
+    try:
+        tree = ast.parse(node.text)
+    except _PARSE_ERRORS:
+        return None
+    if len(tree.body) != 1 or not isinstance(tree.body[0], ast.Assign):
+        return None
+    stmt = tree.body[0]
+    if len(stmt.targets) != 1 or not isinstance(stmt.targets[0], ast.Name):
+        return None
+    return stmt.targets[0].id, stmt.value
+
+
+def _runs_once(loop, names):
+    """Гарантированно ли тело цикла выполняется хотя бы раз."""
+    if loop.kind == 'while':
+        value = const_value(loop.header)
+        return value is not _UNKNOWN and bool(value)
+    parts = _for_parts(loop.header)
+    if parts is None:
+        return False
+    it = parts[1]
+    size = _literal_size(it)
+    if size is not None:
+        return size > 0
+    # range(k) / range(a, b) с константами, если range не переопределён
+    if (isinstance(it, ast.Call) and isinstance(it.func, ast.Name) and it.func.id == 'range'
+            and not names.total_writes['range'] and not it.keywords
+            and 1 <= len(it.args) <= 2
+            and all(isinstance(a, ast.Constant) and type(a.value) is int for a in it.args)):
+        bounds = [a.value for a in it.args]
+        lo, hi = (0, bounds[0]) if len(bounds) == 1 else bounds
+        return hi > lo
+    return False
+
+
+def _hoist(loop, names):
+    """
+    Снимает с верхнего уровня тела loop присваивания name = expr, которые
+    можно выполнить один раз перед циклом, и возвращает их. Условия:
+
+    * expr без вызовов, обращений к атрибутам и индексам и без создания
+      изменяемых объектов, и ни одно прочитанное им имя в цикле не
+      записывается; если в цикле есть вызовы или запись в индекс или
+      атрибут, объект под именем может измениться без присваивания
+      (в том числе через другое имя) — тогда expr только из констант;
+    * name в цикле записывается только этим оператором и не читается
+      ни заголовком, ни операторами до него;
+    * либо expr не может бросить исключение, а name не читается вне
+      цикла (тогда не важно, выполнится ли тело хоть раз),
+      либо тело выполняется хотя бы раз, а до оператора нет других
+      (исключение возникнет в той же точке, что и раньше).
+    """
+    if not names.ok:
+        return []
+    head_reads, head_writes = names.own(loop)
+    loop_reads, loop_writes = names.deep(loop)
+    once = _runs_once(loop, names)
+    mutating = names.mutates(loop)
+    before = set(head_reads) | set(head_writes)
+    hoisted, kept = [], []
+    for node in loop.body:
+        assign = _assignment(node)
+        ok = False
+        if assign is not None:
+            target, expr = assign
+            expr_names = {n.id for n in ast.walk(expr) if isinstance(n, ast.Name)}
+            if (_only(expr, _INVARIANT) and not expr_names & set(loop_writes)
+                    and not (mutating and expr_names)
+                    and loop_writes[target] == 1 and target not in before):
+                if _only(expr, _SAFE):
+                    # чтения вне цикла — все, кроме сделанных внутри него
+                    ok = names.total_reads[target] == loop_reads[target]
+                if not ok:
+                    ok = once and not kept
+        if ok:
+            hoisted.append(node)
+        else:
+            kept.append(node)
+            before.update(names.deep(node)[0])
+    loop.body[:] = kept
+    return hoisted
+
+
+def _fold_block(block, names):
+    """Свёртка условий, мёртвые ветви, лишние pass и вынос для одного блока."""
+    out = []
+    for node in block:
+        cls = node.__class__
+        if cls is Action and node.text == 'pass':
+            continue
+        if cls is If:
+            value = const_value(node.cond)
+            if value is not _UNKNOWN:
+                out.extend(node.body if value else node.orelse)
+                continue
+            if not node.body and node.orelse:
+                node.cond, node.body, node.orelse = f"not ({node.cond})", node.orelse, []
+            elif not node.body:
+                # ветвей нет, но условие может иметь побочные эффекты
+                out.append(Action(node.cond, node.node_id))
+                continue
+        elif cls is Loop:
+            if node.kind == 'while':
+                value = const_value(node.header)
+                if value is not _UNKNOWN:
+                    if not value:
+                        continue
+                    node.header = 'True'
+            else:
+                parts = _for_parts(node.header)
+                if parts is not None and _literal_size(parts[1]) == 0:
+                    continue
+            out.extend(_hoist(node, names))
+        out.append(node)
+    block[:] = out
+
+
+def optimize(program):
+    """Оптимизирует дерево program на месте и возвращает его."""
+    names = _Names(program)
+    # вложенные блоки раньше объемлющих: вынесенное из внутреннего цикла
+    # может быть вынесено и из внешнего
+    for block in reversed(blocks(program)):
+        _fold_block(block, names)
+    return program
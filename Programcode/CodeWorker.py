@@ -0,0 +1,97 @@
+import queue
+import threading
+from GraphModel import GraphModel
+from code_generator import CodeGenerator
+
+
+class CodeWorker:
+    """
+    Генерация кода в фоновом потоке.
+    submit() снимает копию моделей (GraphModel.snapshot) в потоке окна и
+    ставит её в очередь; рабочий поток генерирует по копии, поэтому схему
+    можно править, пока идёт генерация. Новый submit() или cancel()
+    отменяет незавершённый прогон — его результат не будет доставлен.
+    Результаты возвращаются в mainloop через очередь, которую опрашивает
+    root.after, и передаются в callback(lines, error).
+    options передаются в CodeGenerator.generate_code_iter (optimize и т. п.).
+    """
+    POLL_MS = 30
+
+    def __init__(self, root, cache=None):
+        self.root = root
+        self.cache = cache
+        self.__jobs = queue.Queue()
+        self.__results = queue.Queue()
+        self.__current = None      # Event отмены последнего прогона
+        self.__poll = None
+        self.__thread = threading.Thread(target=self.__run, name='codegen', daemon=True)
+        self.__thread.start()
+
+    @property
+    def busy(self):
+        return self.__current is not None
+
+    def submit(self, models, callback, **options):
+        """Запускает генерацию по копии models; предыдущий прогон отменяется."""
+        self.cancel()
+        cancel = threading.Event()
+        self.__current = cancel
+        # сбросы кэша после снимка делают его устаревшим (RegionCache.acquire)
+        epoch = self.cache.epoch if self.cache is not None else None
+        self.__jobs.put((GraphModel.snapshot(models), epoch, cancel, callback, options))
+        if self.__poll is None:
+            self.__poll = self.root.after(self.POLL_MS, self.__poll_results)
+
+    def cancel(self):
+        if self.__current is not None:
+            self.__current.set()
+            self.__current = None
+
+    def close(self):
+        self.cancel()
+        self.__jobs.put(None)
+        self.__thread.join()
+
+    def __run(self):
+        while True:
+            job = self.__jobs.get()
+            if job is None:
+                return
+            graph, epoch, cancel, callback, options = job
+            if cancel.is_set():
+                continue
+            lines, error, gen = [], None, None
+            try:
+                gen = CodeGenerator.generate_code_iter(graph, self.cache, epoch=epoch,
+                                                         **options)
+                for line in gen:
+                    if cancel.is_set():
+                        break
+                    lines.append(line)
+            except Exception as e:
+                # любая ошибка доставляется как результат: поток должен
+                # пережить её, иначе busy не снимется и генераций больше не будет
+                error = e
+            finally:
+                # закрытие генератора освобождает кэш и при отмене
+                if gen is not None:
+                    gen.close()
+            # отменённые результаты отбрасывает __poll_results
+            self.__results.put((cancel, callback, lines, error))
+
+    def __poll_results(self):
+        self.__poll = None
+        while True:
+            try:
+                cancel, callback, lines, error = self.__results.get_nowait()
+            except queue.Empty:
+                break
+            if cancel.is_set() or cancel is not self.__current:
+                continue
+            self.__current = None
+            if error is not None:
+                callback(None, error)
+            else:
+                callback(lines, None)
+        if self.__current is not None:
+            self.__poll = self.root.after(self.POLL_MS, self.__poll_results)
@@ -1,4 +1,7 @@
 
+import weakref
+
+
 class ConnectionUI:
     """
     Гибкая ломаная линия со сгибами, которые можно:
@@ -6,21 +9,38 @@ class ConnectionUI:
       - удалить правым кликом по любому сгибу,
       - перетаскивать сгибы за микро-точки.
     При перемещении узлов концы линии подтягиваются к портам, внутренние сгибы сохраняются.
+    Связь без ручных сгибов (routed) прокладывается автоматически в обход
+    блоков (EdgeRouter); первый добавленный сгиб делает маршрут ручным,
+    удаление последнего — снова автоматическим.
     """
     __HANDLE_SIZE = 3
     __LOOP_DX = 140
     __LOOP_DOWN = 40
     __ENTRY_OFFSET = -10
 
+    # счётчик для уникальных тегов связей на холсте
+    __seq = 0
+    # тег связи -> ConnectionUI: события приходят через привязки к общим тегам
+    _by_tag = weakref.WeakValueDictionary()
+
     def __init__(self, canvas, src_ui, sp, dst_ui, dp, app, points=None):
+        ConnectionUI.__seq += 1
+        self.tag = f'conn{ConnectionUI.__seq}'   # общий тег всех элементов связи
+        ConnectionUI._by_tag[self.tag] = self
         self.canvas = canvas
         self.app = app
         self.src_ui, self.sp = src_ui, sp
         self.dst_ui, self.dp = dst_ui, dp
         self.__init_loop_flag()
+        self.routed = points is None
+        # до прокладки маршрута (EdgeRouter) — простое колено
         self.points = points if points is not None else self.__calc_points()
+        # графика создаётся, только пока связь рядом с видимой областью
+        self.materialized = False
+        self.handles = []
         self.__register_connection()
-        self.__draw_all()
+        if app.viewport.contains(self.bbox()):
+            app.viewport.show_connection(self)
 
     def __init_loop_flag(self):
         self.is_loop = (
@@ -33,6 +53,12 @@ class ConnectionUI:
         self.app.diagram_state.add_connection(self)
         self.sp.connection = self.dp
         self.dp.connection = self.sp
+        self.app.invalidate_code(self.src_ui.model, self.dst_ui.model, structure=True)
+        self.app.router.invalidate(self)
+
+    def default_points(self):
+        """Маршрут по умолчанию: колено или петля к входу in_back."""
+        return self.__calc_points()
 
     def __calc_points(self):
         x0, y0 = self.src_ui.port_position(self.sp)
@@ -53,86 +79,204 @@ class ConnectionUI:
     def __flat(self):
         return [c for pt in self.points for c in pt]
 
-    def __draw_all(self):
-        self.__clear_previous_drawing()
-        self.line_id = self.canvas.create_line(*self.__flat(), arrow='last', width=2)
-        self.hit_id = self.canvas.create_line(*self.__flat(), width=12, fill='')
-        self.canvas.tag_bind(self.hit_id, '<Double-1>', self.on_line_double_click)
-        self.__create_handles()
+    def bbox(self):
+        xs = [p[0] for p in self.points]
+        ys = [p[1] for p in self.points]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def materialize(self):
+        """Создаёт линию, зону попадания и ручки сгибов."""
+        if not self.materialized:
+            if self.routed:
+                self.app.router.ensure(self)
+            self.materialized = True
+            self.__draw_items()
+
+    def dematerialize(self):
+        """Удаляет графику; точки ломаной сохраняются."""
+        if self.materialized:
+            self.materialized = False
+            self.__clear_previous_drawing()
+
+    @classmethod
+    def bind_canvas(cls, canvas):
+        """
+        Привязывает события связей к общим тегам — один раз на холст.
+        Номер сгиба определяется по ручке под курсором в момент события,
+        поэтому добавление и удаление сгибов не требует перепривязки.
+        """
+        def owner():
+            for tag in canvas.gettags('current'):
+                conn = cls._by_tag.get(tag)
+                if conn is not None:
+                    return conn
+            return None
+
+        def on_line(event):
+            conn = owner()
+            if conn is not None:
+                conn.on_line_double_click(event)
+
+        def on_handle(name):
+            def dispatch(event):
+                conn = owner()
+                if conn is not None:
+                    idx = conn.handles.index(canvas.find_withtag('current')[0]) + 1
+                    getattr(conn, name)(event, idx)
+            return dispatch
+
+        canvas.tag_bind('conn_hit', '<Double-1>', on_line)
+        canvas.tag_bind('conn_handle', '<B1-Motion>', on_handle('on_handle_drag'))
+        canvas.tag_bind('conn_handle', '<Button-3>', on_handle('on_handle_right_click'))
+        canvas.tag_bind('conn_handle', '<ButtonRelease-1>', on_handle('on_handle_release'))
+
+    def __draw_items(self):
+        self.line_id = self.canvas.create_line(*self.__flat(), arrow='last', width=2, tags=self.tag)
+        self.hit_id = self.canvas.create_line(*self.__flat(), width=12, fill='',
+                                              tags=(self.tag, 'conn_hit'))
+        # у автоматического маршрута ручек нет — сгибы не ручные
+        self.handles = [] if self.routed else [self.__create_handle(self.points[idx])
+                                               for idx in range(1, len(self.points) - 1)]
 
     def __clear_previous_drawing(self):
-        for attr in ('line_id', 'hit_id'):
-            if hasattr(self, attr):
-                self.canvas.delete(getattr(self, attr))
-        if hasattr(self, 'handles'):
-            for h in self.handles:
-                self.canvas.delete(h)
-
-    def __create_handles(self):
+        self.canvas.delete(self.tag)
         self.handles = []
-        for idx in range(1, len(self.points) - 1):
-            x, y = self.points[idx]
-            h = self.canvas.create_oval(
+
+    def __create_handle(self, point):
+        x, y = point
+        return self.canvas.create_oval(
+            x - self.__HANDLE_SIZE, y - self.__HANDLE_SIZE,
+            x + self.__HANDLE_SIZE, y + self.__HANDLE_SIZE,
+            fill='gray', outline='', tags=(self.tag, 'conn_handle')
+        )
+
+    def __update_line(self):
+        flat = self.__flat()
+        self.canvas.coords(self.line_id, *flat)
+        self.canvas.coords(self.hit_id, *flat)
+
+    def __key(self):
+        # связь однозначно задаётся выходным портом
+        return self.src_ui.model.id, self.sp.name
+
+    def set_route(self, points):
+        """Заменяет автоматический маршрут (в историю не записывается)."""
+        self.points = points
+        self.app.diagram_state.update_connection(self)
+        if self.materialized:
+            self.__update_line()
+
+    def insert_bend(self, idx, point):
+        """Добавляет сгиб: создаётся одна ручка, линия меняет координаты."""
+        if self.routed:
+            # первый ручной сгиб заменяет автоматический маршрут
+            self.routed = False
+            self.app.router.dirty.discard(self)
+            self.points = [self.points[0], self.points[-1]]
+            idx = 1
+        self.points.insert(idx, point)
+        if self.materialized:
+            self.handles.insert(idx - 1, self.__create_handle(point))
+            self.__update_line()
+        self.app.diagram_state.update_connection(self)
+        self.app.history.record(('bend_add', *self.__key(), idx, point))
+
+    def remove_bend(self, idx):
+        """Удаляет сгиб вместе с его ручкой."""
+        point = self.points.pop(idx)
+        if self.materialized:
+            self.canvas.delete(self.handles.pop(idx - 1))
+            self.__update_line()
+        self.app.diagram_state.update_connection(self)
+        if len(self.points) == 2:
+            # ручных сгибов не осталось — маршрут снова автоматический
+            self.routed = True
+            self.app.router.invalidate(self)
+            if self.materialized:
+                self.app.router.ensure(self)
+        self.app.history.record(('bend_del', *self.__key(), idx, point))
+
+    def move_bend(self, idx, point):
+        """Переносит сгиб idx в точку point."""
+        old = self.points[idx]
+        x, y = self.points[idx] = point
+        if self.materialized:
+            self.__update_line()
+            self.canvas.coords(
+                self.handles[idx - 1],
                 x - self.__HANDLE_SIZE, y - self.__HANDLE_SIZE,
-                x + self.__HANDLE_SIZE, y + self.__HANDLE_SIZE,
-                fill='gray', outline=''  
+                x + self.__HANDLE_SIZE, y + self.__HANDLE_SIZE
             )
-            self.canvas.tag_bind(h, '<B1-Motion>', lambda e, i=idx: self.on_handle_drag(e, i))
-            self.canvas.tag_bind(h, '<Button-3>', lambda e, i=idx: self.on_handle_right_click(e, i))
-            self.handles.append(h)
+        self.app.diagram_state.update_connection(self)
+        self.app.history.record(('bend_move', *self.__key(), idx, old, point), coalesce=True)
 
     def on_handle_drag(self, event, idx):
-        x = self.canvas.canvasx(event.x)
-        y = self.canvas.canvasy(event.y)
-        self.points[idx] = (x, y)
-        self.canvas.coords(self.line_id, *self.__flat())
-        self.canvas.coords(self.hit_id, *self.__flat())
-        h = self.handles[idx - 1]
-        self.canvas.coords(
-            h,
-            x - self.__HANDLE_SIZE, y - self.__HANDLE_SIZE,
-            x + self.__HANDLE_SIZE, y + self.__HANDLE_SIZE
-        )
+        self.move_bend(idx, (self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)))
+
+    def on_handle_release(self, event, idx):
+        self.app.history.seal()
 
     def on_handle_right_click(self, event, idx):
         if 0 < idx < len(self.points) - 1:
-            self.points.pop(idx)
-            self.__draw_all()
+            self.remove_bend(idx)
 
     def on_line_double_click(self, event):
-        x = self.canvas.canvasx(event.x)
-        y = self.canvas.canvasy(event.y)
+        self.add_bend_near((self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)))
+
+    def add_bend_near(self, point):
+        """
+        Добавляет сгиб point на ближайший отрезок. Автоматический маршрут
+        сначала становится ручным: его сгибы сохраняются, и вся правка
+        отменяется одной записью — вместе с возвратом к автоматическому.
+        """
+        with self.app.history.transaction():
+            if self.routed:
+                self.app.router.ensure(self)
+                for i, bend in enumerate(self.points[1:-1], 1):
+                    self.insert_bend(i, bend)
+            self.__insert_nearest(point)
+
+    def __insert_nearest(self, point):
+        if self.routed:
+            # у маршрута нет сгибов (прямой отрезок)
+            self.insert_bend(1, point)
+            return
+        x, y = point
         best_i, best_d = 0, float('inf')
         for i in range(len(self.points) - 1):
             x0, y0 = self.points[i]
             x1, y1 = self.points[i + 1]
-            mx, my = (x0 + x1) / 2, (y0 + y1) / 2
-            d = (mx - x)**2 + (my - y)**2
+            # расстояние до отрезка (проекция точки, зажатая в его концы)
+            dx, dy = x1 - x0, y1 - y0
+            t = ((x - x0) * dx + (y - y0) * dy) / (dx * dx + dy * dy) if dx or dy else 0.0
+            t = min(max(t, 0.0), 1.0)
+            d = (x0 + t * dx - x)**2 + (y0 + t * dy - y)**2
             if d < best_d:
                 best_d, best_i = d, i
-        self.points.insert(best_i + 1, (x, y))
-        self.__draw_all()
+        self.insert_bend(best_i + 1, (x, y))
 
     def refresh_endpoints(self):
+        if self.routed:
+            self.app.router.invalidate(self)
+            if not self.materialized:
+                # маршрут проложится при показе; рамке хватает колена
+                self.points = self.__calc_points()
+                self.app.diagram_state.update_connection(self)
+                return
         x0, y0 = self.src_ui.port_position(self.sp)
         xn, yn = self.dst_ui.port_position(self.dp)
         self.points[0] = (x0, y0)
         self.points[-1] = (xn, yn)
-        self.canvas.coords(self.line_id, *self.__flat())
-        self.canvas.coords(self.hit_id, *self.__flat())
-        for idx, h in enumerate(self.handles, start=1):
-            px, py = self.points[idx]
-            self.canvas.coords(
-                h,
-                px - self.__HANDLE_SIZE, py - self.__HANDLE_SIZE,
-                px + self.__HANDLE_SIZE, py + self.__HANDLE_SIZE
-            )
+        self.app.diagram_state.update_connection(self)
+        if not self.materialized:
+            return
+        # сдвигаются только концы — маркеры промежуточных точек на месте
+        self.__update_line()
 
     def destroy(self):
-        self.canvas.delete(self.line_id)
-        self.canvas.delete(self.hit_id)
-        for h in self.handles:
-            self.canvas.delete(h)
+        self.app.viewport.forget(self)
+        self.dematerialize()
         self.app.diagram_state.remove_connection(self)
         self.sp.connection = None
-        self.dp.connection = None
\ No newline at end of file
+        self.dp.connection = None
+        self.app.invalidate_code(self.src_ui.model, self.dst_ui.model, structure=True)
\ No newline at end of file
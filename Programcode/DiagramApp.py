@@ -1,29 +1,101 @@
 import tkinter as tk
 import os
+import tempfile
 from tkinter import messagebox, filedialog
 from PIL import Image, ImageTk  
 from NodeUI import NodeUI
 import DiagramIO
-from GraphModel import GraphModel
 from NodeModel import NodeModel
 from DiagramState import DiagramState
+from Viewport import Viewport
+from EdgeRouter import EdgeRouter
 from ConnectionUI import ConnectionUI
-from code_generator import CodeGenerator
+from TextLayout import TextLayout
+from code_generator import RegionCache
+from CodeWorker import CodeWorker
+from DiagramValidator import DiagramValidator
+import BlockProfiler
+from History import History
+from DiagramEditor import DiagramEditor
+import Journal
 
-class DiagramApp:
+# автосохранение для восстановления после сбоя
+AUTOSAVE_DIR = os.path.join(os.path.expanduser('~'), '.rgz_proga', 'autosave')
+
+class DiagramApp(DiagramEditor):
     def __init__(self):
         self.root = tk.Tk()
         self.root.title('Конвертер блок-схем в программный код')
         self.diagram_state = DiagramState()
+        # общий кэш размеров текста блоков (шрифт создаётся после Tk())
+        self.text_layout = TextLayout()
         self.io = DiagramIO.DiagramIo(self)
+        # кэш участков кода: правки сбрасывают только затронутые участки
+        self.code_cache = RegionCache()
+        self.code_view = None
+        self.__code_refresh_pending = False
+        # генерация идёт в фоновом потоке по копии моделей
+        self.code_worker = CodeWorker(self.root, self.code_cache)
+        self.__code_callback = None
+        self.__code_paused = False
+        self.__code_resubmit = False
+        # параметры генерации (CodeGenerator.generate_code_iter);
+        # fast_io относится к схеме и сохраняется вместе с ней
+        self.code_options = {'optimize': False, 'fast_io': False}
+        self.__option_vars = {}   # флажки окна кода по именам параметров
+        # проверка всей схемы: правки перепроверяются при простое
+        self.validator = DiagramValidator(self.diagram_state, self.root)
+        self.validator.listeners.append(self.__on_diagnostics)
+        self.__status_pending = False
+        # незавершённый прогон профилировщика и окно его результатов
+        self.__profile_run = None
+        self.profile_view = None
+        # отмена/повтор правок
+        self.history = History(self)
         self.__setup_ui()
+        # журнал правок пишется фоновым потоком; при запуске —
+        # предложение восстановить схему, если прошлый сеанс оборвался
+        self.__recover()
+        self.root.protocol('WM_DELETE_WINDOW', self.__on_close)
 
 
     def __setup_ui(self):
         self.__create_menu()
         self.__create_toolbar()
+        self.__create_status_bar()
         self.__create_canvas()
 
+    def __create_status_bar(self):
+        bar = tk.Frame(self.root)
+        bar.pack(side='bottom', fill='x')
+        # видна только во время профилирования
+        self.__stop_button = tk.Button(bar, text='Остановить', command=self.cancel_profile)
+        self.status = tk.Label(bar, anchor='w', justify='left', padx=6)
+        self.status.pack(side='left', fill='x', expand=True)
+        self.__update_status()
+
+    def __update_status(self):
+        self.__status_pending = False
+        errors = len(self.validator.errors())
+        warnings = len(self.validator.all()) - errors
+        self.status.config(text=f'Ошибок: {errors}   Предупреждений: {warnings}',
+                           fg='red' if errors else 'black')
+
+    def __on_diagnostics(self, node_id):
+        ui = self.diagram_state.node(node_id) if node_id is not None else None
+        if ui is not None:
+            ui.set_diagnostics(self.validator.diagnostics(node_id))
+        if not self.__status_pending:
+            self.__status_pending = True
+            self.root.after_idle(self.__update_status)
+
+    def show_hint(self, text):
+        """Показывает text в строке состояния; None — вернуть сводку проверки."""
+        if text is None:
+            self.__update_status()
+        else:
+            self.status.config(text=text, fg='black')
+
     def __create_menu(self):
         menu_bar = tk.Menu(self.root)
         file_menu = tk.Menu(menu_bar, tearoff=0)
@@ -32,6 +104,12 @@ class DiagramApp:
         file_menu.add_separator()
         file_menu.add_command(label='Генерация Python кода...', command=self.generate_code)
         menu_bar.add_cascade(label='Файл', menu=file_menu)
+        edit_menu = tk.Menu(menu_bar, tearoff=0)
+        edit_menu.add_command(label='Отменить', accelerator='Ctrl+Z', command=self.undo)
+        edit_menu.add_command(label='Повторить', accelerator='Ctrl+Y', command=self.redo)
+        edit_menu.add_separator()
+        edit_menu.add_command(label='Авто-раскладка', command=self.__auto_layout)
+        menu_bar.add_cascade(label='Правка', menu=edit_menu)
         self.root.config(menu=menu_bar)
 
     def __create_toolbar(self):
@@ -107,26 +185,109 @@ class DiagramApp:
             container, width=900, height=600, bg='white',
             yscrollcommand=vsb.set, xscrollcommand=hsb.set
         )
-        vsb.config(command=self.canvas.yview)
-        hsb.config(command=self.canvas.xview)
+        vsb.config(command=self.__yview)
+        hsb.config(command=self.__xview)
         vsb.pack(side='right', fill='y')
         hsb.pack(side='bottom', fill='x')
         self.canvas.pack(side='left', fill='both', expand=True)
-        self.canvas.config(scrollregion=(0, 0, 900, 3000))
+        # графика создаётся только для видимой части схемы;
+        # область прокрутки подстраивается под её границы
+        self.viewport = Viewport(self.canvas, self.diagram_state, self.root)
+        self.router = EdgeRouter(self.diagram_state, self.viewport, self.root)
+        self.canvas.bind('<Configure>', lambda e: self.viewport.schedule_refresh())
+        self.canvas.bind('<MouseWheel>', self.__on_wheel)
+        self.canvas.bind('<Button-4>', lambda e: self.__yview('scroll', -1, 'units'))
+        self.canvas.bind('<Button-5>', lambda e: self.__yview('scroll', 1, 'units'))
+        self.__band = None
+        self.canvas.bind('<ButtonPress-1>', self.__on_band_start)
+        self.canvas.bind('<B1-Motion>', self.__on_band_drag)
+        self.canvas.bind('<ButtonRelease-1>', self.__on_band_end)
+        # события блоков и связей привязаны к общим тегам один раз
+        NodeUI.bind_canvas(self.canvas)
+        ConnectionUI.bind_canvas(self.canvas)
+        self.root.bind('<Delete>', lambda e: self.delete_selected())
+        for seq in ('<Control-z>', '<Control-Z>'):
+            self.root.bind(seq, lambda e: self.undo())
+        for seq in ('<Control-y>', '<Control-Y>', '<Control-Shift-Z>'):
+            self.root.bind(seq, lambda e: self.redo())
+
+    def __yview(self, *args):
+        self.canvas.yview(*args)
+        self.viewport.schedule_refresh()
+
+    def __xview(self, *args):
+        self.canvas.xview(*args)
+        self.viewport.schedule_refresh()
+
+    def __on_wheel(self, event):
+        self.__yview('scroll', -1 if event.delta > 0 else 1, 'units')
+
+    # --- пространственные запросы ---
+
+    def nodes_in_rect(self, x0, y0, x1, y1):
+        """Узлы, чьи рамки пересекают прямоугольник (координаты холста)."""
+        return self.diagram_state.node_index.query(x0, y0, x1, y1)
+
+    # --- выделение рамкой ---
+
+    def __on_band_start(self, event):
+        # рамка начинается только на пустом месте холста
+        if self.canvas.find_withtag('current'):
+            self.__band = None
+            return
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        rect = self.canvas.create_rectangle(x, y, x, y, outline='blue', dash=(4, 2))
+        self.__band = (x, y, rect)
+
+    def __on_band_drag(self, event):
+        if self.__band is None:
+            return
+        x0, y0, rect = self.__band
+        self.canvas.coords(rect, x0, y0, self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+
+    def __on_band_end(self, event):
+        if self.__band is None:
+            return
+        x0, y0, rect = self.__band
+        self.__band = None
+        self.canvas.delete(rect)
+        x1, y1 = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        self.select_nodes(self.nodes_in_rect(x0, y0, x1, y1))
+
+    def select_nodes(self, nodes):
+        state = self.diagram_state
+        for ui in state.selected_nodes - nodes:
+            ui.set_selected(False)
+        for ui in nodes - state.selected_nodes:
+            ui.set_selected(True)
+        state.selected_nodes = set(nodes)
+
+    def delete_selected(self):
+        self.delete_nodes(self.diagram_state.selected_nodes)
+
+    def undo(self):
+        self.history.undo()
+
+    def redo(self):
+        self.history.redo()
+
+    def __auto_layout(self):
+        try:
+            self.auto_layout()
+        except ImportError as e:
+            messagebox.showerror("Ошибка", f"Для авто-раскладки нужен NumPy:\n{e}")
 
     def create_node(self, ntype):
         if self.__is_start_or_end_exists(ntype):
             return
         x, y = self.__get_center_position()
-        m = NodeModel(f'n{len(self.diagram_state.nodes_ui)}', ntype)
-        ui = NodeUI(self.canvas, m, x, y, self)
-        self.diagram_state.add_node(ui)
+        self.add_node(NodeModel(self.diagram_state.new_id(), ntype), x, y)
 
     def __is_start_or_end_exists(self, ntype):
-        if ntype == 'START' and any(n.model.type == 'START' for n in self.diagram_state.nodes_ui):
+        if ntype == 'START' and self.diagram_state.count('START'):
             messagebox.showerror("Нельзя создать", "Блок START уже существует")
             return True
-        if ntype == 'END' and any(n.model.type == 'END' for n in self.diagram_state.nodes_ui):
+        if ntype == 'END' and self.diagram_state.count('END'):
             messagebox.showerror("Нельзя создать", "Блок END уже существует")
             return True
         return False
@@ -139,16 +300,6 @@ class DiagramApp:
             view_y + (h - NodeUI.HEIGHT) / 2
         )
 
-    def delete_node(self, ui):
-        connections_to_remove = [
-            conn for conn in self.diagram_state.connections_ui
-            if ui in (conn.src_ui, conn.dst_ui)
-        ]
-        for conn in connections_to_remove:
-            conn.destroy()
-        ui.on_delete()
-        self.diagram_state.remove_node(ui)
-
     def handle_port_click(self, ui, port):
         if not self.diagram_state.selected:
             self.__select_port(ui, port)
@@ -157,22 +308,19 @@ class DiagramApp:
 
     def __select_port(self, ui, port):
         self.diagram_state.selected = (ui, port)
-        cid = next(k for k, v in ui.port_items.items() if v == port)
-        self.canvas.itemconfig(cid, fill='red')
+        ui.set_port_selected(port, True)
 
     def __connect_ports(self, ui, port):
         su, sp = self.diagram_state.selected
         du, dp = ui, port
         self.__reset_port_selection(su, sp)
         if self.__validate_connection(su, sp, du, dp):
-            sp.connection = dp
-            dp.connection = sp
-            ConnectionUI(self.canvas, su, sp, du, dp, self)
+            self.connect(su, sp, du, dp)
 
     def __reset_port_selection(self, ui, port):
-        cid = next(k for k, v in ui.port_items.items() if v == port)
-        self.canvas.itemconfig(cid, fill='black')
+        # узел мог уйти из видимой области: тогда его порты не нарисованы
         self.diagram_state.selected = None
+        ui.set_port_selected(port, False)
 
     def __validate_connection(self, su, sp, du, dp):
         if su is du:
@@ -192,45 +340,269 @@ class DiagramApp:
             return False
         return True
 
-    def update_connections(self, moved_ui):
-        for conn in self.diagram_state.connections_ui:
-            if moved_ui in (conn.src_ui, conn.dst_ui):
-                conn.refresh_endpoints()
 
 
 
     def clear_canvas(self):
+        self.io.cancel_load()
         self.canvas.delete('all')
         self.diagram_state.clear()
+        self.viewport.clear()
+        self.code_cache.clear()
+        self.history.clear()
+        self.validator.check_all([])
+        self.clear_heatmap()
+        self.set_code_options(fast_io=False)
+        self.journal.reset({'nodes': [], 'edges': []})
+
+    def __recover(self):
+        # прошлое автосохранение читается до создания журнала: новый
+        # журнал удаляет старые поколения
+        directory = AUTOSAVE_DIR
+        try:
+            data = Journal.recover(directory)
+        except Exception as e:
+            data = None
+            try:
+                kept = Journal.set_aside(directory)
+                messagebox.showwarning(
+                    "Восстановление",
+                    f"Автосохранение прошлого сеанса повреждено и не восстановлено:\n{e}\n\n"
+                    f"Файлы перенесены в:\n{kept}")
+            except OSError as move_error:
+                # файлы не трогаем: журнал этого сеанса пишется во временный каталог
+                directory = tempfile.mkdtemp(prefix='autosave-')
+                messagebox.showwarning(
+                    "Восстановление",
+                    f"Автосохранение прошлого сеанса повреждено и не восстановлено:\n{e}\n\n"
+                    f"Файлы оставлены в {AUTOSAVE_DIR} ({move_error}).")
+        self.journal = Journal.Journal(directory)
+        self.history.listeners.append(self.journal.append)
+        if data and data['nodes'] and messagebox.askyesno(
+                "Восстановление", "Найдена несохранённая схема прошлого сеанса. Восстановить?"):
+            self.io._load_progressive(data)
+        else:
+            self.journal.reset({'nodes': [], 'edges': []})
+
+    def __on_close(self):
+        # штатный выход: автосохранение больше не нужно
+        self.io.cancel_load()
+        self.code_worker.cancel()
+        if self.__profile_run is not None:
+            self.__profile_run.cancel()
+        self.journal.close(discard=True)
+        self.root.destroy()
 
     def run(self):
         self.root.mainloop()
 
+    def invalidate_code(self, *models, structure=False):
+        """Сообщает кэшу кода об изменении блоков (structure — изменились связи)."""
+        self.code_cache.invalidate(*models, structure=structure)
+        self.validator.invalidate(*models, structure=structure)
+        if self.__code_paused:
+            # недогруженную схему не генерируем: один раз после resume_code()
+            return
+        if self.code_worker.busy:
+            # идущая генерация устарела: отменяем и запускаем по свежей копии
+            self.code_worker.cancel()
+            self.__schedule_code(self.__code_callback)
+        elif self.code_view is not None:
+            self.__schedule_code(self.__update_code_view)
+
+    def pause_code(self):
+        """Приостанавливает перегенерацию кода по правкам (на время загрузки)."""
+        self.__code_paused = True
+        if self.code_worker.busy:
+            # генерация по прежней схеме: повторим её после загрузки
+            self.code_worker.cancel()
+            self.__code_resubmit = True
+
+    def resume_code(self):
+        """Возобновляет перегенерацию: одна генерация по загруженной схеме."""
+        self.__code_paused = False
+        resubmit, self.__code_resubmit = self.__code_resubmit, False
+        if resubmit:
+            self.__schedule_code(self.__code_callback)
+        elif self.code_view is not None:
+            self.__schedule_code(self.__update_code_view)
+
+    def __schedule_code(self, callback):
+        # несколько правок подряд — одна генерация после них
+        self.__code_callback = callback
+        if not self.__code_refresh_pending:
+            self.__code_refresh_pending = True
+            self.root.after_idle(self.__submit_code)
+
+    def __submit_code(self):
+        self.__code_refresh_pending = False
+        if self.code_view is not None:
+            self.code_view[2].config(text='Генерация…', fg='grey')
+        models = [ui.model for ui in self.diagram_state.nodes_ui]
+        self.code_worker.submit(models, self.__code_callback, **self.code_options)
+
+    def set_code_options(self, **options):
+        """Меняет параметры генерации (например, при загрузке схемы)."""
+        changed = any(self.code_options.get(k) != v for k, v in options.items())
+        self.code_options.update(options)
+        for name, var in self.__option_vars.items():
+            var.set(self.code_options[name])
+        if changed and self.code_view is not None:
+            self.__schedule_code(self.__update_code_view)
+
+    def __toggle_option(self, name, value):
+        self.set_code_options(**{name: value})
+        if name == 'fast_io':
+            # параметр схемы: автосохранение получает новый снимок
+            self.journal.reset(self.io._collect_data())
+
     def generate_code(self):
-        # строим GraphModel
-        graph = GraphModel()
-        for node_ui in self.diagram_state.nodes_ui:
-            graph.add_node(node_ui.model)
-        try:
-            lines = CodeGenerator.generate_code(graph)
-        except ValueError as e:
-            messagebox.showerror('Error', str(e))
+        self.__code_callback = self.__show_code
+        self.__submit_code()
+
+    def __show_code(self, lines, error):
+        if error is not None:
+            # генератор останавливается на первой ошибке — показываем все
+            self.validator.flush()
+            errors = [d.message for d in self.validator.errors()]
+            if str(error) not in errors:
+                errors.insert(0, str(error))
+            messagebox.showerror('Error', '\n'.join(errors))
             return
-        # показываем окно с кодом
+        if self.code_view is not None:
+            self.code_view[0].destroy()
+        # показываем окно с кодом; оно обновляется при правках схемы
         win = tk.Toplevel(self.root)
         win.title('Сгенерированный python код')
+        status = tk.Label(win, anchor='w', fg='red')
+        status.pack(fill='x')
         txt = tk.Text(win, wrap='none')
         txt.insert('1.0', '\n'.join(lines))
         txt.pack(fill='both', expand=True)
+        self.code_view = (win, txt, status, lines)
+        def close():
+            self.code_view = None
+            self.__option_vars = {}
+            win.destroy()
+        win.protocol('WM_DELETE_WINDOW', close)
         def save():
             fn = filedialog.asksaveasfilename(
                 defaultextension='.py', filetypes=[('Python files','*.py')]
             )
             if fn:
                 with open(fn, 'w', encoding='utf-8') as f:
-                    f.write('\n'.join(lines))
+                    f.write('\n'.join(self.code_view[3]))
                 messagebox.showinfo('Успех', f'Сохранено в {fn}')
-        tk.Button(win, text='Сохранить .py', command=save).pack(pady=5)
+        buttons = tk.Frame(win)
+        buttons.pack(pady=5)
+        self.__option_vars = {}
+        for name, label in (('optimize', 'Оптимизировать'), ('fast_io', 'Быстрый ввод/вывод')):
+            var = self.__option_vars[name] = tk.BooleanVar(win, self.code_options[name])
+            tk.Checkbutton(buttons, text=label, variable=var,
+                           command=lambda n=name, v=var: self.__toggle_option(n, v.get())
+                           ).pack(side='left', padx=5)
+        tk.Button(buttons, text='Сохранить .py', command=save).pack(side='left', padx=5)
+        tk.Button(buttons, text='Профилировать…', command=self.profile_code).pack(side='left', padx=5)
+
+    def __update_code_view(self, lines, error):
+        if self.code_view is None:
+            return
+        win, txt, status, _ = self.code_view
+        if error is not None:
+            status.config(text=str(error), fg='red')
+            return
+        status.config(text='')
+        txt.delete('1.0', 'end')
+        txt.insert('1.0', '\n'.join(lines))
+        self.code_view = (win, txt, status, lines)
+
+    # --- профилирование по блокам ---
+
+    PROFILE_TIMEOUT = 60    # с: дольше программа под профилировщиком не работает
+
+    def profile_code(self):
+        """
+        Запускает программу в отдельном процессе со входом из выбранного
+        файла и показывает время блоков тепловой картой на схеме.
+        """
+        if self.__profile_run is not None:
+            return
+        fn = filedialog.askopenfilename(
+            title='Входные данные программы (Отмена — без ввода)',
+            filetypes=[('Text files', '*.txt'), ('All files', '*.*')]
+        )
+        stdin = ''
+        if fn:
+            with open(fn, 'r', encoding='utf-8') as f:
+                stdin = f.read()
+        try:
+            run = self.__profile_run = BlockProfiler.start(
+                [ui.model for ui in self.diagram_state.nodes_ui], stdin,
+                self.PROFILE_TIMEOUT, **self.code_options)
+        except ValueError as e:
+            messagebox.showerror('Error', str(e))
+            return
+        self.show_hint('Профилирование…')
+        self.__stop_button.pack(side='right', padx=4)
+        self.root.after(100, self.__poll_profile, run)
+
+    def cancel_profile(self):
+        """Останавливает идущий прогон профилировщика без результата."""
+        run, self.__profile_run = self.__profile_run, None
+        if run is not None:
+            run.cancel()
+        self.__stop_button.pack_forget()
+        self.show_hint(None)
+
+    def __poll_profile(self, run):
+        if run is not self.__profile_run:
+            return    # прогон отменён
+        result = run.poll()
+        if result is None:
+            self.root.after(100, self.__poll_profile, run)
+            return
+        self.__profile_run = None
+        self.__stop_button.pack_forget()
+        self.show_hint(None)
+        if result.error is not None:
+            messagebox.showwarning('Профилирование', result.error)
+        elif result.returncode != 0:
+            messagebox.showwarning('Профилирование',
+                                   f'Программа завершилась с кодом {result.returncode}\n'
+                                   + result.stderr[-2000:])
+        self.show_heatmap(result)
+
+    def show_heatmap(self, profile):
+        """Окрашивает блоки по доле времени и показывает таблицу горячих блоков."""
+        self.clear_heatmap()
+        top = max(profile.time.values(), default=0.0)
+        for node_id, seconds in profile.time.items():
+            ui = self.diagram_state.node(node_id)
+            if ui is not None:
+                ui.set_heat(BlockProfiler.heat_color(seconds / top if top else 0.0))
+
+        win = tk.Toplevel(self.root)
+        win.title('Профиль по блокам')
+        rows = tk.Listbox(win, width=70, height=20, font=('Courier', 10))
+        rows.pack(fill='both', expand=True)
+        rows.insert('end', f"{'блок':<10}{'тип':<8}{'раз':>10}{'мс':>12}  текст")
+        for node_id in sorted(profile.time, key=profile.time.get, reverse=True):
+            ui = self.diagram_state.node(node_id)
+            kind, text = (ui.model.type, ui.model.content.replace('\n', ' ')) if ui else ('?', '')
+            rows.insert('end', f"{node_id:<10}{kind:<8}{profile.hits.get(node_id, 0):>10}"
+                               f"{profile.time[node_id] * 1000:>12.2f}  {text[:30]}")
+        win.protocol('WM_DELETE_WINDOW', self.clear_heatmap)
+        tk.Button(win, text='Снять подсветку', command=self.clear_heatmap).pack(pady=5)
+        self.profile_view = win
+
+    def clear_heatmap(self):
+        """Снимает тепловую карту профиля и закрывает окно с таблицей."""
+        if self.profile_view is not None:
+            self.profile_view.destroy()
+            self.profile_view = None
+        for ui in self.diagram_state.nodes_ui:
+            if ui.heat is not None:
+                ui.set_heat(None)
 
 if __name__ == '__main__':
     DiagramApp().run()
@@ -0,0 +1,284 @@
+# DiagramBinary.py
+"""
+Компактный двоичный формат диаграмм (.rgzd) — альтернатива JSON;
+строки хранятся один раз, файл читается через mmap.
+"""
+import mmap
+import struct
+from itertools import accumulate
+
+MAGIC = b'RGZD'
+VERSION = 1
+EXTENSION = '.rgzd'
+
+FLOAT_COORDS = 0x0001   # координаты — float64 без разностей (есть дробные
+                        # или отсутствующие — они хранятся как NaN)
+FAST_IO = 0x0002        # параметр генерации fast_io ('options' диаграммы)
+
+# Числа little-endian; секции идут подряд:
+#   заголовок       magic, версия, флаги, число узлов, рёбер, точек, строк,
+#                   размер блока строк
+#   смещения строк  (строк + 1) × u32 — начало каждой строки в блоке
+#   блок строк      UTF-8, дополнен нулями до кратности 4
+#   узлы            id, type, content (номера строк) + x, y
+#   рёбра           from_node, from_port, to_node, to_port, first_point,
+#                   point_count (узлы — номера в таблице узлов)
+#   точки           x, y промежуточных сгибов всех рёбер подряд
+# Целые координаты пишутся разностями с предыдущим узлом (точкой) в int32.
+_HEADER = struct.Struct('<4sHHIIIII')
+_NODE_IDS = struct.Struct('<III')
+_EDGE = struct.Struct('<IIIIII')
+_INT_XY = struct.Struct('<ii')
+_FLOAT_XY = struct.Struct('<dd')
+_INT32_MIN, _INT32_MAX = -2**31, 2**31 - 1
+_NAN = float('nan')
+
+
+def _coords_are_ints(values):
+    prev = 0
+    for v in values:
+        if v is None:
+            return False
+        if isinstance(v, float):
+            if not v.is_integer():
+                return False
+            v = int(v)
+        d = v - prev
+        if not _INT32_MIN <= d <= _INT32_MAX:
+            return False
+        prev = v
+    return True
+
+
+def write_binary(data, path):
+    """Сохраняет словарь диаграммы ({'nodes', 'edges', 'options'}) в двоичный файл path."""
+    nodes = data.get('nodes', [])
+    edges = data.get('edges', [])
+
+    strings = {}
+    def sid(s):
+        i = strings.get(s)
+        if i is None:
+            i = strings[s] = len(strings)
+        return i
+
+    index_of = {}
+    for i, n in enumerate(nodes):
+        # при повторяющихся ID связи ссылаются на первый узел
+        index_of.setdefault(n['id'], i)
+
+    points = []
+    edge_rows = []
+    for e in edges:
+        inner = e.get('points') or ()
+        edge_rows.append((
+            index_of[e['from_node']], sid(e['from_port']),
+            index_of[e['to_node']],   sid(e['to_port']),
+            len(points), len(inner),
+        ))
+        points.extend(inner)
+
+    # у блока может не быть координат — его расставит раскладка при загрузке
+    xs = [n.get('x') for n in nodes]
+    ys = [n.get('y') for n in nodes]
+    pxs = [p[0] for p in points]
+    pys = [p[1] for p in points]
+    flags = 0
+    if not all(_coords_are_ints(vs) for vs in (xs, ys, pxs, pys)):
+        flags |= FLOAT_COORDS
+    if (data.get('options') or {}).get('fast_io'):
+        flags |= FAST_IO
+
+    node_rows = [(sid(n['id']), sid(n['type']), sid(n.get('content', ''))) for n in nodes]
+
+    blob = bytearray()
+    offsets = []
+    for s in strings:
+        offsets.append(len(blob))
+        blob += s.encode('utf-8')
+    offsets.append(len(blob))
+    blob_size = len(blob)
+    blob += b'\0' * (-len(blob) % 4)
+
+    out = bytearray(_HEADER.pack(MAGIC, VERSION, flags, len(nodes), len(edges),
+                                 len(points), len(strings), blob_size))
+    out += struct.pack(f'<{len(offsets)}I', *offsets)
+    out += blob
+
+    if flags & FLOAT_COORDS:
+        xy, point_xy = _FLOAT_XY, zip(pxs, pys)
+        node_xy = [(_NAN if x is None else x, _NAN if y is None else y)
+                   for x, y in zip(xs, ys)]
+    else:
+        xy = _INT_XY
+        node_xy = _deltas(xs, ys)
+        point_xy = _deltas(pxs, pys)
+    for row, (x, y) in zip(node_rows, node_xy):
+        out += _NODE_IDS.pack(*row)
+        out += xy.pack(x, y)
+    for row in edge_rows:
+        out += _EDGE.pack(*row)
+    for x, y in point_xy:
+        out += xy.pack(x, y)
+
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def _deltas(xs, ys):
+    px = py = 0
+    for x, y in zip(xs, ys):
+        x, y = int(x), int(y)
+        yield x - px, y - py
+        px, py = x, y
+
+
+class BinaryDiagram:
+    """
+    Диаграмма в двоичном формате, открытая через mmap.
+    Таблицы читаются прямо из отображения файла; строки (в т.ч. содержимое
+    блоков) декодируются при первом обращении.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse_header()
+        except Exception:
+            self._mm.close()
+            raise
+        self._strings = {}
+        self._coords = None
+
+    def _parse_header(self):
+        mm = self._mm
+        if len(mm) < _HEADER.size:
+            raise ValueError("Файл слишком короткий для диаграммы")
+        (magic, version, self.flags, self.node_count, self.edge_count,
+         self.point_count, string_count, blob_size) = _HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError("Это не файл диаграммы (неверная сигнатура)")
+        if version != VERSION:
+            raise ValueError(f"Неподдерживаемая версия формата: {version}")
+
+        xy = _FLOAT_XY if self.flags & FLOAT_COORDS else _INT_XY
+        self._xy = xy
+        self._node_size = _NODE_IDS.size + xy.size
+        self._string_count = string_count
+        self._blob_size = blob_size
+        self._offsets_at = _HEADER.size
+        self._blob_at = self._offsets_at + 4 * (string_count + 1)
+        self._nodes_at = self._blob_at + blob_size + (-blob_size % 4)
+        self._edges_at = self._nodes_at + self.node_count * self._node_size
+        self._points_at = self._edges_at + self.edge_count * _EDGE.size
+        end = self._points_at + self.point_count * xy.size
+        if end > len(mm):
+            raise ValueError("Файл диаграммы повреждён (обрезан)")
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def string(self, i):
+        """Строка из таблицы строк (декодируется один раз)."""
+        s = self._strings.get(i)
+        if s is None:
+            if not 0 <= i < self._string_count:
+                raise ValueError(f"Файл диаграммы повреждён: строка {i}")
+            a, b = struct.unpack_from('<II', self._mm, self._offsets_at + 4 * i)
+            if not a <= b <= self._blob_size:
+                raise ValueError(f"Файл диаграммы повреждён: строка {i}")
+            s = self._strings[i] = str(self._mm[self._blob_at + a:self._blob_at + b], 'utf-8')
+        return s
+
+    def _node_row(self, i):
+        return _NODE_IDS.unpack_from(self._mm, self._nodes_at + i * self._node_size)
+
+    def node_id(self, i):
+        return self.string(self._node_row(i)[0])
+
+    def node_type(self, i):
+        return self.string(self._node_row(i)[1])
+
+    def node_content(self, i):
+        return self.string(self._node_row(i)[2])
+
+    def _decode_coords(self):
+        # координаты нужны все сразу: разности накапливаются по порядку
+        mm, xy = self._mm, self._xy
+        step = self._node_size
+        base = self._nodes_at + _NODE_IDS.size
+        nodes = [xy.unpack_from(mm, base + i * step) for i in range(self.node_count)]
+        points = list(xy.iter_unpack(mm[self._points_at:self._points_at + self.point_count * xy.size]))
+        if not self.flags & FLOAT_COORDS:
+            nodes = _prefix(nodes)
+            points = _prefix(points)
+        else:
+            # NaN — у блока не было координаты
+            nodes = [(None if x != x else x, None if y != y else y) for x, y in nodes]
+        self._coords = (nodes, points)
+        return self._coords
+
+    def node_position(self, i):
+        nodes, _ = self._coords or self._decode_coords()
+        return nodes[i]
+
+    def node(self, i):
+        """Узел i в виде словаря, как в JSON‑формате."""
+        sid, tid, cid = self._node_row(i)
+        x, y = self.node_position(i)
+        return {'id': self.string(sid), 'type': self.string(tid),
+                'content': self.string(cid), 'x': x, 'y': y}
+
+    def edges(self):
+        """Рёбра в виде словарей, как в JSON‑формате."""
+        _, points = self._coords or self._decode_coords()
+        for row in _EDGE.iter_unpack(self._mm[self._edges_at:self._points_at]):
+            src, sport, dst, dport, first, count = row
+            if (src >= self.node_count or dst >= self.node_count
+                    or first + count > self.point_count):
+                raise ValueError("Файл диаграммы повреждён: неверная связь")
+            yield {
+                'from_node': self.node_id(src),
+                'from_port': self.string(sport),
+                'to_node':   self.node_id(dst),
+                'to_port':   self.string(dport),
+                'points':    [list(p) for p in points[first:first + count]] if count else None,
+            }
+
+    def to_dict(self):
+        """Полное преобразование в словарь диаграммы ({'nodes', 'edges'[, 'options']})."""
+        data = {
+            'nodes': [self.node(i) for i in range(self.node_count)],
+            'edges': list(self.edges()),
+        }
+        if self.flags & FAST_IO:
+            data['options'] = {'fast_io': True}
+        return data
+
+
+def _prefix(deltas):
+    xs = accumulate(d[0] for d in deltas)
+    ys = accumulate(d[1] for d in deltas)
+    return list(zip(xs, ys))
+
+
+def read_binary(path):
+    """Читает двоичный файл диаграммы в словарь ({'nodes', 'edges'})."""
+    with BinaryDiagram(path) as diagram:
+        return diagram.to_dict()
+
+
+if __name__ == '__main__':
+    # преобразование между форматами: python DiagramBinary.py схема.json схема.rgzd
+    import sys
+    from DiagramData import read_diagram, write_diagram
+    if len(sys.argv) != 3:
+        sys.exit('usage: python DiagramBinary.py SRC DST  (.json <-> .rgzd)')
+    write_diagram(read_diagram(sys.argv[1]), sys.argv[2])
@@ -0,0 +1,92 @@
+import json
+from NodeModel import NodeModel
+from GraphModel import GraphModel
+import DiagramBinary
+
+
+def read_diagram(path):
+    """
+    Читает файл диаграммы (JSON или двоичный .rgzd — по расширению)
+    и возвращает словарь {'nodes': [...], 'edges': [...]}.
+    """
+    if path.lower().endswith(DiagramBinary.EXTENSION):
+        return DiagramBinary.read_binary(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_diagram(data, path):
+    """Сохраняет словарь диаграммы в JSON или двоичный .rgzd (по расширению)."""
+    if path.lower().endswith(DiagramBinary.EXTENSION):
+        DiagramBinary.write_binary(data, path)
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def code_options(data):
+    """
+    Параметры генерации кода, сохранённые вместе с диаграммой
+    (необязательный ключ 'options'); для CodeGenerator.generate_code.
+    """
+    options = data.get('options') or {}
+    return {'fast_io': bool(options.get('fast_io', False))}
+
+
+def build_models(data, size=None, layout=True):
+    """
+    Строит NodeModel по данным диаграммы и соединяет их порты.
+    Не зависит от tkinter: используется и редактором, и пакетной компиляцией.
+    Повторяющиеся ID получают суффиксы _2, _3 …, связи ссылаются
+    на первый узел с исходным ID.
+    Блоки без координат x/y расставляются автоматической раскладкой
+    (Layout.layered_layout, size — функция размера блока для неё);
+    layout=False — координаты остаются None.
+    Возвращает (nodes, edges):
+      nodes — список (NodeModel, x, y) в порядке файла,
+      edges — список (sp, dp, inner_points), inner_points — None или
+              список промежуточных точек ломаной.
+    """
+    nodes = []
+    id_to_model = {}
+    next_suffix = {}   # исходный ID -> следующий номер суффикса
+    for n in data.get('nodes', []):
+        orig_id = n['id']
+        new_id = orig_id
+        if new_id in id_to_model:
+            # если встречался — добавляем суффикс _2, _3 …; счётчик
+            # запоминается, поэтому k повторов разбираются за O(k)
+            i = next_suffix.get(orig_id, 2)
+            while new_id in id_to_model:
+                new_id = f"{orig_id}_{i}"
+                i += 1
+            next_suffix[orig_id] = i
+
+        m = NodeModel(new_id, n['type'], n.get('content', ''))
+        nodes.append((m, n.get('x'), n.get('y')))
+        id_to_model[new_id] = m
+
+    edges = []
+    for e in data.get('edges', []):
+        sp = id_to_model[e['from_node']].port_map[e['from_port']]
+        dp = id_to_model[e['to_node']].port_map[e['to_port']]
+        sp.connection = dp
+        dp.connection = sp
+        raw = e.get('points')
+        edges.append((sp, dp, [tuple(pt) for pt in raw] if raw else None))
+
+    if layout and any(x is None or y is None for _, x, y in nodes):
+        from Layout import layered_layout
+        pos = layered_layout([m for m, _, _ in nodes], size)
+        nodes = [(m, *pos[m]) if x is None or y is None else (m, x, y)
+                 for m, x, y in nodes]
+    return nodes, edges
+
+
+def build_graph(data):
+    """GraphModel по данным диаграммы (без координат и графики)."""
+    graph = GraphModel()
+    nodes, _ = build_models(data, layout=False)
+    for m, _, _ in nodes:
+        graph.add_node(m)
+    return graph
@@ -0,0 +1,91 @@
+from NodeUI import NodeUI
+from ConnectionUI import ConnectionUI
+
+
+def _bends(conn):
+    """Ручные сгибы связи; None — маршрут прокладывается автоматически."""
+    return None if conn.routed else conn.points[1:-1]
+
+
+class DiagramEditor:
+    """
+    Операции правки схемы, общие для окна редактора и его заменителя
+    в замерах: создание и удаление блоков и связей с записью в историю.
+    Ожидает у объекта canvas, diagram_state, viewport, router, history
+    и invalidate_code().
+    """
+
+    def add_node(self, model, x, y):
+        ui = NodeUI(self.canvas, model, x, y, self)
+        self.diagram_state.add_node(ui)
+        self.invalidate_code(model, structure=True)
+        self.history.record(('add_node', model.id, model.type, model.content, x, y))
+        return ui
+
+    def delete_node(self, ui):
+        m = ui.model
+        with self.history.transaction():
+            for conn in self.diagram_state.connections_of(ui):
+                self.disconnect(conn)
+            self.history.record(('del_node', m.id, m.type, m.content, ui.x, ui.y))
+            ui.on_delete()
+            self.diagram_state.remove_node(ui)
+            self.invalidate_code(m, structure=True)
+
+    def delete_nodes(self, nodes):
+        """Удаляет несколько блоков одной записью истории."""
+        with self.history.transaction():
+            for ui in list(nodes):
+                self.delete_node(ui)
+
+    def connect(self, su, sp, du, dp, inner=None):
+        """
+        Соединяет порты sp → dp. inner — промежуточные точки ломаной;
+        None — маршрут прокладывается автоматически (EdgeRouter).
+        """
+        points = None
+        if inner is not None:
+            points = [su.port_position(sp)] + [tuple(pt) for pt in inner] + [du.port_position(dp)]
+        conn = ConnectionUI(self.canvas, su, sp, du, dp, self, points=points)
+        self.history.record(('add_edge', su.model.id, sp.name, du.model.id, dp.name,
+                             _bends(conn)))
+        return conn
+
+    def disconnect(self, conn):
+        self.history.record(('del_edge', conn.src_ui.model.id, conn.sp.name,
+                             conn.dst_ui.model.id, conn.dp.name, _bends(conn)))
+        conn.destroy()
+
+    def find_connection(self, node_id, port_name):
+        """Связь, выходящая из порта port_name блока node_id, или None."""
+        ui = self.diagram_state.node(node_id)
+        if ui is None:
+            return None
+        for conn in self.diagram_state.connections_of(ui):
+            if conn.src_ui is ui and conn.sp.name == port_name:
+                return conn
+        return None
+
+    def auto_layout(self):
+        """
+        Расставляет все блоки послойной раскладкой (Layout) одной записью
+        истории; маршруты связей строятся заново по новым местам блоков.
+        """
+        from Layout import layered_layout
+        nodes = list(self.diagram_state.nodes_ui)
+        sizes = {ui.model: (ui.WIDTH, ui.HEIGHT) for ui in nodes}
+        pos = layered_layout(list(sizes), size=sizes.__getitem__)
+        with self.history.transaction():
+            for ui in nodes:
+                x, y = pos[ui.model]
+                if (x, y) != (ui.x, ui.y):
+                    ui.move_by(x - ui.x, y - ui.y)
+            for conn in list(self.diagram_state.connections_ui):
+                su, sp, du, dp = conn.src_ui, conn.sp, conn.dst_ui, conn.dp
+                self.disconnect(conn)
+                self.connect(su, sp, du, dp)
+        self.viewport.schedule_refresh()
+
+    def update_connections(self, moved_ui):
+        for conn in self.diagram_state.connections_of(moved_ui):
+            conn.refresh_endpoints()
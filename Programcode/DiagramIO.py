@@ -1,13 +1,111 @@
-import json
-from tkinter import messagebox, filedialog
-from NodeModel import NodeModel
-from DiagramApp import DiagramApp
+import time
+from typing import TYPE_CHECKING
+import tkinter as tk
+from tkinter import messagebox, filedialog, ttk
+from DiagramData import build_models, code_options, read_diagram, write_diagram
 from NodeUI import NodeUI
 from ConnectionUI import ConnectionUI
 
+if TYPE_CHECKING:
+    from DiagramApp import DiagramApp
+
+FILETYPES = [
+    ("JSON files", "*.json"),
+    ("Binary diagrams", "*.rgzd"),
+]
+
+class LoadJob:
+    """
+    Загрузка диаграммы на холст по частям.
+    Модели узлов и связи портов строятся сразу (быстрая фаза), а графика
+    создаётся порциями через step(): сначала узлы, затем связи, в порядке
+    удалённости от центра видимой области — то, что на экране, появляется
+    первым.
+    """
+
+    def __init__(self, app, data):
+        self.app = app
+        layout = app.text_layout
+        # ширины всех строк текста измеряются одной пачкой
+        # (до раскладки блоков без координат — ей нужны размеры)
+        layout.measure_many(
+            line for n in data.get('nodes', [])
+            for line in (n.get('content') or n['type']).split('\n'))
+        nodes, edges = build_models(data, size=lambda m: NodeUI.size_for(layout, m))
+        self.options = code_options(data)
+
+        canvas = app.canvas
+        cx = canvas.canvasx(0) + canvas.winfo_width() / 2
+        cy = canvas.canvasy(0) + canvas.winfo_height() / 2
+        dist = {}
+        for m, x, y in nodes:
+            dist[m] = (x + NodeUI.MIN_WIDTH / 2 - cx) ** 2 + (y + NodeUI.MIN_HEIGHT / 2 - cy) ** 2
+        self.nodes = sorted(nodes, key=lambda n: dist[n[0]])
+        self.edges = sorted(edges, key=lambda e: min(dist[e[0].parent], dist[e[1].parent]))
+        self.total = len(self.nodes) + len(self.edges)
+        self.done = 0
+        self.model_to_ui = {}
+
+    def to_data(self):
+        """Словарь загружаемой диаграммы — с уже переименованными повторами ID."""
+        data = {
+            'nodes': [{'id': m.id, 'type': m.type, 'content': m.content, 'x': x, 'y': y}
+                      for m, x, y in self.nodes],
+            'edges': [{'from_node': sp.parent.id, 'from_port': sp.name,
+                       'to_node': dp.parent.id, 'to_port': dp.name, 'points': inner}
+                      for sp, dp, inner in self.edges],
+        }
+        if self.options['fast_io']:
+            data['options'] = {'fast_io': True}
+        return data
+
+    def step(self, budget=None):
+        """
+        Создаёт графику, пока не истечёт budget секунд (None — до конца).
+        Возвращает True, когда всё создано.
+        """
+        deadline = None if budget is None else time.perf_counter() + budget
+        app, canvas = self.app, self.app.canvas
+        n_nodes = len(self.nodes)
+        while self.done < self.total:
+            i = self.done
+            if i < n_nodes:
+                m, x, y = self.nodes[i]
+                ui = NodeUI(canvas, m, x, y, app)
+                app.diagram_state.add_node(ui)
+                self.model_to_ui[m] = ui
+            else:
+                sp, dp, inner = self.edges[i - n_nodes]
+                su_ui = self.model_to_ui[sp.parent]
+                du_ui = self.model_to_ui[dp.parent]
+
+                x0, y0 = su_ui.port_position(sp)
+                x1, y1 = du_ui.port_position(dp)
+                pts = [(x0, y0)] + inner + [(x1, y1)] if inner else None
+
+                ConnectionUI(
+                    canvas,
+                    src_ui=su_ui, sp=sp,
+                    dst_ui=du_ui, dp=dp,
+                    app=app,
+                    points=pts
+                )
+            self.done += 1
+            # время проверяем раз в несколько элементов
+            if deadline is not None and self.done % 16 == 0 and time.perf_counter() > deadline:
+                break
+        return self.done >= self.total
+
+
 class DiagramIo:
+    # сколько секунд за один тик mainloop тратится на создание графики
+    TICK_BUDGET = 0.015
+
     def __init__(self, app: 'DiagramApp'):
         self.app = app
+        self._job = None
+        self._tick = None
+        self._progress_win = None
 
     def _collect_data(self):
         nodes = []
@@ -24,7 +122,8 @@ class DiagramIo:
         edges = []
         for conn in self.app.diagram_state.connections_ui:
            
-            inner = conn.points[1:-1]
+            # автоматический маршрут не сохраняется — он прокладывается заново
+            inner = None if conn.routed else conn.points[1:-1]
             edges.append({
                 'from_node': conn.src_ui.model.id,
                 'from_port': conn.sp.name,
@@ -33,7 +132,11 @@ class DiagramIo:
                 'points':    inner if inner else None,
             })
 
-        return {'nodes': nodes, 'edges': edges}
+        data = {'nodes': nodes, 'edges': edges}
+        # параметры генерации, относящиеся к схеме (по умолчанию не пишутся)
+        if self.app.code_options.get('fast_io'):
+            data['options'] = {'fast_io': True}
+        return data
 
 
 
@@ -42,13 +145,14 @@ class DiagramIo:
         fn = filedialog.asksaveasfilename(
             title="Сохранить диаграмму",
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json")]
+            filetypes=FILETYPES
         )
         if not fn:
             return
         try:
-            with open(fn, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            write_diagram(data, fn)
+            # сохранённая схема становится новым снимком автосохранения
+            self.__journal_reset(data)
             messagebox.showinfo("Успех", f"Диаграмма сохранена в:\n{fn}")
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось сохранить:\n{e}")
@@ -57,66 +161,124 @@ class DiagramIo:
         fn = filedialog.askopenfilename(
             title="Открыть диаграмму",
             defaultextension=".json",
-            filetypes=[("JSON files", "*.json")]
+            filetypes=FILETYPES
         )
         if not fn:
             return
         try:
-            with open(fn, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = read_diagram(fn)
         except Exception as e:
             messagebox.showerror("Ошибка", f"Не удалось прочитать файл:\n{e}")
             return
 
         try:
-            self._load_data(data)
-            messagebox.showinfo("Успех", "Диаграмма успешно загружена")
+            self._load_progressive(data)
         except Exception as e:
             messagebox.showerror("Ошибка", f"При загрузке произошла ошибка:\n{e}")
 
-    def _load_data(self, data):
-        # 0) Очистка предыдущего
+    def _reset(self):
+        self.cancel_load()
+        # на время загрузки схема не проверяется и код не генерируется —
+        # целиком после неё
+        self.app.validator.pause()
+        self.app.pause_code()
         self.app.canvas.delete('all')
         self.app.diagram_state.clear()
+        self.app.viewport.clear()
+        self.app.code_cache.clear()
+        self.app.history.clear()
+
+    def __journal_reset(self, data):
+        if self.app.journal is not None:
+            self.app.journal.reset(data)
+
+    def _load_data(self, data):
+        """Синхронная загрузка целиком (для небольших схем и тестов)."""
+        job = self.__start(data)
+        try:
+            job.step()
+        except Exception:
+            self.cancel_load()
+            raise
+        self._job = None
+        self.app.validator.resume()
+        self.app.resume_code()
+        self.app.viewport.refresh()
+
+    def _load_progressive(self, data):
+        """Загрузка без блокировки окна: графика создаётся порциями по root.after."""
+        self.__start(data)
+        self.__show_progress()
+        self._tick = self.app.root.after(1, self.__load_tick)
+
+    def __start(self, data):
+        """
+        Заменяет схему загружаемой. Модели строятся до очистки холста:
+        ошибка в данных оставляет текущую схему нетронутой.
+        """
+        job = LoadJob(self.app, data)
+        self._reset()
+        self._job = job
+        self.app.set_code_options(**job.options)
+        self.__journal_reset(job.to_data())
+        return job
+
+    def cancel_load(self):
+        """Прерывает незавершённую загрузку; уже созданные блоки удаляются."""
+        job, self._job = self._job, None
+        self.__close_progress()
+        if self._tick is not None:
+            self.app.root.after_cancel(self._tick)
+            self._tick = None
+        if job is not None:
+            self.app.canvas.delete('all')
+            self.app.diagram_state.clear()
+            self.app.viewport.clear()
+            self.app.code_cache.clear()
+            self.app.history.clear()
+            self.app.set_code_options(fast_io=False)
+            self.__journal_reset({'nodes': [], 'edges': []})
+            self.app.validator.resume()
+            self.app.resume_code()
+
+    def __load_tick(self):
+        self._tick = None
+        job = self._job
+        if job is None:
+            return
+        try:
+            done = job.step(self.TICK_BUDGET)
+        except Exception as e:
+            self.cancel_load()
+            messagebox.showerror("Ошибка", f"При загрузке произошла ошибка:\n{e}")
+            return
+        self.app.viewport.refresh()
+        if done:
+            self._job = None
+            self.__close_progress()
+            self.app.validator.resume()
+            self.app.resume_code()
+            messagebox.showinfo("Успех", "Диаграмма успешно загружена")
+            return
+        self._progress['value'] = job.done
+        self._progress_label.config(text=f"Загружено {job.done} из {job.total}")
+        self._tick = self.app.root.after(1, self.__load_tick)
+
+    def __show_progress(self):
+        job = self._job
+        win = tk.Toplevel(self.app.root)
+        win.title("Загрузка схемы")
+        win.transient(self.app.root)
+        win.resizable(False, False)
+        self._progress_label = tk.Label(win, text=f"Загружено 0 из {job.total}")
+        self._progress_label.pack(padx=10, pady=(10, 2))
+        self._progress = ttk.Progressbar(win, length=260, maximum=max(job.total, 1))
+        self._progress.pack(padx=10, pady=2)
+        tk.Button(win, text="Отмена", command=self.cancel_load).pack(pady=(2, 10))
+        win.protocol('WM_DELETE_WINDOW', self.cancel_load)
+        self._progress_win = win
 
-        # 1) создаём все узлы, автоматически правим повторяющиеся ID
-        id_to_ui = {}
-        used_ids = set()
-        for n in data.get('nodes', []):
-            orig_id = n['id']
-            new_id = orig_id
-            i = 2
-            # если встречался — добавляем суффикс _2, _3 …
-            while new_id in used_ids:
-                new_id = f"{orig_id}_{i}"
-                i += 1
-            used_ids.add(new_id)
-
-            # создаём узел с уникальным new_id
-            m  = NodeModel(new_id, n['type'], n.get('content',''))
-            ui = NodeUI(self.app.canvas, m, n['x'], n['y'], self.app)
-            self.app.diagram_state.add_node(ui)
-            id_to_ui[new_id] = ui
-
-        # 2) создаём связи
-        for e in data.get('edges', []):
-     
-            su_ui = id_to_ui[e['from_node']]
-            du_ui = id_to_ui[e['to_node']]
-            sp    = next(p for p in su_ui.model.ports if p.name == e['from_port'])
-            dp    = next(p for p in du_ui.model.ports if p.name == e['to_port'])
-
-            raw = e.get('points')
-            inner = [tuple(pt) for pt in raw] if raw else None
-
-            x0, y0 = su_ui.port_position(sp)
-            x1, y1 = du_ui.port_position(dp)
-            pts = [(x0, y0)] + inner + [(x1, y1)] if inner else None
-
-            ConnectionUI(
-                self.app.canvas,
-                src_ui=su_ui, sp=sp,
-                dst_ui=du_ui, dp=dp,
-                app=self.app,
-                points=pts
-            )
+    def __close_progress(self):
+        if self._progress_win is not None:
+            self._progress_win.destroy()
+            self._progress_win = None
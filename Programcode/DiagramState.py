@@ -1,22 +1,138 @@
+import re
+from collections import Counter
+from SpatialIndex import SpatialIndex
+
+# ID, которые выдаёт new_id: n0, n1, …
+AUTO_ID_RE = re.compile(r'^n(\d+)$')
+
+
 class DiagramState:
+    """
+    Состояние редактора. Узлы хранятся в словаре по ID, связи — в словаре
+    как упорядоченном множестве: порядок вставки сохраняется для
+    сохранения в файл, а добавление и удаление выполняются за O(1).
+    """
+
     def __init__(self):
-        self.nodes_ui = []
-        self.connections_ui = []
+        self.nodes = {}          # ID узла -> NodeUI
+        self.connections = {}    # ConnectionUI -> None
+        self.type_counts = Counter()
         self.selected = None
+        self.selected_nodes = set()
+        # пространственные индексы: рамки узлов и отрезки ломаных связей
+        self.node_index = SpatialIndex()
+        self.edge_index = SpatialIndex()
+        self.__segments = {}   # connection -> число отрезков в edge_index
+        self.__incident = {}   # node_ui -> множество связей, входящих в узел или выходящих из него
+        # вызываются с (node_ui, старая рамка, новая рамка) при добавлении,
+        # перемещении или удалении узла (None — рамки нет)
+        self.node_listeners = []
+        self.__next_id = 0
+
+    @property
+    def nodes_ui(self):
+        return self.nodes.values()
+
+    @property
+    def connections_ui(self):
+        return self.connections.keys()
+
+    def new_id(self):
+        """Свободный ID для нового узла; номера не переиспользуются после удаления."""
+        while True:
+            node_id = f'n{self.__next_id}'
+            self.__next_id += 1
+            if node_id not in self.nodes:
+                return node_id
+
+    def count(self, ntype):
+        """Число узлов типа ntype."""
+        return self.type_counts[ntype]
+
+    def node(self, node_id):
+        return self.nodes.get(node_id)
 
     def add_node(self, node_ui):
-        self.nodes_ui.append(node_ui)
+        m = node_ui.model
+        if m.id in self.nodes:
+            raise ValueError(f"Блок с ID {m.id} уже существует")
+        self.nodes[m.id] = node_ui
+        self.type_counts[m.type] += 1
+        # загруженные n<k> сдвигают счётчик, чтобы new_id их не повторял
+        auto = AUTO_ID_RE.match(m.id)
+        if auto:
+            self.__next_id = max(self.__next_id, int(auto.group(1)) + 1)
+        box = node_ui.bbox()
+        self.node_index.insert(node_ui, box)
+        self.__notify(node_ui, None, box)
 
     def remove_node(self, node_ui):
-        self.nodes_ui.remove(node_ui)
+        m = node_ui.model
+        del self.nodes[m.id]
+        self.type_counts[m.type] -= 1
+        old = self.node_index.boxes.get(node_ui)
+        self.node_index.remove(node_ui)
+        self.selected_nodes.discard(node_ui)
+        if self.selected is not None and self.selected[0] is node_ui:
+            self.selected = None
+        self.__notify(node_ui, old, None)
+
+    def update_node(self, node_ui):
+        """Обновляет рамку узла в индексе после перемещения или перерисовки."""
+        old = self.node_index.boxes.get(node_ui)
+        if old is not None:
+            box = node_ui.bbox()
+            if box != old:
+                self.node_index.insert(node_ui, box)
+                self.__notify(node_ui, old, box)
+
+    def __notify(self, node_ui, old, new):
+        for listener in self.node_listeners:
+            listener(node_ui, old, new)
 
     def add_connection(self, connection):
-        self.connections_ui.append(connection)
+        self.connections[connection] = None
+        for ui in (connection.src_ui, connection.dst_ui):
+            self.__incident.setdefault(ui, set()).add(connection)
+        self.__segments[connection] = 0
+        self.update_connection(connection)
 
     def remove_connection(self, connection):
-        self.connections_ui.remove(connection)
+        del self.connections[connection]
+        for ui in (connection.src_ui, connection.dst_ui):
+            conns = self.__incident.get(ui)
+            if conns is not None:
+                conns.discard(connection)
+                if not conns:
+                    del self.__incident[ui]
+        for i in range(self.__segments.pop(connection, 0)):
+            self.edge_index.remove((connection, i))
+
+    def connections_of(self, node_ui):
+        """Связи, инцидентные узлу (копия — её можно менять при обходе)."""
+        return list(self.__incident.get(node_ui, ()))
+
+    def update_connection(self, connection):
+        """Перезаписывает отрезки ломаной связи в индексе."""
+        old = self.__segments.get(connection)
+        if old is None:
+            return
+        pts = connection.points
+        for i in range(len(pts) - 1, old):
+            self.edge_index.remove((connection, i))
+        for i in range(len(pts) - 1):
+            (x0, y0), (x1, y1) = pts[i], pts[i + 1]
+            self.edge_index.insert((connection, i), (x0, y0, x1, y1))
+        self.__segments[connection] = len(pts) - 1
 
     def clear(self):
-        self.nodes_ui.clear()
-        self.connections_ui.clear()
-        self.selected = None
\ No newline at end of file
+        self.nodes.clear()
+        self.connections.clear()
+        self.type_counts.clear()
+        self.selected = None
+        self.selected_nodes.clear()
+        self.node_index.clear()
+        self.edge_index.clear()
+        self.__segments.clear()
+        self.__incident.clear()
+        self.__next_id = 0
@@ -0,0 +1,301 @@
+from collections import namedtuple
+import AstBackend
+from GraphModel import GraphModel
+from code_generator import IDENT_RE
+
+Diagnostic = namedtuple('Diagnostic', 'node_id code message')
+
+# предупреждения не мешают генерации кода, остальные коды — ошибки
+WARNINGS = ('unreachable', 'cycle')
+
+_LOOPS = ('FOR', 'WHILE')
+
+# как разбирается текст блока (см. AstBackend) и текст по умолчанию
+_SYNTAX = {'ACTION': ('stmt', ''), 'BRANCH': ('expr', 'condition'),
+           'WHILE': ('expr', 'condition'), 'FOR': ('for', 'item in iterable'),
+           'OUTPUT': ('print', '')}
+
+
+def _successors(node):
+    return [p.connection.parent for p in node.ports
+            if p.port_type == 'out' and p.connection is not None]
+
+
+def _predecessors(node):
+    return [p.connection.parent for p in node.ports
+            if p.port_type == 'in' and p.connection is not None]
+
+
+def _flow_successors(node):
+    # переход в in_back — штатное замыкание цикла, не ошибка
+    return [p.connection.parent for p in node.ports
+            if p.port_type == 'out' and p.connection is not None
+            and p.connection.name != 'in_back']
+
+
+def _closure(nodes, step):
+    """Все узлы, достижимые из nodes по функции step (вместе с ними)."""
+    seen = set(nodes)
+    stack = list(seen)
+    while stack:
+        for nxt in step(stack.pop()):
+            if nxt not in seen:
+                seen.add(nxt)
+                stack.append(nxt)
+    return seen
+
+
+def _cyclic(region):
+    """
+    Узлы region, лежащие на цикле в обход FOR/WHILE (нетривиальные
+    компоненты сильной связности, алгоритм Тарьяна без рекурсии).
+    """
+    index, low, on_stack = {}, {}, set()
+    stack, out = [], set()
+    for root in region:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(_flow_successors(root)))]
+        while work:
+            v, it = work[-1]
+            for w in it:
+                if w not in region:
+                    continue
+                if w not in index:
+                    index[w] = low[w] = len(index)
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(_flow_successors(w))))
+                    break
+                if w in on_stack:
+                    low[v] = min(low[v], index[w])
+            else:
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+                if low[v] == index[v]:
+                    comp = []
+                    while True:
+                        w = stack.pop()
+                        on_stack.discard(w)
+                        comp.append(w)
+                        if w is v:
+                            break
+                    if len(comp) > 1 or v in _flow_successors(v):
+                        out.update(comp)
+    return out
+
+
+class DiagramValidator:
+    """
+    Проверка всей схемы со сбором всех ошибок сразу, а не первой, как
+    в CodeGenerator. Диагностики хранятся по ID узла (None — схема
+    в целом): неподключённые порты, некорректные имена в INPUT,
+    синтаксические ошибки в тексте блоков, BRANCH без MERGE,
+    недостижимые от START блоки и циклы в обход FOR/WHILE.
+
+    check_all() — один линейный проход. update() после правки проверяет
+    заново только затронутую окрестность: текст — сам блок, связи —
+    блоки ниже по потоку (достижимость и циклы) и ветвления выше по
+    потоку (их MERGE). listeners вызываются с ID узла, диагностики
+    которого изменились.
+
+    С state и root правки можно копить через invalidate(): проверка
+    выполняется один раз при простое mainloop.
+    """
+
+    def __init__(self, state=None, root=None):
+        self.state = state
+        self.root = root
+        self.models = {}        # ID -> NodeModel
+        self.issues = {}        # ID узла -> {код: [сообщения]}
+        self.reachable = set()  # узлы, достижимые от START
+        self.listeners = []
+        self.__starts = set()
+        self.__touched = set()
+        self.__pending = {}     # модели, ждущие проверки
+        self.__structure = False
+        self.__scheduled = False
+        self.__paused = False
+
+    # --- результаты ---
+
+    def diagnostics(self, node_id):
+        return [Diagnostic(node_id, code, msg)
+                for code, msgs in self.issues.get(node_id, {}).items() for msg in msgs]
+
+    def all(self):
+        return [d for node_id in self.issues for d in self.diagnostics(node_id)]
+
+    def errors(self):
+        return [d for d in self.all() if d.code not in WARNINGS]
+
+    # --- проверка ---
+
+    def check_all(self, models):
+        """Полная проверка схемы из моделей models."""
+        self.__touched.update(self.issues)
+        self.models = {m.id: m for m in models}
+        self.issues = {}
+        self.reachable = set()
+        self.__starts = {m for m in self.models.values() if m.type == 'START'}
+        for m in self.models.values():
+            self.__check_local(m)
+        self.__check_start()
+        self.__check_region(set(self.models.values()))
+        self.__check_merges([m for m in self.models.values() if m.type == 'BRANCH'])
+        self.__notify()
+
+    def update(self, changed=(), removed=(), structure=False):
+        """
+        Перепроверка после правки: changed — изменённые или добавленные
+        модели, removed — удалённые, structure — менялись связи.
+        """
+        for m in removed:
+            if self.models.get(m.id) is m:
+                del self.models[m.id]
+            self.__starts.discard(m)
+            self.reachable.discard(m)
+            if self.issues.pop(m.id, None):
+                self.__touched.add(m.id)
+        changed = [m for m in changed if m not in removed]
+        for m in changed:
+            self.models[m.id] = m
+            if m.type == 'START':
+                self.__starts.add(m)
+            self.__check_local(m)
+        self.__check_start()
+        if structure or removed:
+            if any(m.type == 'START' for m in list(changed) + list(removed)):
+                region = set(self.models.values())
+            else:
+                region = _closure(changed, _successors)
+            self.__check_region(region)
+            above = _closure(changed, _predecessors)
+            self.__check_merges([m for m in above if m.type == 'BRANCH'])
+        self.__notify()
+
+    def __set(self, node_id, code, messages):
+        issues = self.issues.get(node_id)
+        old = issues.get(code, []) if issues else []
+        if old == messages:
+            return
+        self.__touched.add(node_id)
+        if messages:
+            self.issues.setdefault(node_id, {})[code] = messages
+        elif issues:
+            issues.pop(code, None)
+            if not issues:
+                del self.issues[node_id]
+
+    def __notify(self):
+        touched, self.__touched = self.__touched, set()
+        for node_id in touched:
+            for listener in self.listeners:
+                listener(node_id)
+
+    def __check_local(self, m):
+        ports = []
+        for p in m.ports:
+            if p.connection is not None:
+                continue
+            if p.port_type == 'in':
+                if m.type != 'START' and not (m.type in _LOOPS and p.name == 'in_back'):
+                    ports.append(f"Входной порт {m.id}.{p.name} не подключён")
+            elif m.type != 'END' and not (m.type in _LOOPS and p.name == 'out_end'):
+                ports.append(f"Выходной порт {m.id}.{p.name} не подключён")
+        self.__set(m.id, 'port', ports)
+
+        names = []
+        if m.type == 'INPUT':
+            vars_ = m.content.replace('\n', '').split()
+            if not vars_:
+                names.append(f"Блок {m.id}: нет переменных")
+            names += [f"Блок {m.id}: некорректное имя {v}" for v in vars_ if not IDENT_RE.match(v)]
+        self.__set(m.id, 'input', names)
+
+        syntax = []
+        if m.type in _SYNTAX:
+            kind, default = _SYNTAX[m.type]
+            # разбор кэшируется по тексту: повторная проверка бесплатна
+            error = AstBackend.check(kind, m.content.replace('\n', '').strip() or default)
+            if error is not None:
+                syntax.append(str(AstBackend.BlockSyntaxError(m.id, error)))
+        self.__set(m.id, 'syntax', syntax)
+
+    def __check_start(self):
+        missing = self.models and not self.__starts
+        self.__set(None, 'start', ["Отсутствует блок START"] if missing else [])
+
+    def __check_region(self, region):
+        """
+        Достижимость и циклы для узлов region. region замкнут вниз по
+        потоку, поэтому достижимость остальных узлов от правки не зависит.
+        """
+        reach = self.reachable
+        reach.difference_update(region)
+        seeds = [m for m in region if m in self.__starts
+                 or any(p in reach for p in _predecessors(m) if p not in region)]
+        reach.update(_closure(seeds, lambda m: [s for s in _successors(m) if s in region]))
+        cyclic = _cyclic(region)
+        for m in region:
+            self.__set(m.id, 'unreachable',
+                       [f"Блок {m.id} недостижим от START"]
+                       if self.__starts and m not in reach else [])
+            self.__set(m.id, 'cycle',
+                       [f"Блок {m.id} входит в цикл в обход FOR/WHILE"] if m in cyclic else [])
+
+    def __check_merges(self, branches):
+        """Ветвления, у которых ближайший общий преемник ветвей — не MERGE."""
+        if not branches:
+            return
+        # постдоминаторы BRANCH зависят только от узлов ниже него
+        graph = GraphModel()
+        for m in _closure(branches, _successors):
+            graph.add_node(m)
+        post_dom = graph.post_dominators()
+        for b in branches:
+            issues = []
+            if all(p.connection is not None for p in b.ports if p.port_type == 'out'):
+                merge = post_dom.get(b)
+                if merge is None or merge.type != 'MERGE':
+                    issues.append(f"Блок {b.id}: нет MERGE")
+            self.__set(b.id, 'merge', issues)
+
+    # --- отложенная проверка правок в редакторе ---
+
+    def invalidate(self, *models, structure=False):
+        """Запоминает изменённые модели; проверка — при простое mainloop."""
+        for m in models:
+            self.__pending[m] = None
+        self.__structure |= structure
+        if self.root is not None and not self.__scheduled and not self.__paused:
+            self.__scheduled = True
+            self.root.after_idle(self.flush)
+
+    def flush(self):
+        self.__scheduled = False
+        if self.__paused or not self.__pending:
+            return
+        pending, self.__pending = list(self.__pending), {}
+        structure, self.__structure = self.__structure, False
+        changed, removed = [], []
+        for m in pending:
+            ui = self.state.node(m.id)
+            (changed if ui is not None and ui.model is m else removed).append(m)
+        self.update(changed, removed, structure)
+
+    def pause(self):
+        """Приостанавливает проверку правок (например, на время загрузки)."""
+        self.__paused = True
+
+    def resume(self):
+        """Возобновляет проверку: схема проверяется заново целиком."""
+        self.__paused = False
+        self.__pending.clear()
+        self.__structure = False
+        self.check_all([ui.model for ui in self.state.nodes_ui])
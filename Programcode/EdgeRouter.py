@@ -0,0 +1,203 @@
+import heapq
+
+# направления: вправо, вниз, влево, вверх
+_DIRS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+
+
+def port_direction(ui, port):
+    """Направление (dx, dy), в котором линия отходит от порта блока."""
+    px, py = ui.port_position(port)
+    if py >= ui.y + ui.HEIGHT:
+        return 0, 1
+    if py <= ui.y:
+        return 0, -1
+    if px <= ui.x:
+        return -1, 0
+    if px >= ui.x + ui.WIDTH:
+        return 1, 0
+    # порты внутри фигуры (MERGE): входы сверху, выход снизу
+    return (0, -1) if port.port_type == 'in' else (0, 1)
+
+
+def _simplify(points):
+    """Убирает повторы и промежуточные точки на одной прямой."""
+    out = []
+    for p in points:
+        if out and out[-1] == p:
+            continue
+        if len(out) >= 2:
+            (ax, ay), (bx, by) = out[-2], out[-1]
+            if (ax == bx == p[0]) or (ay == by == p[1]):
+                out[-1] = p
+                continue
+        out.append(p)
+    return out
+
+
+class EdgeRouter:
+    """
+    Ортогональная трассировка связей в обход блоков.
+    Маршрут ищется алгоритмом A* по разреженной сетке: её линии проходят
+    по границам блоков (с зазором MARGIN) вблизи концов связи, штраф BEND
+    за каждый поворот. Если в окне поиска пути нет, окно расширяется;
+    в крайнем случае связь остаётся простым коленом.
+
+    Маршруты хранятся в самих связях (points) и пересчитываются, только
+    когда рядом с маршрутом меняется блок: DiagramState сообщает о
+    перемещении, и по индексу отрезков находятся задетые связи. Пересчёт
+    откладывается до простоя и выполняется только для связей с созданной
+    графикой; остальные прокладываются при появлении на экране.
+    """
+    MARGIN = 10      # зазор между линией и блоком
+    CLEAR = 20       # длина отрезка от порта до начала поиска
+    BEND = 40        # штраф за поворот (в пикселях длины)
+    PAD = 80         # запас окна поиска вокруг концов связи
+    ATTEMPTS = 3     # сколько раз окно удваивается
+
+    def __init__(self, state, viewport, root):
+        self.state = state
+        self.viewport = viewport
+        self.root = root
+        self.dirty = set()      # автоматические связи с устаревшим маршрутом
+        self.routed = 0         # счётчик прокладок (для замеров и тестов)
+        self.__pending = False
+        state.node_listeners.append(self.__node_changed)
+
+    def invalidate(self, conn):
+        """Помечает маршрут связи устаревшим; пересчёт — при простое."""
+        if not conn.routed:
+            return
+        self.dirty.add(conn)
+        if not self.__pending:
+            self.__pending = True
+            self.root.after_idle(self.flush)
+
+    def flush(self):
+        """Прокладывает устаревшие маршруты связей, графика которых создана."""
+        self.__pending = False
+        for conn in [c for c in self.viewport.connections if c in self.dirty]:
+            self.ensure(conn)
+
+    def ensure(self, conn):
+        """Прокладывает маршрут связи сейчас, если он устарел."""
+        if conn in self.dirty:
+            self.dirty.discard(conn)
+            if conn.routed and conn in self.state.connections:
+                conn.set_route(self.route(conn.src_ui, conn.sp, conn.dst_ui, conn.dp)
+                               or conn.default_points())
+
+    def __node_changed(self, ui, old, new):
+        m = self.MARGIN + self.CLEAR
+        for box in (old, new):
+            if box is None:
+                continue
+            x0, y0, x1, y1 = box
+            for conn, _ in self.state.edge_index.query(x0 - m, y0 - m, x1 + m, y1 + m):
+                self.invalidate(conn)
+
+    # --- поиск пути ---
+
+    def __stub(self, ui, port):
+        # точка за пределами зазора вокруг блока по направлению порта
+        px, py = ui.port_position(port)
+        dx, dy = port_direction(ui, port)
+        x0, y0, x1, y1 = ui.bbox()
+        d = self.MARGIN + self.CLEAR
+        if dx:
+            return (x1 + d if dx > 0 else x0 - d), py
+        return px, (y1 + d if dy > 0 else y0 - d)
+
+    def route(self, src_ui, sp, dst_ui, dp):
+        """Ломаная от порта sp к порту dp в обход блоков или None."""
+        self.routed += 1
+        p0, p1 = src_ui.port_position(sp), dst_ui.port_position(dp)
+        s, t = self.__stub(src_ui, sp), self.__stub(dst_ui, dp)
+        d0 = _DIRS.index(port_direction(src_ui, sp))
+        # к порту приёмника подходим против его направления
+        dx, dy = port_direction(dst_ui, dp)
+        d1 = _DIRS.index((-dx, -dy))
+        pad = self.PAD
+        for _ in range(self.ATTEMPTS):
+            window = (min(s[0], t[0]) - pad, min(s[1], t[1]) - pad,
+                      max(s[0], t[0]) + pad, max(s[1], t[1]) + pad)
+            path = self.__search(s, t, d0, d1, window)
+            if path is not None:
+                return _simplify([p0] + path + [p1])
+            pad *= 2
+        return None
+
+    def __search(self, s, t, d0, d1, window):
+        wx0, wy0, wx1, wy1 = window
+        m = self.MARGIN
+        obstacles = []
+        for ui in self.state.node_index.query(*window):
+            x0, y0, x1, y1 = ui.bbox()
+            box = (x0 - m, y0 - m, x1 + m, y1 + m)
+            # блок, в зазор которого попал конец, не мешает из него выйти
+            if any(box[0] < px < box[2] and box[1] < py < box[3] for px, py in (s, t)):
+                continue
+            obstacles.append(box)
+
+        xs = {wx0, wx1, s[0], t[0], (s[0] + t[0]) / 2}
+        ys = {wy0, wy1, s[1], t[1], (s[1] + t[1]) / 2}
+        for x0, y0, x1, y1 in obstacles:
+            xs.update((x0, x1))
+            ys.update((y0, y1))
+        xs = sorted(x for x in xs if wx0 <= x <= wx1)
+        ys = sorted(y for y in ys if wy0 <= y <= wy1)
+        # препятствия, пересекающие каждую вертикаль и горизонталь сетки
+        col = [[(y0, y1) for x0, y0, x1, y1 in obstacles if x0 < x < x1] for x in xs]
+        row = [[(x0, x1) for x0, y0, x1, y1 in obstacles if y0 < y < y1] for y in ys]
+
+        def free(i, j, d):
+            # отрезок от узла (i, j) к соседнему в направлении d
+            dx, dy = _DIRS[d]
+            ni, nj = i + dx, j + dy
+            if not (0 <= ni < len(xs) and 0 <= nj < len(ys)):
+                return None
+            if dx:
+                mid = (xs[i] + xs[ni]) / 2
+                blocked = any(a < mid < b for a, b in row[j])
+            else:
+                mid = (ys[j] + ys[nj]) / 2
+                blocked = any(a < mid < b for a, b in col[i])
+            return None if blocked else (ni, nj)
+
+        start = (xs.index(s[0]), ys.index(s[1]))
+        goal = (xs.index(t[0]), ys.index(t[1]))
+        tx, ty = t
+
+        def h(i, j):
+            return abs(xs[i] - tx) + abs(ys[j] - ty)
+
+        best = {(start, d0): 0}
+        parent = {}
+        heap = [(h(*start), 0, start, d0)]
+        while heap:
+            _, cost, node, d = heapq.heappop(heap)
+            if cost > best.get((node, d), cost):
+                continue
+            if node == goal:
+                path = [node]
+                key = (node, d)
+                while key in parent:
+                    key = parent[key]
+                    path.append(key[0])
+                return [(xs[i], ys[j]) for i, j in reversed(path)]
+            i, j = node
+            for nd in range(4):
+                # разворот на месте бессмыслен
+                if nd == (d + 2) % 4:
+                    continue
+                nxt = free(i, j, nd)
+                if nxt is None:
+                    continue
+                step = abs(xs[nxt[0]] - xs[i]) + abs(ys[nxt[1]] - ys[j])
+                c = cost + step + (self.BEND if nd != d else 0)
+                if nxt == goal and nd != d1:
+                    c += self.BEND
+                if c < best.get((nxt, nd), float('inf')):
+                    best[(nxt, nd)] = c
+                    parent[(nxt, nd)] = (node, d)
+                    heapq.heappush(heap, (c + h(*nxt), c, nxt, nd))
+        return None
@@ -1,11 +1,154 @@
+from NodeModel import NodeModel
+
+
 class GraphModel:
     def __init__(self):
         self.nodes = []
+        self.start = None
+        # Индекс преемников: node -> {имя выходного порта: узел-приёмник}
+        self.successors = {}
+        # Следующий узел по основному потоку (для циклов — выход out_end)
+        self.flow_next = {}
+        # Порядковый номер узла в self.nodes (для битовых карт обхода)
+        self.ordinal = {}
+        # узел по ID
+        self.by_id = {}
+
     def add_node(self, node):
         self.nodes.append(node)
+        if node.type == 'START' and self.start is None:
+            self.start = node
+
     def remove_node(self, node):
         self.nodes.remove(node)
+        # номера узлов сдвинулись — индекс нужно перестроить
+        self.successors = {}
+        self.flow_next = {}
+        self.ordinal = {}
+        self.by_id = {}
+        if node is self.start:
+            self.start = next((n for n in self.nodes if n.type == 'START'), None)
+
+    @classmethod
+    def snapshot(cls, nodes):
+        """
+        Независимая копия узлов и соединений между ними. Копию можно
+        обходить в другом потоке, пока исходные модели правятся.
+        """
+        graph = cls()
+        copies = {}
+        for n in nodes:
+            copies[n] = c = NodeModel(n.id, n.type, n.content)
+            graph.add_node(c)
+        for n, c in copies.items():
+            for p in n.ports:
+                other = p.connection
+                if other is not None and other.parent in copies:
+                    c.port_map[p.name].connection = copies[other.parent].port_map[other.name]
+        return graph
+
     def find_start(self):
+        return self.start
+
+    def build_index(self):
+        """
+        Перестраивает индекс преемников по текущим соединениям портов.
+        Вызывается один раз перед обходом графа: O(узлы + порты).
+        """
+        successors = {}
+        flow_next = {}
         for n in self.nodes:
-            if n.type == 'START': return n
-        return None
\ No newline at end of file
+            outs = {}
+            first = None
+            for p in n.ports:
+                if p.port_type != 'out':
+                    continue
+                dst = p.connection.parent if p.connection else None
+                outs[p.name] = dst
+                if first is None:
+                    first = p.name
+            successors[n] = outs
+            if n.type in ('FOR', 'WHILE'):
+                flow_next[n] = outs.get('out_end')
+            else:
+                flow_next[n] = outs.get(first) if first else None
+        self.successors = successors
+        self.flow_next = flow_next
+        self.ordinal = {n: i for i, n in enumerate(self.nodes)}
+        self.by_id = {n.id: n for n in self.nodes}
+        return successors
+
+    def post_dominators(self):
+        """
+        Непосредственные постдоминаторы узлов (алгоритм Cooper–Harvey–Kennedy
+        на обращённом графе портов). Все блоки END и неподключённые выходы
+        сводятся к виртуальному выходу.
+        Возвращает dict node -> ближайший постдоминатор или None, если им
+        является виртуальный выход либо выход из узла недостижим.
+        """
+        if len(self.successors) != len(self.nodes):
+            self.build_index()
+        nodes = self.nodes
+        exit_ = len(nodes)
+        ordinal = self.ordinal
+
+        # прямые рёбра (в виде порядковых номеров) и обратные к ним
+        succ = []
+        preds = [[] for _ in range(exit_ + 1)]
+        for i, n in enumerate(nodes):
+            outs = self.successors[n].values()
+            targets = []
+            for dst in outs or (None,):
+                j = ordinal.get(dst, exit_) if dst is not None else exit_
+                if j not in targets:
+                    targets.append(j)
+                    preds[j].append(i)
+            succ.append(targets)
+
+        # обратный постпорядок обращённого графа от виртуального выхода
+        postnum = [-1] * (exit_ + 1)
+        order = []
+        visited = bytearray(exit_ + 1)
+        visited[exit_] = 1
+        stack = [(exit_, iter(preds[exit_]))]
+        while stack:
+            v, it = stack[-1]
+            for w in it:
+                if not visited[w]:
+                    visited[w] = 1
+                    stack.append((w, iter(preds[w])))
+                    break
+            else:
+                stack.pop()
+                postnum[v] = len(order)
+                order.append(v)
+
+        idom = [None] * (exit_ + 1)
+        idom[exit_] = exit_
+
+        def intersect(a, b):
+            while a != b:
+                while postnum[a] < postnum[b]:
+                    a = idom[a]
+                while postnum[b] < postnum[a]:
+                    b = idom[b]
+            return a
+
+        changed = True
+        while changed:
+            changed = False
+            for v in reversed(order):
+                if v == exit_:
+                    continue
+                new = None
+                for s in succ[v]:
+                    if idom[s] is not None:
+                        new = s if new is None else intersect(s, new)
+                if idom[v] != new:
+                    idom[v] = new
+                    changed = True
+
+        return {
+            n: (nodes[idom[i]] if idom[i] is not None and idom[i] != exit_ else None)
+            for i, n in enumerate(nodes)
+        }
@@ -0,0 +1,210 @@
+from collections import deque
+from contextlib import contextmanager
+from NodeModel import NodeModel
+
+# Операции правки — кортежи из строк, чисел и списков точек:
+#   ('add_node', id, type, content, x, y)    ('del_node', id, type, content, x, y)
+#   ('move', id, dx, dy)                     ('edit', id, old, new)
+#   ('add_edge', src, sport, dst, dport, inner)
+#   ('del_edge', src, sport, dst, dport, inner)
+#   ('bend_add', src, sport, idx, point)     ('bend_del', src, sport, idx, point)
+#   ('bend_move', src, sport, idx, old, new)
+# Связь однозначно задаётся выходным портом (src, sport): к нему
+# подключается не больше одной связи.
+
+_INVERSE_NAME = {
+    'add_node': 'del_node', 'del_node': 'add_node',
+    'add_edge': 'del_edge', 'del_edge': 'add_edge',
+    'bend_add': 'bend_del', 'bend_del': 'bend_add',
+}
+
+
+def inverse(op):
+    """Операция, отменяющая op."""
+    name = op[0]
+    if name in _INVERSE_NAME:
+        return (_INVERSE_NAME[name],) + op[1:]
+    if name == 'move':
+        return ('move', op[1], -op[2], -op[3])
+    if name == 'edit':
+        return ('edit', op[1], op[3], op[2])
+    if name == 'bend_move':
+        return op[:4] + (op[5], op[4])
+    raise ValueError(f"Неизвестная операция: {name}")
+
+
+def _merge(last, op):
+    """Склеивает две операции одного перетаскивания или возвращает None."""
+    if last[0] != op[0]:
+        return None
+    if op[0] == 'move' and last[1] == op[1]:
+        return ('move', op[1], last[2] + op[2], last[3] + op[3])
+    if op[0] == 'bend_move' and last[1:4] == op[1:4]:
+        return last[:5] + (op[5],)
+    return None
+
+
+def op_size(op):
+    """Примерный объём операции в памяти, байт."""
+    size = 56 + 8 * len(op)
+    for v in op:
+        if isinstance(v, str):
+            size += 49 + len(v)
+        elif isinstance(v, (list, tuple)):
+            size += 56 + 64 * len(v)
+        else:
+            size += 24
+    return size
+
+
+class _Entry:
+    __slots__ = ('ops', 'size', 'open')
+
+    def __init__(self, ops, open_=False):
+        self.ops = ops
+        self.size = sum(op_size(op) for op in ops)
+        self.open = open_
+
+
+class History:
+    """
+    Отмена и повтор правок схемы. Хранятся не копии схемы, а операции
+    (разности): перемещение — сдвиг, правка — старый и новый текст и т.п.
+    Поток перетаскивания одного узла или сгиба склеивается в одну запись,
+    пока запись открыта (до seal(), например при отпускании кнопки).
+    Объём истории ограничен max_bytes и max_entries — старые записи
+    вытесняются. listeners вызываются с каждой выполненной операцией,
+    включая отмену и повтор.
+    """
+    MAX_BYTES = 1 << 20
+    MAX_ENTRIES = 1000
+
+    def __init__(self, app, max_bytes=MAX_BYTES, max_entries=MAX_ENTRIES):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.bytes = 0
+        self.listeners = []
+        self.__group = None
+        self.__depth = 0
+        self.__applying = False
+
+    def record(self, op, coalesce=False):
+        """Запоминает выполненную операцию (во время отмены/повтора — игнорируется)."""
+        if self.__applying:
+            return
+        self.__notify(op)
+        self.redo_stack.clear()
+        if self.__group is not None:
+            self.__group.append(op)
+            return
+        last = self.undo_stack[-1] if self.undo_stack else None
+        if coalesce and last is not None and last.open:
+            merged = _merge(last.ops[-1], op)
+            if merged is not None:
+                last.ops[-1] = merged
+                return
+        if last is not None:
+            last.open = False
+        self.__push(_Entry([op], coalesce))
+
+    def seal(self):
+        """Закрывает последнюю запись: следующие сдвиги начнут новую."""
+        if self.undo_stack:
+            self.undo_stack[-1].open = False
+
+    @contextmanager
+    def transaction(self):
+        """Все операции внутри блока with отменяются одной записью."""
+        self.__depth += 1
+        if self.__depth == 1:
+            self.__group = []
+        try:
+            yield
+        finally:
+            self.__depth -= 1
+            if self.__depth == 0:
+                ops, self.__group = self.__group, None
+                if ops and not self.__applying:
+                    self.seal()
+                    self.__push(_Entry(ops))
+
+    def __push(self, entry):
+        self.undo_stack.append(entry)
+        self.bytes += entry.size
+        while self.undo_stack and (self.bytes > self.max_bytes
+                                   or len(self.undo_stack) > self.max_entries):
+            self.bytes -= self.undo_stack.popleft().size
+
+    def can_undo(self):
+        return bool(self.undo_stack) and self.__group is None
+
+    def can_redo(self):
+        return bool(self.redo_stack) and self.__group is None
+
+    def undo(self):
+        if not self.can_undo():
+            return False
+        entry = self.undo_stack.pop()
+        self.bytes -= entry.size
+        entry.open = False
+        self.__apply([inverse(op) for op in reversed(entry.ops)])
+        self.redo_stack.append(entry)
+        return True
+
+    def redo(self):
+        if not self.can_redo():
+            return False
+        entry = self.redo_stack.pop()
+        self.__apply(entry.ops)
+        self.__push(entry)
+        return True
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self.bytes = 0
+
+    def __notify(self, op):
+        for listener in self.listeners:
+            listener(op)
+
+    def __apply(self, ops):
+        self.__applying = True
+        try:
+            for op in ops:
+                self.__execute(op)
+                self.__notify(op)
+        finally:
+            self.__applying = False
+        self.app.viewport.schedule_refresh()
+
+    def __execute(self, op):
+        app = self.app
+        state = app.diagram_state
+        name = op[0]
+        if name == 'add_node':
+            _, node_id, ntype, content, x, y = op
+            app.add_node(NodeModel(node_id, ntype, content), x, y)
+        elif name == 'del_node':
+            app.delete_node(state.node(op[1]))
+        elif name == 'move':
+            state.node(op[1]).move_by(op[2], op[3])
+        elif name == 'edit':
+            state.node(op[1]).set_content(op[3])
+        elif name == 'add_edge':
+            _, src, sport, dst, dport, inner = op
+            su, du = state.node(src), state.node(dst)
+            app.connect(su, su.model.port(sport), du, du.model.port(dport), inner)
+        elif name == 'del_edge':
+            app.disconnect(app.find_connection(op[1], op[2]))
+        elif name == 'bend_add':
+            app.find_connection(op[1], op[2]).insert_bend(op[3], tuple(op[4]))
+        elif name == 'bend_del':
+            app.find_connection(op[1], op[2]).remove_bend(op[3])
+        elif name == 'bend_move':
+            app.find_connection(op[1], op[2]).move_bend(op[3], tuple(op[5]))
+        else:
+            raise ValueError(f"Неизвестная операция: {name}")
@@ -0,0 +1,273 @@
+"""
+Журнал правок для автосохранения: снимок поколения (snapshot-g.rgzd)
+и операции после него (journal-g.jsonl); recover() восстанавливает схему.
+"""
+import json
+import os
+import queue
+import re
+import threading
+import time
+
+from DiagramData import read_diagram, write_diagram
+
+_SNAPSHOT_RE = re.compile(r'^snapshot-(\d+)\.rgzd$')
+
+
+def _snapshot_path(directory, gen):
+    return os.path.join(directory, f'snapshot-{gen}.rgzd')
+
+
+def _journal_path(directory, gen):
+    return os.path.join(directory, f'journal-{gen}.jsonl')
+
+
+def replay(data, ops):
+    """
+    Применяет операции правки к словарю диаграммы ({'nodes', 'edges'})
+    и возвращает новый словарь. Узлы и рёбра индексируются по ключу,
+    поэтому каждая операция выполняется за O(1) (кроме правки сгибов —
+    O(число сгибов ребра)).
+    """
+    nodes = {n['id']: dict(n) for n in data.get('nodes', [])}
+    edges = {(e['from_node'], e['from_port']): dict(e) for e in data.get('edges', [])}
+    for op in ops:
+        name = op[0]
+        if name == 'add_node':
+            _, node_id, ntype, content, x, y = op
+            nodes[node_id] = {'id': node_id, 'type': ntype, 'content': content, 'x': x, 'y': y}
+        elif name == 'del_node':
+            nodes.pop(op[1], None)
+        elif name == 'move':
+            n = nodes[op[1]]
+            n['x'] += op[2]
+            n['y'] += op[3]
+        elif name == 'edit':
+            nodes[op[1]]['content'] = op[3]
+        elif name == 'add_edge':
+            _, src, sport, dst, dport, inner = op
+            edges[(src, sport)] = {'from_node': src, 'from_port': sport,
+                                   'to_node': dst, 'to_port': dport,
+                                   'points': [list(p) for p in inner] if inner else None}
+        elif name == 'del_edge':
+            edges.pop((op[1], op[2]), None)
+        else:
+            e = edges[(op[1], op[2])]
+            inner = e['points'] or []
+            # номер сгиба в операции считается по всей ломаной (0 — начало)
+            i = op[3] - 1
+            if name == 'bend_add':
+                inner.insert(i, list(op[4]))
+            elif name == 'bend_del':
+                inner.pop(i)
+            elif name == 'bend_move':
+                inner[i] = list(op[5])
+            else:
+                raise ValueError(f"Неизвестная операция: {name}")
+            e['points'] = inner or None
+    out = {'nodes': list(nodes.values()), 'edges': list(edges.values())}
+    # параметры генерации правками не меняются — переходят из снимка
+    if 'options' in data:
+        out['options'] = data['options']
+    return out
+
+
+def _read_ops(path):
+    ops = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().split('\n')
+    except FileNotFoundError:
+        return ops
+    for i, line in enumerate(lines):
+        if not line:
+            continue
+        try:
+            ops.append(json.loads(line))
+        except ValueError:
+            # запись, оборванная сбоем, может быть только последней
+            if any(lines[i + 1:]):
+                raise
+            break
+    return ops
+
+
+def _generations(directory):
+    gens = []
+    for name in os.listdir(directory):
+        m = _SNAPSHOT_RE.match(name)
+        if m:
+            gens.append(int(m.group(1)))
+    return sorted(gens)
+
+
+def recover(directory):
+    """
+    Схема из последнего снимка с применённым журналом или None,
+    если в каталоге нет автосохранения.
+    """
+    if not os.path.isdir(directory):
+        return None
+    gens = _generations(directory)
+    if not gens:
+        return None
+    gen = gens[-1]
+    data = read_diagram(_snapshot_path(directory, gen))
+    ops = _read_ops(_journal_path(directory, gen))
+    return replay(data, ops) if ops else data
+
+
+def set_aside(directory):
+    """
+    Переносит нечитаемое автосохранение в соседний каталог
+    directory-broken-<время>, чтобы новый журнал его не стёр.
+    Возвращает новый путь; OSError — перенести не удалось.
+    """
+    base = f"{directory.rstrip(os.sep)}-broken-{time.strftime('%Y%m%d-%H%M%S')}"
+    target, i = base, 2
+    while os.path.exists(target):
+        target = f'{base}-{i}'
+        i += 1
+    os.rename(directory, target)
+    return target
+
+
+class Journal:
+    """
+    Фоновая запись журнала правок. append() и reset() только кладут
+    задание в очередь; вся работа с диском идёт в отдельном потоке.
+    """
+    FLUSH_INTERVAL = 0.5           # с: сколько собирать пачку до fsync
+    COMPACT_OPS = 20000            # свернуть журнал после стольких операций
+    COMPACT_BYTES = 8 << 20        # … или при таком размере файла
+
+    def __init__(self, directory, flush_interval=FLUSH_INTERVAL,
+                 compact_ops=COMPACT_OPS, compact_bytes=COMPACT_BYTES):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.compact_ops = compact_ops
+        self.compact_bytes = compact_bytes
+        self.error = None          # последняя ошибка записи (поток не падает)
+        os.makedirs(directory, exist_ok=True)
+        gens = _generations(directory)
+        self.gen = gens[-1] if gens else 0
+        self.__queue = queue.Queue()
+        self.__file = None
+        self.__ops = 0
+        self.__thread = threading.Thread(target=self.__run, name='journal', daemon=True)
+        self.__thread.start()
+
+    # --- вызывается из потока окна ---
+
+    def append(self, op):
+        self.__queue.put(('op', op))
+
+    def reset(self, data):
+        """Начинает новое поколение со снимком data (после загрузки, очистки, сохранения)."""
+        self.__queue.put(('reset', data))
+
+    def flush(self, timeout=None):
+        """Ждёт, пока всё поставленное в очередь окажется на диске."""
+        done = threading.Event()
+        self.__queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def close(self, discard=False):
+        """Останавливает поток; discard=True — удаляет автосохранение (штатный выход)."""
+        self.__queue.put(('close', discard))
+        self.__thread.join()
+
+    # --- фоновый поток ---
+
+    def __run(self):
+        q = self.__queue
+        running = True
+        while running:
+            batch = [q.get()]
+            deadline = time.monotonic() + self.flush_interval
+            # собираем пачку, пока не истёк интервал или не пришла команда
+            while batch[-1][0] == 'op':
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(q.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                running = self.__process(batch)
+            except Exception as e:
+                self.error = e
+                running = batch[-1][0] != 'close'
+                if batch[-1][0] == 'flush':
+                    batch[-1][1].set()
+
+    def __process(self, batch):
+        lines = []
+        for kind, arg in batch:
+            if kind == 'op':
+                lines.append(json.dumps(arg, ensure_ascii=False))
+                continue
+            self.__write(lines)
+            lines = []
+            if kind == 'reset':
+                self.__start_generation(arg)
+            elif kind == 'flush':
+                arg.set()
+            elif kind == 'close':
+                self.__close_file()
+                if arg:
+                    self.__remove_all()
+                return False
+        self.__write(lines)
+        if self.__ops >= self.compact_ops or (
+                self.__file is not None and self.__file.tell() >= self.compact_bytes):
+            self.__compact()
+        return True
+
+    def __write(self, lines):
+        if not lines:
+            return
+        if self.__file is None:
+            if not os.path.exists(_snapshot_path(self.directory, self.gen)):
+                # журнал без снимка не восстановить — начинаем с пустой схемы
+                self.__start_generation({'nodes': [], 'edges': []})
+            self.__file = open(_journal_path(self.directory, self.gen), 'a', encoding='utf-8')
+        self.__file.write('\n'.join(lines) + '\n')
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        self.__ops += len(lines)
+
+    def __close_file(self):
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __compact(self):
+        self.__close_file()
+        data = read_diagram(_snapshot_path(self.directory, self.gen))
+        ops = _read_ops(_journal_path(self.directory, self.gen))
+        self.__start_generation(replay(data, ops))
+
+    def __start_generation(self, data):
+        self.__close_file()
+        gen = self.gen + 1
+        path = _snapshot_path(self.directory, gen)
+        tmp = path + '.tmp.rgzd'
+        write_diagram(data, tmp)
+        with open(tmp, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        # новый снимок на месте — старые поколения больше не нужны
+        old, self.gen = self.gen, gen
+        self.__ops = 0
+        self.__remove_generations(set(_generations(self.directory)) - {gen} | {old})
+
+    def __remove_all(self):
+        self.__remove_generations(set(_generations(self.directory)) | {self.gen})
+
+    def __remove_generations(self, gens):
+        for g in gens:
+            for p in (_snapshot_path(self.directory, g), _journal_path(self.directory, g)):
+                if os.path.exists(p):
+                    os.remove(p)
@@ -0,0 +1,285 @@
+"""Автоматическая послойная раскладка схемы (метод Сугиямы); числовые этапы — на NumPy."""
+import numpy as np
+
+# размер блока по умолчанию — как NodeUI.MIN_WIDTH × NodeUI.MIN_HEIGHT
+DEFAULT_SIZE = (140, 70)
+
+# в какую сторону от блока уходит ребро из порта / приходит в порт
+_OUT_SIDE = {'out_false': -1.0, 'out_true': 1.0, 'out_end': 1.0}
+_IN_SIDE = {'in1': -1.0, 'in2': 1.0}
+
+
+def _gather(offsets, items):
+    """Индексы рёбер CSR-списка для узлов items (все диапазоны подряд)."""
+    lo = offsets[items]
+    cnt = offsets[items + 1] - lo
+    total = int(cnt.sum())
+    starts = np.repeat(lo - np.cumsum(cnt) + cnt, cnt)
+    return starts + np.arange(total)
+
+
+def _collect_edges(nodes, index):
+    """
+    Рёбра между узлами списка: (u, v, out_side, in_side, virtual).
+    Обратные рёбра циклов пропускаются, вместо них — ограничения выхода.
+    """
+    edges = []
+    for i, m in enumerate(nodes):
+        for p in m.ports:
+            other = p.connection
+            if p.port_type != 'out' or other is None:
+                continue
+            j = index.get(other.parent)
+            if j is None or other.name == 'in_back':
+                continue
+            edges.append((i, j, _OUT_SIDE.get(p.name, 0.0), _IN_SIDE.get(other.name, 0.0), False))
+        if m.type in ('FOR', 'WHILE'):
+            back, end = m.port('in_back').connection, m.port('out_end').connection
+            if back is None or end is None:
+                continue
+            tail, exit_ = index.get(back.parent), index.get(end.parent)
+            if tail is not None and exit_ is not None and tail != exit_:
+                edges.append((tail, exit_, 0.0, 0.0, True))
+    return edges
+
+
+def _break_cycles(n, edges, first):
+    """
+    Делает граф ациклическим: обратное ребро поиска в глубину
+    разворачивается, а ограничение (virtual) отбрасывается.
+    Возвращает (рёбра, порядок обнаружения узлов).
+    """
+    adj = [[] for _ in range(n)]
+    # соседи по возрастанию стороны: ветвь «нет» обходится первой
+    for k in sorted(range(len(edges)), key=lambda k: edges[k][2]):
+        adj[edges[k][0]].append(k)
+    state = bytearray(n)          # 0 — не посещён, 1 — в стеке, 2 — готов
+    discovered = []
+    keep = [True] * len(edges)
+    flip = [False] * len(edges)
+    roots = ([first] if first is not None else []) + list(range(n))
+    for root in roots:
+        if state[root]:
+            continue
+        state[root] = 1
+        discovered.append(root)
+        stack = [(root, iter(adj[root]))]
+        while stack:
+            v, it = stack[-1]
+            for k in it:
+                w = edges[k][1]
+                if state[w] == 1:
+                    if edges[k][4]:
+                        keep[k] = False
+                    else:
+                        flip[k] = True
+                elif state[w] == 0:
+                    state[w] = 1
+                    discovered.append(w)
+                    stack.append((w, iter(adj[w])))
+                    break
+            else:
+                state[v] = 2
+                stack.pop()
+    out = []
+    for k, (u, v, so, si, virtual) in enumerate(edges):
+        if not keep[k]:
+            continue
+        if flip[k]:
+            # у развёрнутого ребра стороны портов теряют смысл
+            out.append((v, u, 0.0, 0.0, virtual))
+        else:
+            out.append((u, v, so, si, virtual))
+    return out, discovered
+
+
+def _longest_path_layers(n, src, dst):
+    """Номер слоя каждого узла: длина самого длинного пути от истока."""
+    layer = np.zeros(n, dtype=np.int64)
+    if not len(src):
+        return layer
+    order = np.argsort(src, kind='stable')
+    s, d = src[order], dst[order]
+    offsets = np.searchsorted(s, np.arange(n + 1))
+    indeg = np.bincount(d, minlength=n)
+    frontier = np.flatnonzero(indeg == 0)
+    while frontier.size:
+        e = _gather(offsets, frontier)
+        if not e.size:
+            break
+        es, ed = s[e], d[e]
+        np.maximum.at(layer, ed, layer[es] + 1)
+        np.subtract.at(indeg, ed, 1)
+        frontier = np.unique(ed[indeg[ed] == 0])
+    return layer
+
+
+def _split_long_edges(n, layer, src, dst, out_side, in_side):
+    """
+    Разбивает рёбра длиннее одного слоя цепочками фиктивных узлов.
+    Возвращает (слои всех узлов, отрезки: начало, конец, стороны).
+    """
+    k = layer[dst] - layer[src] - 1
+    total = int(k.sum())
+    edge_of = np.repeat(np.arange(len(src)), k)
+    step = np.arange(total) - np.repeat(np.cumsum(k) - k, k) + 1   # 1..k
+    dummy = n + np.arange(total)
+    first = step == 1
+    # отрезки, входящие в фиктивные узлы: предыдущий узел цепочки → фиктивный
+    a_src = np.where(first, src[edge_of], dummy - 1)
+    a_out = np.where(first, out_side[edge_of], 0.0)
+    # последний отрезок каждого ребра: последний узел цепочки → приёмник
+    last = np.where(k > 0, n + np.cumsum(k) - 1, src)
+    b_out = np.where(k > 0, 0.0, out_side)
+    seg_src = np.concatenate([a_src, last])
+    seg_dst = np.concatenate([dummy, dst])
+    seg_out = np.concatenate([a_out, b_out])
+    seg_in = np.concatenate([np.zeros(total), in_side])
+    layers = np.concatenate([layer, layer[src[edge_of]] + step])
+    return layers, seg_src, seg_dst, seg_out, seg_in
+
+
+class _Layers:
+    """Узлы, сгруппированные по слоям, и их номера внутри слоя."""
+
+    def __init__(self, layers, key):
+        order = np.lexsort((key, layers))
+        self.bounds = np.searchsorted(layers[order], np.arange(int(layers.max()) + 2))
+        self.members = order
+        self.pos = np.empty(len(layers))
+        self.pos[order] = np.arange(len(layers)) - self.bounds[layers[order]]
+        self.layers = layers
+
+    def slices(self, reverse=False):
+        rng = range(len(self.bounds) - 1)
+        for l in (reversed(rng) if reverse else rng):
+            lo, hi = self.bounds[l], self.bounds[l + 1]
+            if hi - lo > 1:
+                yield l, self.members[lo:hi]
+
+
+def _reduce_crossings(lay, seg_src, seg_dst, seg_out, seg_in, sweeps):
+    """Барицентрические проходы вверх (по нижним соседям) и вниз (по верхним)."""
+    pos, layers = lay.pos, lay.layers
+    n_layers = len(lay.bounds) - 1
+    # отрезки, сгруппированные по слою приёмника и по слою источника
+    by_dst = np.argsort(layers[seg_dst], kind='stable')
+    dst_bounds = np.searchsorted(layers[seg_dst][by_dst], np.arange(n_layers + 1))
+    by_src = np.argsort(layers[seg_src], kind='stable')
+    src_bounds = np.searchsorted(layers[seg_src][by_src], np.arange(n_layers + 1))
+
+    def sweep(l, ids, seg, bounds, near, far, side):
+        e = seg[bounds[l]:bounds[l + 1]]
+        local = pos[near[e]].astype(np.int64)
+        w = np.bincount(local, minlength=len(ids))
+        total = np.bincount(local, weights=pos[far[e]] + 0.25 * side[e], minlength=len(ids))
+        current = pos[ids]
+        # ids упорядочены по слою; переводим в порядок текущих позиций
+        by_pos = np.empty(len(ids), dtype=np.int64)
+        by_pos[current.astype(np.int64)] = ids
+        bary = np.where(w > 0, total / np.maximum(w, 1), np.arange(len(ids)))
+        order = np.lexsort((np.arange(len(ids)), bary))
+        pos[by_pos[order]] = np.arange(len(ids))
+
+    # последним идёт проход вниз: при споре стороны выходов BRANCH
+    # важнее сторон входов MERGE
+    for _ in range(sweeps):
+        for l, ids in lay.slices(reverse=True):
+            if l < n_layers - 1:
+                sweep(l, ids, by_src, src_bounds, seg_src, seg_dst, seg_in)
+        for l, ids in lay.slices():
+            if l:
+                sweep(l, ids, by_dst, dst_bounds, seg_dst, seg_src, seg_out)
+
+
+def _grouped_accumulate(values, groups, func):
+    """func.accumulate (maximum/minimum) отдельно в каждой группе подряд идущих."""
+    span = float(np.abs(values).max()) * 2 + 1
+    shift = groups * span
+    return func.accumulate(values + shift) - shift
+
+
+def _assign_x(lay, widths, seg_src, seg_dst, delta, h_gap, iterations):
+    """Центры узлов по X: притяжение к соседям и раздвигание перекрытий."""
+    seq = np.lexsort((lay.pos, lay.layers))
+    groups = lay.layers[seq]
+    w = widths[seq]
+    same = np.concatenate([[False], groups[1:] == groups[:-1]])
+    # минимальное расстояние между центрами соседей в слое
+    gap = np.where(same, np.concatenate([[0.0], (w[1:] + w[:-1]) / 2 + h_gap]), 0.0)
+    run = np.cumsum(gap)
+    offset = run - np.maximum.accumulate(np.where(same, 0.0, run))
+
+    n = len(widths)
+    deg = np.bincount(seg_src, minlength=n) + np.bincount(seg_dst, minlength=n)
+    # начальное положение: слой уложен плотно и отцентрован по нулю
+    centre = np.bincount(groups, weights=offset) / np.maximum(np.bincount(groups), 1)
+    x = np.empty(n)
+    x[seq] = offset - centre[groups]
+    for _ in range(iterations):
+        pull = (np.bincount(seg_dst, weights=x[seg_src] + delta, minlength=n)
+                + np.bincount(seg_src, weights=x[seg_dst] - delta, minlength=n))
+        want = np.where(deg > 0, pull / np.maximum(deg, 1), x)[seq] - offset
+        left = _grouped_accumulate(want, groups, np.maximum)
+        right = _grouped_accumulate(want[::-1], groups[::-1], np.minimum)[::-1]
+        x[seq] = (left + right) / 2 + offset
+    return x
+
+
+def layered_layout(nodes, size=None, h_gap=40, v_gap=50, origin=(40, 40),
+                   sweeps=4, iterations=12):
+    """
+    Раскладывает блоки по слоям сверху вниз.
+    nodes — список NodeModel (связи берутся из их портов; связи с блоками
+    вне списка не учитываются); size(model) -> (ширина, высота), по
+    умолчанию DEFAULT_SIZE. Возвращает dict model -> (x, y) левого
+    верхнего угла блока.
+    """
+    n = len(nodes)
+    if not n:
+        return {}
+    index = {m: i for i, m in enumerate(nodes)}
+    first = next((i for i, m in enumerate(nodes) if m.type == 'START'), None)
+    edges, discovered = _break_cycles(n, _collect_edges(nodes, index), first)
+
+    sizes = np.array([size(m) if size else DEFAULT_SIZE for m in nodes], dtype=float)
+    if edges:
+        src, dst, out_side, in_side, virtual = (np.array(c) for c in zip(*edges))
+    else:
+        src = dst = np.zeros(0, dtype=np.int64)
+        out_side = in_side = np.zeros(0)
+        virtual = np.zeros(0, dtype=bool)
+    src, dst = src.astype(np.int64), dst.astype(np.int64)
+    layer = _longest_path_layers(n, src, dst)
+
+    # ограничения выхода цикла нужны только для слоёв: длинные не дробим
+    keep = ~virtual.astype(bool) | (layer[dst] - layer[src] == 1)
+    layers, seg_src, seg_dst, seg_out, seg_in = _split_long_edges(
+        n, layer, src[keep], dst[keep], out_side[keep].astype(float), in_side[keep].astype(float))
+
+    # начальный порядок — порядок обнаружения при обходе в глубину;
+    # фиктивный узел встаёт вслед за источником своего ребра
+    rank = np.empty(n)
+    rank[discovered] = np.arange(n)
+    key = np.concatenate([rank, np.zeros(len(layers) - n)])
+    key[seg_dst[seg_dst >= n]] = key[seg_src[seg_dst >= n]] + 0.5
+    lay = _Layers(layers, key)
+    _reduce_crossings(lay, seg_src, seg_dst, seg_out, seg_in, sweeps)
+
+    widths = np.concatenate([sizes[:, 0], np.zeros(len(layers) - n)])
+    seg_w = np.concatenate([sizes[:, 0], np.full(len(layers) - n, h_gap / 2)])
+    # желаемый сдвиг приёмника относительно источника: ветви BRANCH
+    # расходятся в стороны своих портов, входы MERGE сходятся к своим
+    delta = (seg_out * (seg_w[seg_src] + h_gap) / 2
+             - seg_in * (seg_w[seg_dst] + h_gap) / 2)
+    cx = _assign_x(lay, widths, seg_src, seg_dst, delta, h_gap, iterations)[:n]
+
+    # высота слоя — по самому высокому блоку; блоки центрируются в слое
+    heights = sizes[:, 1]
+    layer_h = np.zeros(len(lay.bounds) - 1)
+    np.maximum.at(layer_h, layer, heights)
+    top = np.concatenate([[0.0], np.cumsum(layer_h + v_gap)[:-1]])
+    y = top[layer] + (layer_h[layer] - heights) / 2 + origin[1]
+    x = cx - sizes[:, 0] / 2
+    x += origin[0] - x.min()
+    return {m: (int(round(x[i])), int(round(y[i]))) for i, m in enumerate(nodes)}
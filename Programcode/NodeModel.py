@@ -47,4 +47,16 @@ class NodeModel:
             self.ports = [
                 PortModel(self, 'in', 'in'),
                 PortModel(self, 'out', 'out')
-            ]
\ No newline at end of file
+            ]
+
+        # Индекс имя -> порт, чтобы переходы не сканировали список портов
+        self.port_map = {p.name: p for p in self.ports}
+
+    def port(self, name):
+        """Возвращает порт по имени (или None)."""
+        return self.port_map.get(name)
+
+    def target(self, name):
+        """Узел, подключённый к порту name, или None."""
+        p = self.port_map.get(name)
+        return p.connection.parent if p is not None and p.connection else None
@@ -1,5 +1,6 @@
+import weakref
 from tkinter import simpledialog, messagebox
-import tkinter.font as tkfont
+from DiagramValidator import WARNINGS
 
 class NodeUI:
     # Базовые размеры и отступы
@@ -16,25 +17,91 @@ class NodeUI:
     LOOP_DOWN      = 40
     ENTRY_OFFSET   = -10
 
-    # Ограничения на вводимый текст
-    max_char_line  = 15
+    # Радиус кружка порта (выступает за рамку блока)
+    PORT_RADIUS    = 5
+    # Радиус значка замечаний проверки схемы
+    MARKER_RADIUS  = 7
+
+    # Заливка фигуры по типу блока
+    FILLS = {'START': 'lightgrey', 'END': 'lightgrey', 'MERGE': '',
+             'WHILE': 'lightblue', 'FOR': 'lightblue', 'BRANCH': 'yellow',
+             'INPUT': 'lightgreen', 'OUTPUT': 'lightpink', 'ACTION': 'lightgrey'}
+
+    # Ограничения на вводимый текст: ширина строки в пикселях и длина
+    max_line_width = 160
     max_char       = 50
 
+    # типы блоков, текст которых редактируется двойным кликом
+    EDITABLE = ('ACTION','BRANCH','FOR','WHILE','OUTPUT','INPUT')
+
+    # счётчик для уникальных тегов узлов на холсте
+    __seq = 0
+    # тег узла -> NodeUI: события приходят через привязки к общим тегам
+    _by_tag = weakref.WeakValueDictionary()
+
     def __init__(self, canvas, model, x, y, app):
+        NodeUI.__seq += 1
+        self.tag        = f'node{NodeUI.__seq}'   # общий тег всех элементов узла
+        NodeUI._by_tag[self.tag] = self
         self.canvas     = canvas
         self.model      = model
         self.app        = app
         self.x, self.y  = x, y
         self.items      = []       # все графические элементы узла
         self.port_items = {}       # mapping canvas_id -> PortModel
-        # Рассчитываем размер и рисуем
-        self.__draw()
+        self.port_item  = {}       # mapping PortModel -> canvas_id
+        self.shape      = None
+        self.text_id    = None
+        self.label_ids  = ()       # метки 0/1 у BRANCH
+        self.diagnostics = []      # замечания проверки схемы (DiagramValidator)
+        self.marker_ids = ()       # значок замечаний в углу блока
+        self.heat       = None     # заливка тепловой карты профиля или None
+        # графика создаётся, только пока узел рядом с видимой областью
+        self.materialized = False
+        # перетаскивание: последняя точка курсора ждёт обработки в after_idle
+        self.__drag_to      = None
+        # Рассчитываем размер; рисуем, если узел виден
+        self._adjust_size_to_text()
+        if app.viewport.contains(self.bbox()):
+            app.viewport.show_node(self)
+
+    def materialize(self):
+        """Создаёт графические элементы узла."""
+        if not self.materialized:
+            self.materialized = True
+            self.__draw_items()
 
-    def __draw(self):
-        # Подогнать размер блока под текст
+    def dematerialize(self):
+        """Удаляет графические элементы; модель и координаты сохраняются."""
+        if self.materialized:
+            self.materialized = False
+            self.__clear_previous()
+
+    def redraw(self):
+        """
+        Подгоняет размер под текст и обновляет уже созданные элементы
+        на месте (coords/itemconfig) — без пересоздания и перепривязки событий.
+        """
         self._adjust_size_to_text()
-        # Удалить предыдущие элементы
-        self.__clear_previous()
+        if not self.materialized:
+            return
+        c = self.canvas
+        c.coords(self.shape, *self.__shape_coords())
+        if self.text_id is not None:
+            c.coords(self.text_id, self.x + self.WIDTH/2, self.y + self.HEIGHT/2)
+            c.itemconfig(self.text_id, text=self.model.content or self.model.type)
+        for cid, (lx, ly) in zip(self.label_ids, self.__label_positions()):
+            c.coords(cid, lx, ly)
+        r = self.PORT_RADIUS
+        for p, cid in self.port_item.items():
+            px, py = self.port_position(p)
+            c.coords(cid, px-r, py-r, px+r, py+r)
+        if self.marker_ids:
+            mx, my, mr = self.__marker_position()
+            c.coords(self.marker_ids[0], mx-mr, my-mr, mx+mr, my+mr)
+            c.coords(self.marker_ids[1], mx, my)
+
+    def __draw_items(self):
         # Нарисовать форму и текст (специализированно для BRANCH)
         if self.model.type == 'BRANCH':
             self.__draw_branch()
@@ -43,51 +110,69 @@ class NodeUI:
             self.__draw_text()
         # Нарисовать порты
         self.__draw_ports()
-        # Привязать события
-        self.__bind_events()
+        self.__draw_marker()
+        if self in self.app.diagram_state.selected_nodes:
+            self.set_selected(True)
+
+    @classmethod
+    def size_for(cls, text_layout, model):
+        """(WIDTH, HEIGHT) блока с моделью model — без создания NodeUI."""
+        text_width, text_height = text_layout.size(model.content or model.type)
+        return (max(cls.MIN_WIDTH,  text_width  + cls.PADDING_X),
+                max(cls.MIN_HEIGHT, text_height + cls.PADDING_Y))
 
     def _adjust_size_to_text(self):
         """Устанавливает WIDTH и HEIGHT в зависимости от содержимого."""
-        label = self.model.content or self.model.type
-        lines = label.split('\n')
-        font = tkfont.Font()
-        text_width  = max(font.measure(line) for line in lines)
-        text_height = font.metrics("linespace") * len(lines)
-        self.WIDTH  = max(self.MIN_WIDTH,  text_width  + self.PADDING_X)
-        self.HEIGHT = max(self.MIN_HEIGHT, text_height + self.PADDING_Y)
+        self.WIDTH, self.HEIGHT = self.size_for(self.app.text_layout, self.model)
 
     def __clear_previous(self):
         """Удаляет все ранее отрисованные элементы."""
-        for item in self.items:
-            self.canvas.delete(item)
+        self.canvas.delete(self.tag)
         self.items.clear()
         self.port_items.clear()
+        self.port_item.clear()
+        self.shape = self.text_id = None
+        self.label_ids = ()
+        self.marker_ids = ()
 
-    def __draw_shape(self):
-        """Рисует форму узла (без текста)."""
+    def __shape_coords(self):
+        """Координаты формы узла для create_*/coords."""
         x0, y0 = self.x, self.y
         x1, y1 = x0 + self.WIDTH,  y0 + self.HEIGHT
+        cx, cy = (x0 + x1)/2, (y0 + y1)/2
         t = self.model.type
-        if t in ('START', 'END'):
-            shape_id = self.canvas.create_oval(x0, y0, x1, y1, fill='lightgrey', width=2)
-        elif t == 'MERGE':
-            shape_id = self.canvas.create_rectangle(x0, y0, x1, y1, outline='', fill='')
-        elif t == 'WHILE':
-            cx, cy = (x0 + x1)/2, (y0 + y1)/2
-            pts = [cx, y0, x1, cy, cx, y1, x0, cy]
-            shape_id = self.canvas.create_polygon(pts, fill='lightblue', outline='black', width=2)
-        elif t == 'FOR':
-            cx, cy = (x0 + x1)/2, (y0 + y1)/2
+        if t in ('WHILE', 'BRANCH'):
+            return [cx, y0, x1, cy, cx, y1, x0, cy]
+        if t == 'FOR':
             dx = self.WIDTH * 0.2
-            pts = [x0+dx, y0, x1-dx, y0, x1, cy, x1-dx, y1, x0+dx, y1, x0, cy]
-            shape_id = self.canvas.create_polygon(pts, fill='lightblue', outline='black', width=2)
-        elif t in ('INPUT', 'OUTPUT'):
+            return [x0+dx, y0, x1-dx, y0, x1, cy, x1-dx, y1, x0+dx, y1, x0, cy]
+        if t in ('INPUT', 'OUTPUT'):
             skew = self.WIDTH * 0.2
-            fill = 'lightgreen' if t=='INPUT' else 'lightpink'
-            pts = [x0+skew, y0, x1, y0, x1-skew, y1, x0, y1]
-            shape_id = self.canvas.create_polygon(pts, fill=fill, outline='black', width=2)
+            return [x0+skew, y0, x1, y0, x1-skew, y1, x0, y1]
+        return [x0, y0, x1, y1]
+
+    def __label_positions(self):
+        """Позиции меток 0/1 у BRANCH."""
+        if self.model.type != 'BRANCH':
+            return ()
+        w, h = self.WIDTH, self.HEIGHT
+        label_y = self.y + h * 0.10
+        return ((self.x + w * 0.25, label_y), (self.x + w * 0.75, label_y))
+
+    def __draw_shape(self):
+        """Рисует форму узла (без текста)."""
+        pts = self.__shape_coords()
+        tags = (self.tag, 'node_body')
+        t = self.model.type
+        fill = self.__fill()
+        if t in ('START', 'END'):
+            shape_id = self.canvas.create_oval(pts, fill=fill, width=2, tags=tags)
+        elif t == 'MERGE':
+            shape_id = self.canvas.create_rectangle(pts, outline='', fill=fill, tags=tags)
+        elif t in ('WHILE', 'FOR', 'INPUT', 'OUTPUT'):
+            shape_id = self.canvas.create_polygon(pts, fill=fill, outline='black', width=2, tags=tags)
         else:
-            shape_id = self.canvas.create_rectangle(x0, y0, x1, y1, fill='lightgrey', width=2)
+            shape_id = self.canvas.create_rectangle(pts, fill=fill, width=2, tags=tags)
         self.items.append(shape_id)
         self.shape = shape_id
 
@@ -97,42 +182,115 @@ class NodeUI:
             cx = self.x + self.WIDTH/2
             cy = self.y + self.HEIGHT/2
             label = self.model.content or self.model.type
-            text_id = self.canvas.create_text(cx, cy, text=label)
+            text_id = self.canvas.create_text(cx, cy, text=label, tags=(self.tag, 'node_body'))
             self.items.append(text_id)
             self.text_id = text_id
 
     def __draw_branch(self):
         """Рисует ромб ветвления вместе с текстом и метками 0/1."""
-        x0, y0 = self.x, self.y
-        x1, y1 = x0 + self.WIDTH, y0 + self.HEIGHT
-        cx, cy = (x0 + x1)/2, (y0 + y1)/2
+        cx = self.x + self.WIDTH/2
+        cy = self.y + self.HEIGHT/2
+        tags = (self.tag, 'node_body')
         # ромб
-        pts = [cx, y0, x1, cy, cx, y1, x0, cy]
-        shape_id = self.canvas.create_polygon(pts, fill='yellow', outline='black', width=2)
+        shape_id = self.canvas.create_polygon(self.__shape_coords(), fill=self.__fill(), outline='black',
+                                              width=2, tags=tags)
         self.items.append(shape_id)
         self.shape = shape_id
         # текст условия
         label = self.model.content or self.model.type
-        text_id = self.canvas.create_text(cx, cy, text=label)
+        text_id = self.canvas.create_text(cx, cy, text=label, tags=tags)
         self.items.append(text_id)
         self.text_id = text_id
         # метки 0/1
-        w, h = self.WIDTH, self.HEIGHT
-        label_y  = y0 + h * 0.10
-        label_x0 = x0 + w * 0.25
-        label_x1 = x0 + w * 0.75
-        zero_id = self.canvas.create_text(label_x0, label_y, text='0', font=('Arial', 10, 'bold'))
-        one_id  = self.canvas.create_text(label_x1, label_y, text='1', font=('Arial', 10, 'bold'))
-        self.items.extend([zero_id, one_id])
+        self.label_ids = tuple(
+            self.canvas.create_text(lx, ly, text=t, font=('Arial', 10, 'bold'), tags=self.tag)
+            for t, (lx, ly) in zip('01', self.__label_positions())
+        )
+        self.items.extend(self.label_ids)
 
     def __draw_ports(self):
         """Рисует порты (маленькие кружки) для подключения стрелок."""
         for p in self.model.ports:
             px, py = self.port_position(p)
-            cid = self.canvas.create_oval(px-5, py-5, px+5, py+5, fill='black')
+            r = self.PORT_RADIUS
+            # выбранный порт (DiagramState.selected) остаётся красным и после перерисовки
+            fill = 'red' if self.app.diagram_state.selected == (self, p) else 'black'
+            cid = self.canvas.create_oval(px-r, py-r, px+r, py+r, fill=fill, tags=(self.tag, 'node_port'))
             self.port_items[cid] = p
+            self.port_item[p] = cid
             self.items.append(cid)
 
+    def __fill(self):
+        # MERGE — без кода, на тепловой карте не окрашивается
+        if self.heat is not None and self.model.type != 'MERGE':
+            return self.heat
+        return self.FILLS.get(self.model.type, 'lightgrey')
+
+    def set_heat(self, color):
+        """Заливает фигуру цветом тепловой карты; None — обычная заливка."""
+        self.heat = color
+        if self.materialized:
+            self.canvas.itemconfig(self.shape, fill=self.__fill())
+
+    def __marker_position(self):
+        # внутри правого верхнего угла, чтобы не выходить за bbox()
+        r = self.MARKER_RADIUS
+        return self.x + self.WIDTH - r, self.y + r, r
+
+    def __draw_marker(self):
+        """Значок «!»: красный при ошибках, оранжевый при предупреждениях."""
+        if not self.diagnostics:
+            return
+        error = any(d.code not in WARNINGS for d in self.diagnostics)
+        mx, my, r = self.__marker_position()
+        tags = (self.tag, 'node_marker')
+        self.marker_ids = (
+            self.canvas.create_oval(mx-r, my-r, mx+r, my+r, outline='',
+                                    fill='red' if error else 'orange', tags=tags),
+            self.canvas.create_text(mx, my, text='!', fill='white',
+                                    font=('Arial', 9, 'bold'), tags=tags),
+        )
+        self.items.extend(self.marker_ids)
+
+    def set_diagnostics(self, diagnostics):
+        """Запоминает замечания проверки и обновляет значок на блоке."""
+        self.diagnostics = diagnostics
+        if not self.materialized:
+            return
+        for cid in self.marker_ids:
+            self.canvas.delete(cid)
+            self.items.remove(cid)
+        self.marker_ids = ()
+        self.__draw_marker()
+
+    def on_marker_enter(self, event):
+        self.app.show_hint('\n'.join(d.message for d in self.diagnostics))
+
+    def on_marker_leave(self, event):
+        self.app.show_hint(None)
+
+    def bbox(self):
+        """Охватывающий прямоугольник узла вместе с выступающими портами."""
+        r = self.PORT_RADIUS
+        return (self.x - r, self.y - r, self.x + self.WIDTH + r, self.y + self.HEIGHT + r)
+
+    def set_selected(self, selected):
+        """Подсвечивает рамку узла, выбранного рамкой выделения."""
+        if not self.materialized:
+            return
+        if selected:
+            self.canvas.itemconfig(self.shape, outline='blue', width=3)
+        elif self.model.type == 'MERGE':
+            self.canvas.itemconfig(self.shape, outline='', width=2)
+        else:
+            self.canvas.itemconfig(self.shape, outline='black', width=2)
+
+    def set_port_selected(self, port, selected):
+        """Подсвечивает порт, выбранный для соединения (если узел нарисован)."""
+        cid = self.port_item.get(port)
+        if cid is not None:
+            self.canvas.itemconfig(cid, fill='red' if selected else 'black')
+
     def port_position(self, port):
         """Вычисляет координаты центра порта в зависимости от типа узла."""
         x0, y0 = self.x, self.y
@@ -164,50 +322,88 @@ class NodeUI:
             if port.port_type == 'out':  return cx,      cy + dy
         return cx, cy
 
-    def __bind_events(self):
-        """Привязывает события мыши к графическим элементам узла."""
-        editable = ('ACTION','BRANCH','FOR','WHILE','OUTPUT','INPUT')
-        # перетаскивание и контекстное меню для shape и текста
-        for item in (self.shape, getattr(self, 'text_id', None)):
-            if item is None:
-                continue
-            self.canvas.tag_bind(item, '<Button1-Motion>', self.on_drag)
-            self.canvas.tag_bind(item, '<Button-3>',         self.on_right_click)
-            if self.model.type in editable:
-                self.canvas.tag_bind(item, '<Double-1>',    self.on_double_click)
+    @classmethod
+    def bind_canvas(cls, canvas):
+        """
+        Привязывает события мыши к общим тегам узлов — один раз на холст.
+        Узел под курсором находится по его тегу, поэтому создание и
+        перерисовка элементов не требуют новых привязок.
+        """
+        def handler(name):
+            def dispatch(event):
+                for tag in canvas.gettags('current'):
+                    ui = cls._by_tag.get(tag)
+                    if ui is not None:
+                        return getattr(ui, name)(event)
+            return dispatch
+        # перетаскивание и контекстное меню для формы и текста
+        canvas.tag_bind('node_body', '<Button1-Motion>', handler('on_drag'))
+        canvas.tag_bind('node_body', '<ButtonRelease-1>', handler('on_release'))
+        canvas.tag_bind('node_body', '<Button-3>',       handler('on_right_click'))
+        canvas.tag_bind('node_body', '<Double-1>',       handler('on_double_click'))
         # клик по портам
-        for cid in self.port_items:
-            self.canvas.tag_bind(cid, '<Button-1>', self.on_port_click)
+        canvas.tag_bind('node_port', '<Button-1>',       handler('on_port_click'))
+        # подсказка с замечаниями проверки над значком
+        canvas.tag_bind('node_marker', '<Enter>',        handler('on_marker_enter'))
+        canvas.tag_bind('node_marker', '<Leave>',        handler('on_marker_leave'))
 
     def on_drag(self, event):
-        """Обработка перетаскивания узла."""
-        real_x = self.canvas.canvasx(event.x)
-        real_y = self.canvas.canvasy(event.y)
-        dx = real_x - (self.x + self.WIDTH/2)
-        dy = real_y - (self.y + self.HEIGHT/2)
+        """
+        Обработка перетаскивания узла. События движения только запоминают
+        позицию курсора; сдвиг выполняется один раз за кадр в after_idle.
+        """
+        pending = self.__drag_to is not None
+        self.__drag_to = (self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+        if not pending:
+            self.app.root.after_idle(self.__apply_drag)
+
+    def __apply_drag(self):
+        if self.__drag_to is None:
+            return
+        real_x, real_y = self.__drag_to
+        self.__drag_to = None
+        self.move_by(real_x - (self.x + self.WIDTH/2), real_y - (self.y + self.HEIGHT/2))
+
+    def on_release(self, event):
+        """Конец перетаскивания: следующие сдвиги попадут в новую запись истории."""
+        self.app.history.seal()
+
+    def move_by(self, dx, dy):
+        """Сдвигает узел вместе с концами его связей."""
         self.x += dx
         self.y += dy
-        for it in self.items:
-            self.canvas.move(it, dx, dy)
+        # все элементы узла сдвигаются одной командой по тегу
+        self.canvas.move(self.tag, dx, dy)
+        self.app.diagram_state.update_node(self)
         self.app.update_connections(self)
+        self.app.viewport.schedule_refresh()
+        self.app.history.record(('move', self.model.id, dx, dy), coalesce=True)
+
+    def set_content(self, text):
+        """Меняет текст блока и обновляет его размер и графику."""
+        old = self.model.content
+        if text == old:
+            return
+        self.model.content = text
+        self.app.invalidate_code(self.model)
+        self.redraw()
+        self.app.diagram_state.update_node(self)
+        self.app.viewport.schedule_refresh()
+        self.app.history.record(('edit', self.model.id, old, text))
 
     def on_double_click(self, event):
         """Редактирование текста блока."""
+        if self.model.type not in self.EDITABLE:
+            return
         prompt = "Введите переменные через пробел:" if self.model.type == 'INPUT' else "Введите текст:"
         new = simpledialog.askstring("Изменение текста", prompt, initialvalue=self.model.content)
         if new is not None:
             if len(new) > self.max_char:
                 messagebox.showerror('Error', f'Размер текста не может превышать {self.max_char} символов')
                 return
-            # разбивка на строки по max_char_line
-            if len(new) > self.max_char_line:
-                parts = [new[i:i+self.max_char_line] for i in range(0, len(new), self.max_char_line)]
-                _new = "\n".join(parts)
-            else:
-                _new = new
-            self.model.content = _new.strip()
-            # после изменения текста пересоздать всю графику
-            self.__draw()
+            # разбивка на строки по словам с учётом ширины текста
+            lines = self.app.text_layout.wrap(new, self.max_line_width)
+            self.set_content("\n".join(lines).strip())
 
     def on_right_click(self, event):
         """Контекстное меню: удаление блока."""
@@ -222,5 +418,6 @@ class NodeUI:
 
     def on_delete(self):
         """Полное удаление всех графических элементов узла."""
-        for it in self.items:
-            self.canvas.delete(it)
+        self.__drag_to = None
+        self.app.viewport.forget(self)
+        self.dematerialize()
@@ -0,0 +1,175 @@
+"""
+Промежуточное представление программы: дерево операторов между обходом
+графа (CodeGenerator.build_ir) и выводом текста; узлы помнят ID блока.
+"""
+
+# Быстрый ввод/вывод (fast_io=True): stdin читается одним вызовом и
+# делится на токены по пробельным символам, INPUT берёт очередной токен,
+# OUTPUT печатает в буфер, который выводится один раз после main().
+FAST_IO_PROLOGUE = (
+    'import io',
+    'import sys',
+    '',
+    '_tokens = iter(sys.stdin.buffer.read().split())',
+    '_out = io.StringIO()',
+    '',
+    '',
+    'def _read():',
+    '    try:',
+    '        return next(_tokens).decode()',
+    '    except StopIteration:',
+    "        raise EOFError('EOF when reading a line') from None",
+    '',
+    '',
+)
+
+_TRAILER = ('', "if __name__=='__main__':", '    main()')
+_FAST_IO_TRAILER = ('', "if __name__=='__main__':", '    try:', '        main()',
+                    '    finally:', '        sys.stdout.write(_out.getvalue())')
+
+
+def prologue(fast_io=False):
+    """Строки перед def main()."""
+    return FAST_IO_PROLOGUE if fast_io else ()
+
+
+def trailer(fast_io=False):
+    """Строки после тела main(): пустая строка и запуск."""
+    return _FAST_IO_TRAILER if fast_io else _TRAILER
+
+
+def io_forms(fast_io=False):
+    """(вызов ввода для INPUT, хвост аргументов print для OUTPUT)."""
+    return ('_read()', ', file=_out') if fast_io else ('input()', '')
+
+
+class Action:
+    """Оператор блока ACTION (текст как есть)."""
+    __slots__ = ('text', 'node_id')
+
+    def __init__(self, text, node_id=None):
+        self.text = text
+        self.node_id = node_id
+
+
+class Input:
+    """Ввод переменных names блока INPUT — по одной на строку."""
+    __slots__ = ('names', 'node_id')
+
+    def __init__(self, names, node_id=None):
+        self.names = names
+        self.node_id = node_id
+
+
+class Output:
+    """Вывод выражения expr блока OUTPUT."""
+    __slots__ = ('expr', 'node_id')
+
+    def __init__(self, expr, node_id=None):
+        self.expr = expr
+        self.node_id = node_id
+
+
+class If:
+    """Ветвление BRANCH: body — ветвь «да», orelse — ветвь «нет»."""
+    __slots__ = ('cond', 'body', 'orelse', 'node_id')
+
+    def __init__(self, cond, body=None, orelse=None, node_id=None):
+        self.cond = cond
+        self.body = body if body is not None else []
+        self.orelse = orelse if orelse is not None else []
+        self.node_id = node_id
+
+
+class Loop:
+    """Цикл FOR или WHILE; header — текст после for/while."""
+    __slots__ = ('kind', 'header', 'body', 'node_id')
+
+    def __init__(self, kind, header, body=None, node_id=None):
+        self.kind = kind
+        self.header = header
+        self.body = body if body is not None else []
+        self.node_id = node_id
+
+
+class Program:
+    """Тело main(); node_id — блок START."""
+    __slots__ = ('body', 'node_id')
+
+    def __init__(self, body=None, node_id=None):
+        self.body = body if body is not None else []
+        self.node_id = node_id
+
+
+def blocks(program):
+    """
+    Все списки операторов дерева (тело main, ветви, тела циклов) —
+    каждый раньше вложенных в него. Обход без рекурсии.
+    """
+    out = []
+    stack = [program.body]
+    while stack:
+        block = stack.pop()
+        out.append(block)
+        for node in block:
+            cls = node.__class__
+            if cls is If:
+                stack.append(node.orelse)
+                stack.append(node.body)
+            elif cls is Loop:
+                stack.append(node.body)
+    return out
+
+
+def emit(program, source_map=None, fast_io=False):
+    """
+    Строки программы по дереву — в том же виде, что у CodeGenerator.
+    Пустые тело и ветвь «да» получают pass, пустая ветвь «нет» не
+    выводится. source_map и fast_io — как в CodeGenerator.generate_code_iter.
+    """
+    mapping = source_map is not None
+    lead = prologue(fast_io)
+    if mapping:
+        source_map.extend([None] * (len(lead) + 1))
+    yield from lead
+    yield 'def main():'
+    read, sink = io_forms(fast_io)
+    # работа в порядке LIFO: ('block', операторы, отступ, владелец pass)
+    # или ('line', строка, ID блока)
+    work = [('block', program.body, '    ', program.node_id)]
+    while work:
+        kind, a, pad, owner = work.pop()
+        if kind == 'line':
+            if mapping:
+                source_map.append(owner)
+            yield pad + a
+            continue
+        if not a:
+            if mapping:
+                source_map.append(owner)
+            yield f"{pad}pass"
+            continue
+        for node in reversed(a):
+            cls = node.__class__
+            if cls is If or cls is Loop:
+                inner = pad + '    '
+                if cls is If:
+                    if node.orelse:
+                        work.append(('block', node.orelse, inner, node.node_id))
+                        work.append(('line', 'else:', pad, node.node_id))
+                    head = f"if {node.cond}:"
+                else:
+                    head = f"{node.kind} {node.header}:"
+                work.append(('block', node.body, inner, node.node_id))
+                work.append(('line', head, pad, node.node_id))
+            elif cls is Input:
+                for v in reversed(node.names):
+                    work.append(('line', f"{v} = {read}", pad, node.node_id))
+            elif cls is Output:
+                work.append(('line', f"print({node.expr}{sink})", pad, node.node_id))
+            else:
+                work.append(('line', node.text, pad, node.node_id))
+    tail = trailer(fast_io)
+    if mapping:
+        source_map.extend([None] * len(tail))
+    yield from tail
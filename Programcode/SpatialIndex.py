@@ -0,0 +1,167 @@
+class SpatialIndex:
+    """
+    Пространственный индекс на равномерной сетке.
+    Хранит прямоугольники (x0, y0, x1, y1) под произвольными ключами;
+    каждый прямоугольник записан во все ячейки, которые он задевает.
+    Запросы по прямоугольнику и поиск ближайшего просматривают только
+    ячейки рядом с областью запроса.
+    """
+
+    def __init__(self, cell=200):
+        self.cell = cell
+        self.cells = {}    # (i, j) -> set ключей
+        self.boxes = {}    # ключ -> (x0, y0, x1, y1)
+        self.__bounds = None
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __contains__(self, key):
+        return key in self.boxes
+
+    def __cell_range(self, x0, y0, x1, y1):
+        c = self.cell
+        return int(x0 // c), int(y0 // c), int(x1 // c), int(y1 // c)
+
+    def insert(self, key, box):
+        """Добавляет ключ или обновляет его прямоугольник."""
+        x0, y0, x1, y1 = box
+        box = (min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        old = self.boxes.get(key)
+        if old == box:
+            return
+        if old is not None:
+            self.__unlink(key, old)
+        self.boxes[key] = box
+        i0, j0, i1, j1 = self.__cell_range(*box)
+        cells = self.cells
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                bucket = cells.get((i, j))
+                if bucket is None:
+                    cells[(i, j)] = {key}
+                else:
+                    bucket.add(key)
+        b = self.__bounds
+        if b is not None:
+            if old is None or not _retreats(old, box, b):
+                self.__bounds = (min(b[0], box[0]), min(b[1], box[1]),
+                                 max(b[2], box[2]), max(b[3], box[3]))
+            else:
+                self.__bounds = None
+
+    def remove(self, key):
+        box = self.boxes.pop(key, None)
+        if box is not None:
+            self.__unlink(key, box)
+            if self.__bounds is not None and _on_edge(box, self.__bounds):
+                self.__bounds = None
+
+    def __unlink(self, key, box):
+        i0, j0, i1, j1 = self.__cell_range(*box)
+        cells = self.cells
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                bucket = cells.get((i, j))
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del cells[(i, j)]
+
+    def clear(self):
+        self.cells.clear()
+        self.boxes.clear()
+        self.__bounds = None
+
+    def query(self, x0, y0, x1, y1):
+        """Множество ключей, чьи прямоугольники пересекают заданный."""
+        if x0 > x1:
+            x0, x1 = x1, x0
+        if y0 > y1:
+            y0, y1 = y1, y0
+        i0, j0, i1, j1 = self.__cell_range(x0, y0, x1, y1)
+        cells, boxes = self.cells, self.boxes
+        found = set()
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(cells):
+            # область больше занятой части сетки — дешевле обойти ячейки
+            candidates = (k for bucket in cells.values() for k in bucket)
+        else:
+            candidates = (k for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)
+                          for k in cells.get((i, j), ()))
+        for k in candidates:
+            if k in found:
+                continue
+            bx0, by0, bx1, by1 = boxes[k]
+            if bx0 <= x1 and x0 <= bx1 and by0 <= y1 and y0 <= by1:
+                found.add(k)
+        return found
+
+    def nearest(self, x, y, max_dist=float('inf')):
+        """
+        Ключ с ближайшим к точке прямоугольником (0 — точка внутри)
+        или None, если ничего нет ближе max_dist.
+        Ячейки просматриваются кольцами, пока кольцо может дать результат лучше.
+        """
+        if not self.boxes:
+            return None
+        c = self.cell
+        ci, cj = int(x // c), int(y // c)
+        best, best_d = None, max_dist
+        seen = set()
+        # радиус, за которым ячеек гарантированно нет
+        b = self.bounds()
+        limit = int(max(abs(b[0] - x), abs(b[2] - x), abs(b[1] - y), abs(b[3] - y)) // c) + 1
+        r = 0
+        while r <= limit:
+            # ближайшая точка кольца r не ближе (r - 1) * c; пока ничего
+            # не найдено, best_d — это max_dist
+            if (r - 1) * c > best_d:
+                break
+            for i, j in _ring(ci, cj, r):
+                for k in self.cells.get((i, j), ()):
+                    if k in seen:
+                        continue
+                    seen.add(k)
+                    d = _box_distance(self.boxes[k], x, y)
+                    if d < best_d or best is None and d <= best_d:
+                        best, best_d = k, d
+            r += 1
+        return best
+
+    def bounds(self):
+        """Общий охватывающий прямоугольник или None, если индекс пуст."""
+        if self.__bounds is None and self.boxes:
+            boxes = self.boxes.values()
+            self.__bounds = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                             max(b[2] for b in boxes), max(b[3] for b in boxes))
+        return self.__bounds
+
+
+def _ring(ci, cj, r):
+    if r == 0:
+        yield ci, cj
+        return
+    for i in range(ci - r, ci + r + 1):
+        yield i, cj - r
+        yield i, cj + r
+    for j in range(cj - r + 1, cj + r):
+        yield ci - r, j
+        yield ci + r, j
+
+
+def _box_distance(box, x, y):
+    x0, y0, x1, y1 = box
+    dx = x0 - x if x < x0 else (x - x1 if x > x1 else 0)
+    dy = y0 - y if y < y0 else (y - y1 if y > y1 else 0)
+    return (dx * dx + dy * dy) ** 0.5
+
+
+def _retreats(old, new, bounds):
+    """Отошёл ли прямоугольник от края общей рамки, которого касался."""
+    return (old[0] == bounds[0] < new[0] or old[1] == bounds[1] < new[1]
+            or new[2] < bounds[2] == old[2] or new[3] < bounds[3] == old[3])
+
+
+def _on_edge(box, bounds):
+    return (box[0] == bounds[0] or box[1] == bounds[1]
+            or box[2] == bounds[2] or box[3] == bounds[3])
@@ -0,0 +1,116 @@
+import re
+from collections import OrderedDict
+
+# слово вместе с пробелами после него или пробелы в начале строки
+_WORD_RE = re.compile(r'\S+\s*|\s+')
+
+
+class TkMeasurer:
+    """
+    Измеритель на основе tkinter.font.Font. measure_many измеряет пачку
+    строк одним обращением к Tcl (lmap), а не вызовом на каждую строку.
+    """
+
+    def __init__(self, font=None):
+        if font is None:
+            import tkinter.font as tkfont
+            font = tkfont.Font()
+        self.font = font
+
+    def measure(self, text):
+        return self.font.measure(text)
+
+    def linespace(self):
+        return self.font.metrics('linespace')
+
+    def measure_many(self, texts):
+        import tkinter as tk
+        tcl = self.font.tk
+        try:
+            res = tcl.call('lmap', 's', tuple(texts), f'font measure {self.font.name} $s')
+        except tk.TclError:
+            # Tcl без lmap (старше 8.6)
+            return [self.font.measure(t) for t in texts]
+        return [int(w) for w in tcl.splitlist(res)]
+
+
+class TextLayout:
+    """
+    Общий сервис раскладки текста блоков: ширины строк кэшируются в LRU,
+    поэтому размер блока после прогрева считается без обращений к шрифту.
+    measurer — объект с методами measure(text) и linespace()
+    (и необязательным measure_many(texts)); по умолчанию — TkMeasurer.
+    """
+
+    def __init__(self, measurer=None, capacity=4096):
+        self.measurer = measurer if measurer is not None else TkMeasurer()
+        self.capacity = capacity
+        self.widths = OrderedDict()   # строка -> ширина в пикселях
+        self.__linespace = None
+
+    def measure(self, text):
+        """Ширина однострочного текста."""
+        widths = self.widths
+        w = widths.get(text)
+        if w is None:
+            w = widths[text] = self.measurer.measure(text)
+            if len(widths) > self.capacity:
+                widths.popitem(last=False)
+        else:
+            widths.move_to_end(text)
+        return w
+
+    def measure_many(self, texts):
+        """Заранее измеряет строки, которых нет в кэше (одной пачкой, если измеритель умеет)."""
+        missing = list(dict.fromkeys(t for t in texts if t not in self.widths))
+        if not missing:
+            return
+        batch = getattr(self.measurer, 'measure_many', None)
+        widths = batch(missing) if batch else [self.measurer.measure(t) for t in missing]
+        # в кэш попадает не больше capacity последних строк
+        for text, w in zip(missing[-self.capacity:], widths[-self.capacity:]):
+            self.widths[text] = w
+        while len(self.widths) > self.capacity:
+            self.widths.popitem(last=False)
+
+    def linespace(self):
+        if self.__linespace is None:
+            self.__linespace = self.measurer.linespace()
+        return self.__linespace
+
+    def size(self, text):
+        """(ширина, высота) многострочного текста."""
+        lines = text.split('\n')
+        return max(self.measure(line) for line in lines), self.linespace() * len(lines)
+
+    def wrap(self, text, max_width):
+        """
+        Разбивает текст на строки не шире max_width по границам слов.
+        Слово длиннее строки режется посимвольно. Пробелы остаются в конце
+        строк, поэтому склеивание строк без разделителя даёт исходный текст.
+        """
+        out = []
+        for para in text.split('\n'):
+            line = ''
+            for word in _WORD_RE.findall(para):
+                if line and self.measure((line + word).rstrip()) > max_width:
+                    out.append(line)
+                    line = ''
+                line += word
+                while len(line.rstrip()) > 1 and self.measure(line.rstrip()) > max_width:
+                    cut = self.__fit(line, max_width)
+                    out.append(line[:cut])
+                    line = line[cut:]
+            out.append(line)
+        return out
+
+    def __fit(self, line, max_width):
+        # длина самого длинного префикса, который помещается (не меньше 1)
+        lo, hi = 1, len(line)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.measure(line[:mid]) <= max_width:
+                lo = mid
+            else:
+                hi = mid - 1
+        return lo
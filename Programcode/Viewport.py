@@ -0,0 +1,97 @@
+class Viewport:
+    """
+    Виртуализация холста: графика создаётся только для узлов и связей,
+    попадающих в видимую область с запасом MARGIN. Элементы дальше
+    2 × MARGIN удаляются (между границами — гистерезис, чтобы мелкая
+    прокрутка не пересоздавала одно и то же). Область прокрутки
+    подгоняется под реальные границы схемы.
+    """
+    MARGIN = 300
+    # поле вокруг схемы в области прокрутки
+    PADDING = 200
+
+    def __init__(self, canvas, state, root):
+        self.canvas = canvas
+        self.state = state
+        self.root = root
+        self.nodes = set()         # NodeUI с созданной графикой
+        self.connections = set()   # ConnectionUI с созданной графикой
+        self.__pending = False
+
+    def rect(self, margin=MARGIN):
+        """Видимая область холста (в координатах холста), расширенная на margin."""
+        c = self.canvas
+        x0, y0 = c.canvasx(0), c.canvasy(0)
+        return (x0 - margin, y0 - margin,
+                x0 + c.winfo_width() + margin, y0 + c.winfo_height() + margin)
+
+    def contains(self, box, margin=MARGIN):
+        vx0, vy0, vx1, vy1 = self.rect(margin)
+        x0, y0, x1, y1 = box
+        return x0 <= vx1 and vx0 <= x1 and y0 <= vy1 and vy0 <= y1
+
+    def show_node(self, ui):
+        if ui not in self.nodes:
+            self.nodes.add(ui)
+            ui.materialize()
+
+    def hide_node(self, ui):
+        if ui in self.nodes:
+            self.nodes.discard(ui)
+            ui.dematerialize()
+
+    def show_connection(self, conn):
+        if conn not in self.connections:
+            self.connections.add(conn)
+            conn.materialize()
+
+    def hide_connection(self, conn):
+        if conn in self.connections:
+            self.connections.discard(conn)
+            conn.dematerialize()
+
+    def forget(self, item):
+        """Убирает удалённый узел или связь из учёта (графику удаляет владелец)."""
+        self.nodes.discard(item)
+        self.connections.discard(item)
+
+    def schedule_refresh(self):
+        """Откладывает refresh до простоя mainloop (несколько вызовов — один refresh)."""
+        if not self.__pending:
+            self.__pending = True
+            self.root.after_idle(self.refresh)
+
+    def refresh(self):
+        self.__pending = False
+        state = self.state
+        near = self.rect(self.MARGIN)
+        far = self.rect(2 * self.MARGIN)
+
+        keep = state.node_index.query(*far)
+        for ui in [ui for ui in self.nodes if ui not in keep]:
+            self.hide_node(ui)
+        for ui in state.node_index.query(*near):
+            self.show_node(ui)
+
+        keep = {conn for conn, _ in state.edge_index.query(*far)}
+        for conn in [c for c in self.connections if c not in keep]:
+            self.hide_connection(conn)
+        for conn, _ in state.edge_index.query(*near):
+            self.show_connection(conn)
+
+        self.update_scrollregion()
+
+    def update_scrollregion(self):
+        boxes = [b for b in (self.state.node_index.bounds(), self.state.edge_index.bounds()) if b]
+        x0, y0, x1, y1 = self.rect(0)
+        # видимая область всегда входит в область прокрутки, иначе Tk
+        # сдвинет вид при обновлении scrollregion
+        x0, y0 = min(0, x0), min(0, y0)
+        for b in boxes:
+            x0, y0 = min(x0, b[0] - self.PADDING), min(y0, b[1] - self.PADDING)
+            x1, y1 = max(x1, b[2] + self.PADDING), max(y1, b[3] + self.PADDING)
+        self.canvas.config(scrollregion=(x0, y0, x1, y1))
+
+    def clear(self):
+        self.nodes.clear()
+        self.connections.clear()
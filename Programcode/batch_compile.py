@@ -0,0 +1,125 @@
+# batch_compile.py
+"""
+Пакетная компиляция сохранённых диаграмм в Python без графического интерфейса.
+
+    python batch_compile.py схемы/ другая.json -o out/ -j 8
+    python batch_compile.py схемы/ --pyc        # сразу .pyc (AstBackend)
+
+Каталоги обходятся рекурсивно. Для каждого файла печатается время или
+ошибка; код возврата 1, если хотя бы один файл не скомпилировался.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import AstBackend
+from DiagramData import read_diagram, build_graph, code_options
+from code_generator import CodeGenerator
+
+DIAGRAM_EXTENSIONS = ('.json', '.rgzd')
+
+
+def compile_file(src, dst, pyc=False):
+    """
+    Компилирует одну диаграмму src в файл dst (pyc=True — в .pyc).
+    Возвращает (src, dst, секунды, текст ошибки или None).
+    """
+    t0 = time.perf_counter()
+    try:
+        data = read_diagram(src)
+        graph = build_graph(data)
+        # параметры, сохранённые в самой диаграмме (быстрый ввод/вывод)
+        fast_io = code_options(data)['fast_io']
+        if pyc:
+            code = AstBackend.compile_graph(graph, filename=src, fast_io=fast_io)
+            AstBackend.write_pyc(code, dst)
+            return src, dst, time.perf_counter() - t0, None
+        lines = CodeGenerator.generate_code_iter(graph, fast_io=fast_io)
+        # первую строку получаем до открытия файла: ошибки START/портов
+        # не должны оставлять пустой .py
+        first = next(lines)
+        os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+        f = open(dst, 'w', encoding='utf-8')
+        try:
+            with f:
+                f.write(first)
+                for line in lines:
+                    f.write('\n')
+                    f.write(line)
+        except BaseException:
+            os.remove(dst)
+            raise
+    except Exception as e:
+        return src, dst, time.perf_counter() - t0, f"{type(e).__name__}: {e}"
+    return src, dst, time.perf_counter() - t0, None
+
+
+def collect_jobs(paths, out_dir=None, ext='.py'):
+    """Список пар (диаграмма, .py или ext) для файлов и каталогов из paths."""
+    jobs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(DIAGRAM_EXTENSIONS):
+                        src = os.path.join(root, name)
+                        jobs.append((src, _target(src, path, out_dir, ext)))
+        else:
+            jobs.append((path, _target(path, os.path.dirname(path), out_dir, ext)))
+    return jobs
+
+
+def _target(src, base, out_dir, ext):
+    stem = os.path.splitext(src)[0] + ext
+    if out_dir is None:
+        return stem
+    return os.path.join(out_dir, os.path.relpath(stem, base or '.'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Компиляция диаграмм (.json, .rgzd) в Python‑код без GUI')
+    parser.add_argument('paths', nargs='+', help='файлы диаграмм или каталоги')
+    parser.add_argument('-o', '--out-dir', help='каталог для .py (по умолчанию рядом с диаграммой)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='число процессов (1 — без пула)')
+    parser.add_argument('--pyc', action='store_true',
+                        help='записывать .pyc (объект кода без исходника) вместо .py')
+    args = parser.parse_args(argv)
+
+    jobs = collect_jobs(args.paths, args.out_dir, '.pyc' if args.pyc else '.py')
+    if not jobs:
+        print('Нет файлов диаграмм', file=sys.stderr)
+        return 1
+
+    t0 = time.perf_counter()
+    if args.jobs <= 1:
+        results = (compile_file(src, dst, args.pyc) for src, dst in jobs)
+        failed = _report(results)
+    else:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = pool.map(partial(compile_file, pyc=args.pyc), *zip(*jobs), chunksize=8)
+            failed = _report(results)
+
+    total = time.perf_counter() - t0
+    print(f"Готово: {len(jobs) - failed} из {len(jobs)} за {total:.3f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _report(results):
+    failed = 0
+    for src, dst, seconds, error in results:
+        if error is None:
+            print(f"OK    {seconds:8.3f}s  {src} -> {dst}")
+        else:
+            failed += 1
+            print(f"FAIL  {seconds:8.3f}s  {src}: {error}", file=sys.stderr)
+    return failed
+
+
+if __name__ == '__main__':
+    sys.exit(main())
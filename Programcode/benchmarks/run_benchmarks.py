@@ -0,0 +1,168 @@
+# benchmarks/run_benchmarks.py
+"""
+Замеры масштабируемости генерации кода, загрузки и сохранения диаграмм.
+
+    python benchmarks/run_benchmarks.py                       # все замеры
+    python benchmarks/run_benchmarks.py --sizes 100 1000 --save base.json
+    python benchmarks/run_benchmarks.py --compare base.json   # сравнение с базой
+
+Для каждой операции, формы графа и размера печатается лучшее время из
+--repeat прогонов и пиковая память (tracemalloc). С --compare результаты
+сравниваются с сохранённой базой; замедление больше --tolerance считается
+регрессией, и код возврата равен 1.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [HERE, os.path.dirname(HERE)]
+
+from synthetic import SHAPES
+from standin import StandInApp
+from DiagramData import build_graph
+from code_generator import CodeGenerator
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+
+
+def _prepare_generate(data):
+    graph = build_graph(data)
+    return lambda: CodeGenerator.generate_code(graph)
+
+
+def _prepare_load(data):
+    import DiagramIO
+    def run():
+        app = StandInApp()
+        DiagramIO.DiagramIo(app)._load_data(data)
+    return run
+
+
+def _prepare_collect(data):
+    import DiagramIO
+    app = StandInApp()
+    io = DiagramIO.DiagramIo(app)
+    io._load_data(data)
+    return io._collect_data
+
+
+def _prepare_drag(data):
+    # перетаскивание узла из середины схемы: серия событий движения
+    import DiagramIO
+    from types import SimpleNamespace
+    app = StandInApp()
+    DiagramIO.DiagramIo(app)._load_data(data)
+    nodes = list(app.diagram_state.nodes_ui)
+    ui = nodes[len(nodes) // 2]
+    app.viewport.show_node(ui)
+    def run():
+        x0 = ui.x + ui.WIDTH / 2
+        y0 = ui.y + ui.HEIGHT / 2
+        for step in range(1, 51):
+            ui.on_drag(SimpleNamespace(x=x0 + step, y=y0 + step))
+            if step % 5 == 0:
+                # несколько событий движения приходится на один кадр
+                app.root.run_pending()
+        app.root.run_pending()
+    return run
+
+
+def _prepare_layout(data):
+    # авто-раскладка моделей (нужен NumPy)
+    from DiagramData import build_models
+    from Layout import layered_layout
+    models = [m for m, _, _ in build_models(data)[0]]
+    return lambda: layered_layout(models)
+
+
+OPERATIONS = {
+    'generate': _prepare_generate,
+    'load':     _prepare_load,
+    'collect':  _prepare_collect,
+    'drag':     _prepare_drag,
+    'layout':   _prepare_layout,
+}
+
+
+def measure(run, repeat, memory=True):
+    """Лучшее время из repeat прогонов и пик памяти отдельного прогона (КиБ)."""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - t0)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+    return {'seconds': best, 'peak_kib': peak}
+
+
+def run_all(ops, shapes, sizes, repeat, memory=True, out=sys.stdout):
+    results = {}
+    for shape in shapes:
+        for n in sizes:
+            data = SHAPES[shape](n)
+            for op in ops:
+                run = OPERATIONS[op](data)
+                key = f"{op}/{shape}/{n}"
+                results[key] = r = measure(run, repeat, memory)
+                peak = '' if r['peak_kib'] is None else f"{r['peak_kib']:12.1f} KiB"
+                print(f"{key:28} {r['seconds'] * 1000:12.2f} ms {peak}", file=out, flush=True)
+    return results
+
+
+def compare(results, baseline, tolerance, out=sys.stdout):
+    """Печатает отношение к базе; возвращает список ключей с регрессией."""
+    regressions = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for metric in ('seconds', 'peak_kib'):
+            if r.get(metric) is None or not base.get(metric):
+                continue
+            ratio = r[metric] / base[metric]
+            mark = ''
+            if ratio > 1 + tolerance:
+                mark = '  РЕГРЕССИЯ'
+                regressions.append(f"{key}:{metric}")
+            print(f"{key:28} {metric:9} x{ratio:6.2f}{mark}", file=out)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Замеры генерации, загрузки и сохранения диаграмм')
+    parser.add_argument('--ops', nargs='+', choices=sorted(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument('--shapes', nargs='+', choices=sorted(SHAPES), default=list(SHAPES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true', help='не замерять пиковую память')
+    parser.add_argument('--save', metavar='PATH', help='сохранить результаты как базу')
+    parser.add_argument('--compare', metavar='PATH', help='сравнить с сохранённой базой')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='допустимое относительное ухудшение (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    results = run_all(args.ops, args.shapes, args.sizes, args.repeat, not args.no_memory)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
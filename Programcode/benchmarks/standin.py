@@ -0,0 +1,168 @@
+# benchmarks/standin.py
+"""
+Заменители Tk для замеров без дисплея: холст, который только хранит
+координаты элементов, корневое окно с очередью after и приложение
+с тем же интерфейсом, что DiagramApp использует из NodeUI/ConnectionUI/DiagramIo.
+"""
+from DiagramState import DiagramState
+from Viewport import Viewport
+from EdgeRouter import EdgeRouter
+from DiagramValidator import DiagramValidator
+from code_generator import RegionCache
+from TextLayout import TextLayout
+from History import History
+from DiagramEditor import DiagramEditor
+
+
+class StandInCanvas:
+    def __init__(self, width=900, height=600):
+        self.width, self.height = width, height
+        self.items = {}
+        self.tagged = {}   # тег -> множество номеров элементов
+        self.bindings = {}  # (тег, событие) -> обработчик
+        self.current = None  # элемент «под курсором» для тега 'current'
+        self._next = 1
+
+    def _create(self, *coords, **options):
+        cid = self._next
+        self._next += 1
+        if len(coords) == 1 and isinstance(coords[0], (list, tuple)):
+            coords = coords[0]
+        self.items[cid] = [list(coords), options]
+        for tag in _tags(options.get('tags')):
+            self.tagged.setdefault(tag, set()).add(cid)
+        return cid
+
+    create_line = create_oval = create_rectangle = create_polygon = create_text = _create
+
+    def _ids(self, tag):
+        """Номера элементов по номеру или тегу, как в Tk."""
+        if tag == 'current':
+            return (self.current,) if self.current in self.items else ()
+        if tag in self.items:
+            return (tag,)
+        return list(self.tagged.get(tag, ()))
+
+    def coords(self, cid, *coords):
+        if coords:
+            self.items[cid][0] = list(coords)
+        return self.items[cid][0]
+
+    def move(self, tag, dx, dy):
+        for cid in self._ids(tag):
+            c = self.items[cid][0]
+            c[0::2] = [v + dx for v in c[0::2]]
+            c[1::2] = [v + dy for v in c[1::2]]
+
+    def itemconfig(self, cid, **options):
+        self.items[cid][1].update(options)
+
+    def config(self, **options):
+        pass
+
+    def delete(self, tag):
+        if tag == 'all':
+            self.items.clear()
+            self.tagged.clear()
+            return
+        for cid in self._ids(tag):
+            for t in _tags(self.items.pop(cid)[1].get('tags')):
+                ids = self.tagged[t]
+                ids.discard(cid)
+                if not ids:
+                    del self.tagged[t]
+
+    def tag_bind(self, tag, sequence, func):
+        self.bindings[(tag, sequence)] = func
+
+    def find_withtag(self, tag):
+        return tuple(self._ids(tag))
+
+    def gettags(self, tag):
+        ids = self._ids(tag)
+        return tuple(_tags(self.items[ids[0]][1].get('tags'))) if ids else ()
+
+    def canvasx(self, x):
+        return x
+
+    def canvasy(self, y):
+        return y
+
+    def winfo_width(self):
+        return self.width
+
+    def winfo_height(self):
+        return self.height
+
+
+def _tags(tags):
+    if tags is None:
+        return ()
+    return (tags,) if isinstance(tags, str) else tags
+
+
+class StandInRoot:
+    def __init__(self):
+        self.pending = []
+
+    def after(self, ms, func=None, *args):
+        self.pending.append((func, args))
+        return len(self.pending)
+
+    def after_idle(self, func, *args):
+        return self.after(0, func, *args)
+
+    def after_cancel(self, ident):
+        pass
+
+    def run_pending(self):
+        while self.pending:
+            func, args = self.pending.pop(0)
+            func(*args)
+
+
+class StandInMeasurer:
+    """Измеритель шрифта фиксированной ширины вместо TkMeasurer."""
+    CHAR_WIDTH = 7
+    LINESPACE = 15
+
+    def measure(self, text):
+        return self.CHAR_WIDTH * len(text)
+
+    def linespace(self):
+        return self.LINESPACE
+
+
+class StandInApp(DiagramEditor):
+    def __init__(self):
+        self.root = StandInRoot()
+        self.canvas = StandInCanvas()
+        self.diagram_state = DiagramState()
+        self.viewport = Viewport(self.canvas, self.diagram_state, self.root)
+        self.router = EdgeRouter(self.diagram_state, self.viewport, self.root)
+        self.code_cache = RegionCache()
+        self.text_layout = TextLayout(StandInMeasurer())
+        self.history = History(self)
+        self.journal = None
+        self.validator = DiagramValidator(self.diagram_state, self.root)
+        self.code_options = {'optimize': False, 'fast_io': False}
+        # сколько раз окно запросило бы перегенерацию кода
+        self.code_paused = False
+        self.code_requests = 0
+
+    def set_code_options(self, **options):
+        self.code_options.update(options)
+
+    def pause_code(self):
+        self.code_paused = True
+
+    def resume_code(self):
+        self.code_paused = False
+        self.code_requests += 1
+
+    def invalidate_code(self, *models, structure=False):
+        self.code_cache.invalidate(*models, structure=structure)
+        self.validator.invalidate(*models, structure=structure)
+        if not self.code_paused:
+            self.code_requests += 1
+
@@ -0,0 +1,147 @@
+# benchmarks/synthetic.py
+"""
+Генераторы синтетических диаграмм для замеров.
+Каждый генератор возвращает словарь диаграммы ({'nodes', 'edges'}) примерно
+из n узлов — тот же формат, что сохраняет редактор.
+"""
+import random
+
+
+class _Builder:
+    def __init__(self):
+        self.nodes = []
+        self.edges = []
+
+    def node(self, ntype, content='', depth=0):
+        nid = f'n{len(self.nodes)}'
+        self.nodes.append({'id': nid, 'type': ntype, 'content': content,
+                           'x': 40 + depth * 170, 'y': 40 + len(self.nodes) * 90})
+        return nid
+
+    def edge(self, src, sport, dst, dport):
+        self.edges.append({'from_node': src, 'from_port': sport,
+                           'to_node': dst, 'to_port': dport, 'points': None})
+
+    def data(self):
+        return {'nodes': self.nodes, 'edges': self.edges}
+
+
+def linear_chain(n):
+    """START -> ACTION × (n-2) -> END."""
+    b = _Builder()
+    prev, port = b.node('START'), 'out'
+    for i in range(max(n - 2, 1)):
+        cur = b.node('ACTION', f'x{i % 7} = {i}')
+        b.edge(prev, port, cur, 'in')
+        prev = cur
+    b.edge(prev, port, b.node('END'), 'in')
+    return b.data()
+
+
+def branch_ladder(n, depth=90):
+    """
+    Лестницы вложенных BRANCH/MERGE: каждая следующая ветка — в true‑ветви
+    предыдущей. Глубина одной лестницы ограничена depth (Python допускает
+    не больше 100 вложенных блоков, а отступы строк растут с глубиной),
+    лестницы идут друг за другом, пока не наберётся n узлов.
+    """
+    b = _Builder()
+    prev, port = b.node('START'), 'out'
+    count = max((n - 3) // 3, 1)
+    k = 0
+    while k < count:
+        merges = []
+        for i in range(min(depth, count - k)):
+            br = b.node('BRANCH', f'x > {k}', i)
+            f = b.node('ACTION', f'y = {k}', i + 1)
+            m = b.node('MERGE', '', i)
+            b.edge(prev, port, br, 'in')
+            b.edge(br, 'out_false', f, 'in')
+            b.edge(f, 'out', m, 'in2')
+            merges.append(m)
+            prev, port = br, 'out_true'
+            k += 1
+        a = b.node('ACTION', 'z = 0', len(merges))
+        b.edge(prev, port, a, 'in')
+        b.edge(a, 'out', merges[-1], 'in1')
+        for inner, outer in zip(reversed(merges), list(reversed(merges))[1:]):
+            b.edge(inner, 'out', outer, 'in1')
+        prev, port = merges[0], 'out'
+    b.edge(prev, port, b.node('END'), 'in')
+    return b.data()
+
+
+def nested_loops(n, depth=8):
+    """Цепочка гнёзд FOR/WHILE глубины depth с ACTION во внутреннем теле."""
+    b = _Builder()
+    prev, port = b.node('START'), 'out'
+    k = 0
+    while len(b.nodes) + depth + 2 <= n or k == 0:
+        loops = []
+        for d in range(depth):
+            if d % 2 == 0:
+                loop = b.node('FOR', f'i{d} in range({d + 2})', d)
+            else:
+                loop = b.node('WHILE', f'w{d} < {d + 2}', d)
+            b.edge(prev, port, loop, 'in')
+            loops.append(loop)
+            prev, port = loop, 'out_body'
+        body = b.node('ACTION', f'acc += {k}', depth)
+        b.edge(prev, port, body, 'in')
+        prev, port = body, 'out'
+        # замыкаем циклы изнутри наружу: выход вложенного — в in_back внешнего
+        for loop in reversed(loops):
+            b.edge(prev, port, loop, 'in_back')
+            prev, port = loop, 'out_end'
+        k += 1
+    b.edge(prev, port, b.node('END'), 'in')
+    return b.data()
+
+
+def wide_mixed(n, seed=1):
+    """Последовательность случайных небольших конструкций всех типов."""
+    rnd = random.Random(seed)
+    b = _Builder()
+    prev, port = b.node('START'), 'out'
+    while len(b.nodes) < n - 6:
+        kind = rnd.randrange(5)
+        if kind == 0:
+            cur = b.node('INPUT', 'a b')
+        elif kind == 1:
+            cur = b.node('OUTPUT', 'a, b')
+        elif kind == 2:
+            cur = b.node('ACTION', f'a = {rnd.randrange(100)}')
+        if kind <= 2:
+            b.edge(prev, port, cur, 'in')
+            prev, port = cur, 'out'
+        elif kind == 3:
+            br = b.node('BRANCH', 'a < b', 1)
+            t = b.node('ACTION', 'a += 1', 2)
+            f = b.node('OUTPUT', 'b', 2)
+            m = b.node('MERGE', '', 1)
+            b.edge(prev, port, br, 'in')
+            b.edge(br, 'out_true', t, 'in')
+            b.edge(br, 'out_false', f, 'in')
+            b.edge(t, 'out', m, 'in1')
+            b.edge(f, 'out', m, 'in2')
+            prev, port = m, 'out'
+        else:
+            if rnd.random() < .5:
+                loop = b.node('FOR', 'i in range(3)', 1)
+            else:
+                loop = b.node('WHILE', 'a < 3', 1)
+            body = b.node('ACTION', 'a += 1', 2)
+            b.edge(prev, port, loop, 'in')
+            b.edge(loop, 'out_body', body, 'in')
+            b.edge(body, 'out', loop, 'in_back')
+            prev, port = loop, 'out_end'
+    b.edge(prev, port, b.node('END'), 'in')
+    return b.data()
+
+
+SHAPES = {
+    'linear': linear_chain,
+    'ladder': branch_ladder,
+    'loops':  nested_loops,
+    'mixed':  wide_mixed,
+}
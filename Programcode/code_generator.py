@@ -1,14 +1,249 @@
 # code_generator.py
 import re
+import threading
 from GraphModel import GraphModel
+import ProgramIR
+import CodeOptimizer
+
+IDENT_RE = re.compile(r'^[A-Za-z_]\w*$')
+
+
+class _Region:
+    """
+    Кадр явного стека генерации: участок потока от cur до stop
+    с одним уровнем отступа. header — строка (например, 'else:'),
+    которая выводится перед первой строкой участка, если она появится;
+    owner — ID блока, к которому она относится в карте строк.
+    required — участок, который не может быть пустым (тело main, цикла,
+    ветвь «да»): если в нём не окажется строк, выводится pass.
+    marks — номера узлов, отмеченных этим участком в общей карте
+    посещений; при снятии кадра со стека отметки снимаются.
+    parent — объемлющий участок (соседняя ветвь на стеке им не является).
+    parts/nodes заполняются только при работе с RegionCache; ключ и nodes
+    состоят из ID узлов, поэтому кэш подходит и к копиям моделей.
+    """
+    __slots__ = ('key', 'parent', 'cur', 'stop', 'indent', 'pad', 'marks', 'header',
+                 'owner', 'required', 'opened', 'fresh', 'cacheable', 'parts', 'nodes')
+
+    def __init__(self, cur, stop, indent, parent=None, header=None, owner=None,
+                 required=False):
+        self.key = (cur.id if cur is not None else None,
+                    stop.id if stop is not None else None, indent)
+        self.parent = parent
+        self.cur = cur
+        self.stop = stop
+        self.indent = indent
+        self.pad = '    ' * indent
+        self.marks = []
+        self.header = header
+        self.owner = owner
+        self.required = required
+        self.opened = False
+        self.fresh = True
+        self.cacheable = True
+        self.parts = []
+        self.nodes = []
+
+
+class RegionCache:
+    """
+    Кэш сгенерированного кода по структурным участкам (тело main,
+    ветви BRANCH, тела циклов). Ключ участка — (первый узел,
+    узел‑ограничитель, отступ). Участок хранит только свои строки и
+    ссылки на вложенные участки, поэтому правка блока сбрасывает лишь
+    участки, содержащие его, — цепочку вверх по вложенности.
+    Кэш живёт между вызовами generate_code; об изменениях ему сообщают
+    через invalidate(). Генерация может идти в другом потоке: сбросы,
+    пришедшие во время неё, откладываются и применяются по её окончании.
+    epoch — счётчик сбросов: по нему генерация узнаёт, что её снимок схемы
+    старше кэша.
+    """
+
+    def __init__(self):
+        self.entries = {}     # key -> (parts, nodes)
+        self.parent = {}      # key -> ключ объемлющего участка или None
+        self.by_node = {}     # ID узла -> множество ключей участков
+        self.post_dom = None  # ID узла -> ID постдоминатора, пока не менялись связи
+        self.fast_io = False  # режим ввода/вывода сохранённых строк
+        self.epoch = 0        # число вызовов invalidate()/clear()
+        self.__lock = threading.Lock()
+        self.__busy = False
+        self.__pending = []   # отложенные сбросы: (ID, structure) или None — очистка
+
+    def put(self, key, parts, nodes, parent_key):
+        self.entries[key] = (parts, nodes)
+        self.parent[key] = parent_key
+        for n in nodes:
+            self.by_node.setdefault(n, set()).add(key)
+
+    def link(self, key, parent_key):
+        self.parent[key] = parent_key
+
+    def lines(self, key):
+        """Разворачивает сохранённый участок вместе с вложенными в строки."""
+        stack = [iter(self.entries[key][0])]
+        while stack:
+            for part in stack[-1]:
+                if part.__class__ is str:
+                    yield part
+                    continue
+                child, header = part
+                parts = self.entries[child][0]
+                if header is not None and parts:
+                    yield header
+                stack.append(iter(parts))
+                break
+            else:
+                stack.pop()
+
+    def acquire(self, epoch=None):
+        """
+        Начало генерации: до release() сбросы откладываются.
+        epoch — значение self.epoch в момент снимка схемы. Если с тех пор
+        приходили сбросы, снимок устарел: возвращается False, и генерация
+        не должна ни читать кэш, ни писать в него.
+        """
+        with self.__lock:
+            if self.__busy:
+                raise RuntimeError("RegionCache уже используется другой генерацией")
+            self.__busy = True
+            return epoch is None or epoch == self.epoch
+
+    def use_io(self, fast_io):
+        """
+        Вызывается под acquire(): строки INPUT/OUTPUT зависят от режима
+        ввода/вывода, поэтому при его смене участки сбрасываются.
+        """
+        if self.fast_io != fast_io:
+            self.fast_io = fast_io
+            self.__drop_regions()
+
+    def release(self):
+        with self.__lock:
+            self.__busy = False
+            for item in self.__pending:
+                if item is None:
+                    self.__clear()
+                else:
+                    self.__invalidate(*item)
+            self.__pending.clear()
+
+    def invalidate(self, *nodes, structure=False):
+        """
+        Сбрасывает участки, содержащие узлы nodes, и все объемлющие их.
+        structure=True — изменились связи: сбрасываются и постдоминаторы.
+        """
+        ids = [n.id for n in nodes]
+        with self.__lock:
+            self.epoch += 1
+            if self.__busy:
+                self.__pending.append((ids, structure))
+            else:
+                self.__invalidate(ids, structure)
+
+    def __invalidate(self, ids, structure):
+        if structure:
+            self.post_dom = None
+        for n in ids:
+            for key in self.by_node.pop(n, ()):
+                while key is not None:
+                    entry = self.entries.pop(key, None)
+                    if entry is not None:
+                        for m in entry[1]:
+                            keys = self.by_node.get(m)
+                            if keys is not None:
+                                keys.discard(key)
+                    key = self.parent.pop(key, None)
+
+    def clear(self):
+        with self.__lock:
+            self.epoch += 1
+            if self.__busy:
+                self.__pending.append(None)
+            else:
+                self.__clear()
+
+    def __clear(self):
+        self.__drop_regions()
+        self.post_dom = None
+
+    def __drop_regions(self):
+        self.entries.clear()
+        self.parent.clear()
+        self.by_node.clear()
+
 
 class CodeGenerator:
     @staticmethod
-    def generate_code(graph: GraphModel) -> list[str]:
+    def generate_code(graph: GraphModel, cache: RegionCache = None,
+                      source_map: list = None, optimize: bool = False,
+                      fast_io: bool = False) -> list[str]:
         """
         Проверяет связность портов и генерирует Python‑код из графа.
         Бросает ValueError при ошибках.
         """
+        return list(CodeGenerator.generate_code_iter(graph, cache, source_map, optimize,
+                                                     fast_io))
+
+    @staticmethod
+    def generate_code_iter(graph: GraphModel, cache: RegionCache = None,
+                           source_map: list = None, optimize: bool = False,
+                           fast_io: bool = False, epoch: int = None):
+        """
+        Потоковый вариант generate_code: отдаёт строки программы по одной.
+        Обход идёт по явному стеку участков, поэтому глубина вложенности
+        не ограничена стеком Python, а память растёт только с глубиной.
+        ValueError бросается в момент обхода соответствующего блока.
+        С cache неизменённые участки берутся из RegionCache готовыми.
+
+        source_map — список, в который для каждой строки (до её выдачи)
+        дописывается ID блока, из которого она получена; None — служебные
+        строки. Сохранённые участки кэша хранят только текст, поэтому
+        с source_map кэш не используется.
+
+        optimize=True — программа строится деревом (build_ir), проходит
+        CodeOptimizer и выводится из дерева; кэш при этом не используется.
+
+        fast_io=True — быстрый ввод/вывод (ProgramIR.FAST_IO_PROLOGUE):
+        INPUT читает очередной токен из заранее прочитанного stdin,
+        OUTPUT печатает в буфер, выводимый один раз по завершении main().
+
+        epoch — RegionCache.epoch в момент снимка graph (см. acquire):
+        по устаревшему снимку код строится без кэша.
+        """
+        if optimize:
+            program = CodeOptimizer.optimize(CodeGenerator.build_ir(graph))
+            yield from ProgramIR.emit(program, source_map, fast_io)
+            return
+        start = CodeGenerator._prepare(graph)
+
+        # точки слияния ветвлений — непосредственные постдоминаторы BRANCH
+        if cache is None or source_map is not None:
+            yield from CodeGenerator._emit(graph, start, graph.post_dominators().get, None,
+                                           source_map, fast_io)
+            return
+        # кэш занят до конца обхода: сбросы из других потоков ждут
+        fresh = cache.acquire(epoch)
+        try:
+            if not fresh:
+                # схема изменилась после снимка: его постдоминаторы и участки
+                # остались бы в кэше и испортили следующие генерации
+                yield from CodeGenerator._emit(graph, start, graph.post_dominators().get,
+                                               None, fast_io=fast_io)
+                return
+            cache.use_io(fast_io)
+            if cache.post_dom is None:
+                cache.post_dom = {n.id: d.id if d is not None else None
+                                  for n, d in graph.post_dominators().items()}
+            ids, by_id = cache.post_dom, graph.by_id
+            merge_of = lambda node: by_id.get(ids.get(node.id))
+            yield from CodeGenerator._emit(graph, start, merge_of, cache, fast_io=fast_io)
+        finally:
+            cache.release()
+
+    @staticmethod
+    def _prepare(graph: GraphModel):
+        """Шаги 1–3: START, проверка портов, индекс переходов. Возвращает START."""
         # 1. Найти START
         start = graph.find_start()
         if not start:
@@ -28,109 +263,211 @@ class CodeGenerator:
                         and not (node.type in ('FOR','WHILE') and port.name == 'out_end')):
                     raise ValueError(f"Выходной порт {node.id}.{port.name} не подключён")
 
-        # 3. Вспомогательные функции для переходов
-        def next_node(n):
-            if n.type in ('FOR','WHILE'):
-                p_end = next((pp for pp in n.ports if pp.name=='out_end'), None)
-                return p_end.connection.parent if p_end and p_end.connection else None
-            p = next((pp for pp in n.ports if pp.port_type=='out'), None)
-            return p.connection.parent if p and p.connection else None
-
-        def find_merge(tn, fn):
-            seen = set()
-            cur = tn
-            while cur:
-                seen.add(cur.id)
-                if cur.type in ('MERGE','END'): break
-                cur = next_node(cur)
-            cur = fn
-            while cur and cur.id not in seen:
-                if cur.type in ('MERGE','END'): break
-                cur = next_node(cur)
-            return cur if (cur and cur.type=='MERGE') else None
-
-        # 4. Рекурсивная генерация
-        code = ['def main():']
-
-        def process(node, stop, indent, visited=None):
-            if visited is None:
-                visited = set()
-            cur = node
-
-            while cur and cur != stop:
-                if cur.id in visited:
-                    return
-                visited.add(cur.id)
-
-                pad = '    ' * indent
-                tp, text = cur.type, cur.content.replace('\n','').strip()
-
-                if tp == 'ACTION':
-                    code.append(f"{pad}{text or 'pass'}")
-                    cur = next_node(cur)
-
-                elif tp == 'INPUT':
-                    vars_ = text.split()
-                    if not vars_:
-                        raise ValueError(f"Блок {cur.id}: нет переменных")
-                    pat = re.compile(r'^[A-Za-z_]\w*$')
-                    for v in vars_:
-                        if not pat.match(v):
-                            raise ValueError(f"Блок {cur.id}: некорректное имя {v}")
-                    for v in vars_:
-                        code.append(f"{pad}{v} = input()")
-                    cur = next_node(cur)
-
-                elif tp == 'OUTPUT':
-                    code.append(f"{pad}print({text})")
-                    cur = next_node(cur)
-
-                elif tp == 'BRANCH':
-                    cond = text or 'condition'
-                    true_node  = next(p for p in cur.ports if p.name=='out_true').connection.parent
-                    false_node = next(p for p in cur.ports if p.name=='out_false').connection.parent
-                    merge_node = find_merge(true_node, false_node)
-                    if not merge_node:
-                        raise ValueError(f"Блок {cur.id}: нет MERGE")
-
-                    # if ветка
-                    code.append(f"{pad}if {cond}:")
-                    process(true_node,  merge_node, indent+1, visited.copy())
-
-                    # else ветка: только если там есть действия
-                    pre_len = len(code)
-                    process(false_node, merge_node, indent+1, visited.copy())
-                    if len(code) > pre_len:
-                        # если после проверки false ветки появились строки, вставим else перед ними
-                        code.insert(pre_len, f"{pad}else:")
-                    # продолжаем с merge_node
-                    cur = merge_node
-
-                elif tp == 'FOR':
-                    itr = text or 'item in iterable'
-                    code.append(f"{pad}for {itr}:")
-                    body_node = next(p for p in cur.ports if p.name=='out_body').connection.parent
-                    end_node  = next(p for p in cur.ports if p.name=='out_end').connection
-                    end_node  = end_node.parent if end_node else None
-
-                    process(body_node, cur, indent+1, visited.copy())
-                    cur = end_node
-
-                elif tp == 'WHILE':
-                    cond = text or 'condition'
-                    code.append(f"{pad}while {cond}:")
-                    body_node = next(p for p in cur.ports if p.name=='out_body').connection.parent
-                    end_node  = next(p for p in cur.ports if p.name=='out_end').connection
-                    end_node  = end_node.parent if end_node else None
-
-                    process(body_node, cur, indent+1, visited.copy())
-                    cur = end_node
+        # 3. Индекс переходов графа
+        graph.build_index()
+        return start
+
+    @staticmethod
+    def build_ir(graph: GraphModel) -> ProgramIR.Program:
+        """
+        Обход графа в дерево ProgramIR вместо строк. Порядок обхода и
+        ошибки — те же, что у generate_code_iter; стек явный.
+        """
+        start = CodeGenerator._prepare(graph)
+        merge_of = graph.post_dominators().get
+        successors = graph.successors
+        next_node = graph.flow_next.get
+        ordinal = graph.ordinal
+        visited = bytearray(len(graph.nodes))
+        program = ProgramIR.Program(node_id=start.id)
+        # кадр: [текущий узел, ограничитель, список операторов, отметки]
+        stack = [[next_node(start), None, program.body, []]]
+        while stack:
+            frame = stack[-1]
+            cur, stop, out, marks = frame
+            if cur is None or cur is stop or visited[ordinal[cur]]:
+                for i in marks:
+                    visited[i] = 0
+                stack.pop()
+                continue
+            i = ordinal[cur]
+            visited[i] = 1
+            marks.append(i)
+
+            tp, text = cur.type, cur.content.replace('\n', '').strip()
+            frame[0] = next_node(cur)
+            if tp == 'ACTION':
+                out.append(ProgramIR.Action(text or 'pass', cur.id))
+            elif tp == 'INPUT':
+                out.append(ProgramIR.Input(CodeGenerator._input_names(cur, text), cur.id))
+            elif tp == 'OUTPUT':
+                out.append(ProgramIR.Output(text, cur.id))
+            elif tp == 'BRANCH':
+                outs = successors[cur]
+                merge_node = merge_of(cur)
+                if merge_node is None or merge_node.type != 'MERGE':
+                    raise ValueError(f"Блок {cur.id}: нет MERGE")
+                node = ProgramIR.If(text or 'condition', node_id=cur.id)
+                out.append(node)
+                # ветвь «да» обходится первой, как в generate_code_iter
+                stack.append([outs['out_false'], merge_node, node.orelse, []])
+                stack.append([outs['out_true'], merge_node, node.body, []])
+                frame[0] = merge_node
+            elif tp == 'FOR' or tp == 'WHILE':
+                default = 'item in iterable' if tp == 'FOR' else 'condition'
+                node = ProgramIR.Loop(tp.lower(), text or default, node_id=cur.id)
+                out.append(node)
+                stack.append([successors[cur]['out_body'], cur, node.body, []])
+        return program
+
+    @staticmethod
+    def _input_names(node, text):
+        vars_ = text.split()
+        if not vars_:
+            raise ValueError(f"Блок {node.id}: нет переменных")
+        for v in vars_:
+            if not IDENT_RE.match(v):
+                raise ValueError(f"Блок {node.id}: некорректное имя {v}")
+        return vars_
 
+    @staticmethod
+    def _emit(graph: GraphModel, start, merge_of, cache, source_map=None, fast_io=False):
+        """Обход по явному стеку участков; merge_of(branch) — узел слияния ветвления."""
+        successors = graph.successors
+        mapping = source_map is not None
+        next_node = graph.flow_next.get
+
+        # 4. Итеративная генерация по стеку участков.
+        # Узел считается посещённым, если его отметил любой участок на
+        # стеке: у вложенной ветви видны отметки всех объемлющих участков,
+        # а отметки соседней ветви снимаются, когда та завершится.
+        ordinal = graph.ordinal
+        visited = bytearray(len(graph.nodes))
+        recording = cache is not None
+        read, sink = ProgramIR.io_forms(fast_io)
+        lead = ProgramIR.prologue(fast_io)
+        if mapping:
+            source_map.extend([None] * (len(lead) + 1))
+        yield from lead
+        yield 'def main():'
+        stack = [_Region(next_node(start), None, 1, owner=start.id, required=True)]
+
+        while stack:
+            region = stack[-1]
+            cur = region.cur
+
+            if region.fresh:
+                region.fresh = False
+                if recording and region.key in cache.entries:
+                    # участок не менялся — выводим сохранённые строки
+                    stack.pop()
+                    if cache.entries[region.key][0] and region.header is not None:
+                        yield region.header
+                    yield from cache.lines(region.key)
+                    parent = region.parent
+                    cache.link(region.key, parent.key if parent else None)
+                    if parent is not None:
+                        parent.parts.append((region.key, region.header))
+                    continue
+
+            if cur is None or cur is region.stop or visited[ordinal[cur]]:
+                if cur is not None and cur is not region.stop:
+                    # остановка на чужой отметке зависит от объемлющих
+                    # участков — такие участки не кэшируются
+                    for r in stack:
+                        r.cacheable = False
+                if region.required and not region.opened:
+                    # пустое тело не допускается синтаксисом
+                    region.opened = True
+                    line = f"{region.pad}pass"
+                    if mapping:
+                        source_map.append(region.owner)
+                    yield line
+                    if recording:
+                        region.parts.append(line)
+                for i in region.marks:
+                    visited[i] = 0
+                stack.pop()
+                if recording and region.cacheable:
+                    parent = region.parent
+                    cache.put(region.key, region.parts, region.nodes,
+                              parent.key if parent else None)
+                    if parent is not None:
+                        parent.parts.append((region.key, region.header))
+                continue
+            i = ordinal[cur]
+            visited[i] = 1
+            region.marks.append(i)
+            if recording:
+                region.nodes.append(cur.id)
+
+            pad = region.pad
+            tp, text = cur.type, cur.content.replace('\n','').strip()
+            lines = ()
+            children = ()
+
+            if tp == 'ACTION':
+                lines = (f"{pad}{text or 'pass'}",)
+                region.cur = next_node(cur)
+
+            elif tp == 'INPUT':
+                vars_ = CodeGenerator._input_names(cur, text)
+                lines = [f"{pad}{v} = {read}" for v in vars_]
+                region.cur = next_node(cur)
+
+            elif tp == 'OUTPUT':
+                lines = (f"{pad}print({text}{sink})",)
+                region.cur = next_node(cur)
+
+            elif tp == 'BRANCH':
+                cond = text or 'condition'
+                outs = successors[cur]
+                merge_node = merge_of(cur)
+                if merge_node is None or merge_node.type != 'MERGE':
+                    raise ValueError(f"Блок {cur.id}: нет MERGE")
+
+                lines = (f"{pad}if {cond}:",)
+                inner = region.indent + 1
+                # else‑ветка выводится, только если в ней есть действия;
+                # стек — LIFO, поэтому true‑ветка кладётся последней
+                children = (
+                    _Region(outs['out_false'], merge_node, inner, region, f"{pad}else:", cur.id),
+                    _Region(outs['out_true'], merge_node, inner, region,
+                            owner=cur.id, required=True),
+                )
+                # продолжаем с merge_node
+                region.cur = merge_node
+
+            elif tp == 'FOR' or tp == 'WHILE':
+                if tp == 'FOR':
+                    lines = (f"{pad}for {text or 'item in iterable'}:",)
                 else:
-                    cur = next_node(cur)
-            return cur
+                    lines = (f"{pad}while {text or 'condition'}:",)
+                outs = successors[cur]
+                children = (
+                    _Region(outs['out_body'], cur, region.indent + 1, region,
+                            owner=cur.id, required=True),
+                )
+                region.cur = outs['out_end']
+
+            else:
+                region.cur = next_node(cur)
+
+            if lines:
+                if not region.opened:
+                    region.opened = True
+                    if region.header is not None:
+                        if mapping:
+                            source_map.append(region.owner)
+                        yield region.header
+                if mapping:
+                    source_map.extend([cur.id] * len(lines))
+                yield from lines
+                if recording:
+                    region.parts.extend(lines)
+            stack.extend(children)
 
-        first = next_node(start)
-        process(first, None, 1)
-        code += ['', "if __name__=='__main__':", '    main()']
-        return code
+        tail = ProgramIR.trailer(fast_io)
+        if mapping:
+            source_map.extend([None] * len(tail))
+        yield from tail
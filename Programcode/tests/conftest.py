@@ -4,5 +4,7 @@ import sys, os
 
 
 root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-if root not in sys.path:
-    sys.path.insert(0, root)
+# benchmarks — заменители Tk (standin) и генератор схем (synthetic)
+for path in (root, os.path.join(root, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,148 @@
+"""Графы для тестов: небольшие готовые схемы и сборка из описания (program)."""
+from GraphModel import GraphModel
+from NodeModel import NodeModel
+
+
+def connect(a, from_name, b, to_name):
+    """Утилита: соединить порт a.from_name → b.to_name."""
+    sp = next(p for p in a.ports if p.name == from_name)
+    dp = next(p for p in b.ports if p.name == to_name)
+    sp.connection = dp
+    dp.connection = sp
+
+
+def make_linear_graph():
+    """START -> ACTION -> END."""
+    g = GraphModel()
+    s = NodeModel('s', 'START')
+    a = NodeModel('a', 'ACTION')
+    e = NodeModel('e', 'END')
+    g.add_node(s); g.add_node(a); g.add_node(e)
+    connect(s, 'out', a, 'in')
+    connect(a, 'out', e, 'in')
+    return g
+
+
+def make_branch_graph():
+    """START -> BRANCH -> two ACTIONs -> MERGE -> END."""
+    g = GraphModel()
+    s = NodeModel('s', 'START')
+    b = NodeModel('b', 'BRANCH')
+    t = NodeModel('t', 'ACTION')
+    f = NodeModel('f', 'ACTION')
+    m = NodeModel('m', 'MERGE')
+    e = NodeModel('e', 'END')
+    for n in (s,b,t,f,m,e): g.add_node(n)
+    connect(s, 'out', b, 'in')
+    connect(b, 'out_true',  t, 'in')
+    connect(b, 'out_false', f, 'in')
+    connect(t, 'out', m, 'in1')
+    connect(f, 'out', m, 'in2')
+    connect(m, 'out', e, 'in')
+    return g
+
+
+def make_for_loop_graph():
+    """START -> FOR -> ACTION -> END."""
+    g = GraphModel()
+    s = NodeModel('s', 'START')
+    c = NodeModel('c', 'FOR')
+    a = NodeModel('a', 'ACTION')
+    e = NodeModel('e', 'END')
+    for n in (s,c,a,e): g.add_node(n)
+    connect(s, 'out', c, 'in')
+    connect(c, 'out_body', a, 'in')
+    connect(a, 'out', c, 'in_back')
+    connect(c, 'out_end', e, 'in')
+    return g
+
+
+def make_while_loop_graph():
+    """START -> WHILE -> ACTION -> END."""
+    g = GraphModel()
+    s = NodeModel('s', 'START')
+    w = NodeModel('w', 'WHILE')
+    a = NodeModel('a', 'ACTION')
+    e = NodeModel('e', 'END')
+    for n in (s,w,a,e): g.add_node(n)
+    connect(s, 'out', w, 'in')
+    connect(w, 'out_body', a, 'in')
+    connect(a, 'out', w, 'in_back')
+    connect(w, 'out_end', e, 'in')
+    return g
+
+
+def make_nested_ladder(depth):
+    """START -> BRANCH(1) -> ... -> BRANCH(depth), каждая со своим MERGE."""
+    g = GraphModel()
+    s = NodeModel('s', 'START')
+    e = NodeModel('e', 'END')
+    g.add_node(s)
+    g.add_node(e)
+    prev, prev_port = s, 'out'
+    tails = []
+    for i in range(depth):
+        b = NodeModel(f'b{i}', 'BRANCH', f'x > {i}')
+        f = NodeModel(f'f{i}', 'ACTION', f'y = {i}')
+        m = NodeModel(f'm{i}', 'MERGE')
+        for n in (b, f, m):
+            g.add_node(n)
+        connect(prev, prev_port, b, 'in')
+        connect(b, 'out_false', f, 'in')
+        connect(f, 'out', m, 'in2')
+        tails.append(m)
+        prev, prev_port = b, 'out_true'
+    a = NodeModel('a', 'ACTION', 'z = 0')
+    g.add_node(a)
+    connect(prev, prev_port, a, 'in')
+    connect(a, 'out', tails[-1], 'in1')
+    for inner, outer in zip(reversed(tails), list(reversed(tails))[1:]):
+        connect(inner, 'out', outer, 'in1')
+    connect(tails[0], 'out', e, 'in')
+    return g
+
+
+class Builder:
+    """Сборка графа: цепочка блоков и вложенные ветвления/циклы."""
+
+    def __init__(self):
+        self.g = GraphModel()
+        self.n = 0
+
+    def node(self, ntype, content=''):
+        self.n += 1
+        m = NodeModel(f'{ntype[0].lower()}{self.n}', ntype, content)
+        self.g.add_node(m)
+        return m
+
+    def chain(self, items, prev, port):
+        """items — ('ACTION', text) | ('IF', cond, [да], [нет]) | ('FOR'/'WHILE', h, [тело])."""
+        for item in items:
+            kind = item[0]
+            if kind == 'IF':
+                b = self.node('BRANCH', item[1])
+                m = self.node('MERGE')
+                connect(prev, port, b, 'in')
+                for arm, out, into in ((item[2], 'out_true', 'in1'), (item[3], 'out_false', 'in2')):
+                    last, lport = self.chain(arm, b, out)
+                    connect(last, lport, m, into)
+                prev, port = m, 'out'
+            elif kind in ('FOR', 'WHILE'):
+                loop = self.node(kind, item[1])
+                connect(prev, port, loop, 'in')
+                last, lport = self.chain(item[2], loop, 'out_body')
+                connect(last, lport, loop, 'in_back')
+                prev, port = loop, 'out_end'
+            else:
+                cur = self.node(kind, item[1])
+                connect(prev, port, cur, 'in')
+                prev, port = cur, 'out'
+        return prev, port
+
+
+def program(*items):
+    """Граф START -> items -> END (см. Builder.chain)."""
+    b = Builder()
+    last, port = b.chain(items, b.node('START'), 'out')
+    connect(last, port, b.node('END'), 'in')
+    return b.g
@@ -0,0 +1,92 @@
+import ast
+import subprocess
+import sys
+
+import pytest
+
+import AstBackend
+from synthetic import SHAPES
+from DiagramData import build_graph
+from DiagramValidator import DiagramValidator
+from NodeModel import NodeModel
+from code_generator import CodeGenerator
+from graphs import program
+
+
+def positions(tree):
+    return [(n.__class__.__name__, n.lineno) for n in ast.walk(tree) if hasattr(n, 'lineno')]
+
+
+@pytest.mark.parametrize('shape', sorted(SHAPES))
+@pytest.mark.parametrize('optimize', [False, True])
+@pytest.mark.parametrize('fast_io', [False, True])
+def test_module_matches_text_output(shape, optimize, fast_io):
+    g = build_graph(SHAPES[shape](300))
+    text_map, ast_map = [], []
+    text = CodeGenerator.generate_code(g, source_map=text_map, optimize=optimize,
+                                       fast_io=fast_io)
+    program = CodeGenerator.build_ir(g)
+    if optimize:
+        import CodeOptimizer
+        program = CodeOptimizer.optimize(program)
+    module = AstBackend.build_module(program, ast_map, fast_io)
+    reference = ast.parse('\n'.join(text))
+    assert ast.dump(module) == ast.dump(reference)
+    assert ast.unparse(module) == ast.unparse(reference)
+    # строки те же: трассировки и профиль совпадают с текстом
+    assert positions(module) == positions(reference)
+    assert ast_map == text_map
+    compile(module, '<diagram>', 'exec')
+
+
+def test_syntax_error_names_the_block():
+    with pytest.raises(AstBackend.BlockSyntaxError) as e:
+        AstBackend.compile_graph(program(('ACTION', 'x = 1'), ('OUTPUT', 'x +')))
+    assert e.value.node_id == 'o3'
+    assert isinstance(e.value, ValueError)
+
+
+def test_compile_error_is_mapped_to_block():
+    with pytest.raises(AstBackend.BlockSyntaxError) as e:
+        AstBackend.compile_graph(program(('ACTION', 'x = 1'), ('ACTION', 'break')))
+    assert e.value.node_id == 'a3'
+
+
+def test_pyc_runs_without_source(tmp_path):
+    code = AstBackend.compile_graph(program(('INPUT', 'a b'), ('ACTION', 's = int(a) + int(b)'),
+                                           ('OUTPUT', 's')))
+    path = str(tmp_path / 'prog.pyc')
+    AstBackend.write_pyc(code, path)
+    out = subprocess.run([sys.executable, path], input='2\n3\n',
+                         capture_output=True, text=True, check=True)
+    assert out.stdout == '5\n'
+
+
+def test_validator_reports_syntax_per_block():
+    v = DiagramValidator()
+    good, bad = NodeModel('a', 'ACTION', 'x = 1'), NodeModel('b', 'WHILE', 'x <')
+    v.check_all([good, bad])
+    assert not [d for d in v.diagnostics('a') if d.code == 'syntax']
+    assert [d.code for d in v.diagnostics('b') if d.code == 'syntax'] == ['syntax']
+    bad.content = 'x < 3'
+    v.update([bad])
+    assert not [d for d in v.diagnostics('b') if d.code == 'syntax']
+
+
+def test_deep_block_text_is_a_syntax_error():
+    deep = 'not ' * 3000 + 'x'
+    assert AstBackend.check('expr', deep)
+    v = DiagramValidator()
+    v.check_all([NodeModel('w', 'WHILE', deep)])
+    assert [d.code for d in v.diagnostics('w') if d.code == 'syntax'] == ['syntax']
+    with pytest.raises(AstBackend.BlockSyntaxError) as e:
+        AstBackend.compile_graph(program(('WHILE', deep, [('ACTION', 'pass')])))
+    assert e.value.node_id == 'w2'
+
+
+def test_comment_only_body_names_the_block():
+    with pytest.raises(AstBackend.BlockSyntaxError) as e:
+        AstBackend.compile_graph(program(('FOR', 'k in range(2)', [('ACTION', '# заметка')])))
+    assert e.value.node_id == 'a3'
+    # рядом с другим оператором комментарий допустим
+    AstBackend.compile_graph(program(('ACTION', '# заметка'), ('OUTPUT', '1')))
@@ -0,0 +1,87 @@
+import json
+import os
+import subprocess
+import sys
+
+import batch_compile
+from DiagramData import build_graph, build_models
+from code_generator import CodeGenerator
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def diagram(action='x = 1'):
+    return {
+        'nodes': [
+            {'id': 'n0', 'type': 'START',  'content': '',     'x': 0, 'y': 0},
+            {'id': 'n1', 'type': 'ACTION', 'content': action, 'x': 0, 'y': 100},
+            {'id': 'n2', 'type': 'END',    'content': '',     'x': 0, 'y': 200},
+        ],
+        'edges': [
+            {'from_node': 'n0', 'from_port': 'out', 'to_node': 'n1', 'to_port': 'in', 'points': None},
+            {'from_node': 'n1', 'from_port': 'out', 'to_node': 'n2', 'to_port': 'in',
+             'points': [[10, 150]]},
+        ],
+    }
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def test_build_graph_without_tk():
+    code = CodeGenerator.generate_code(build_graph(diagram()))
+    assert code[1] == '    x = 1'
+
+
+def test_duplicate_ids_are_renamed():
+    data = diagram()
+    data['nodes'].append({'id': 'n1', 'type': 'ACTION', 'x': 0, 'y': 0})
+    ids = [n.id for n in build_graph(data).nodes]
+    assert ids == ['n0', 'n1', 'n2', 'n1_2']
+
+
+def test_duplicate_ids_skip_taken_suffixes():
+    nodes = [{'id': i, 'type': 'ACTION', 'x': 0, 'y': 0} for i in ('a', 'a', 'a_3', 'a', 'a')]
+    models, _ = build_models({'nodes': nodes, 'edges': []})
+    assert [m.id for m, _, _ in models] == ['a', 'a_2', 'a_3', 'a_4', 'a_5']
+
+
+def test_modules_do_not_import_tkinter():
+    out = subprocess.run(
+        [sys.executable, '-c',
+         "import sys, batch_compile; print('tkinter' in sys.modules)"],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == 'False'
+
+
+def test_compile_directory(tmp_path, capsys):
+    src = tmp_path / 'src'
+    write(str(src / 'a.json'), diagram('a = 1'))
+    write(str(src / 'sub' / 'b.json'), diagram('b = 2'))
+    out = tmp_path / 'out'
+    assert batch_compile.main([str(src), '-o', str(out), '-j', '2']) == 0
+    assert (out / 'a.py').read_text(encoding='utf-8').splitlines()[1] == '    a = 1'
+    assert (out / 'sub' / 'b.py').exists()
+    assert capsys.readouterr().out.count('OK') == 2
+
+
+def test_failures_are_reported(tmp_path, capsys):
+    bad = diagram()
+    bad['edges'].pop()
+    write(str(tmp_path / 'good.json'), diagram())
+    write(str(tmp_path / 'bad.json'), bad)
+    assert batch_compile.main([str(tmp_path), '-j', '1']) == 1
+    assert (tmp_path / 'good.py').exists()
+    assert not (tmp_path / 'bad.py').exists()
+    assert 'FAIL' in capsys.readouterr().err
+
+
+def test_compile_to_pyc(tmp_path, capsys):
+    write(str(tmp_path / 'a.json'), diagram('print(6 * 7)'))
+    assert batch_compile.main([str(tmp_path), '-j', '1', '--pyc']) == 0
+    out = subprocess.run([sys.executable, str(tmp_path / 'a.pyc')],
+                         capture_output=True, text=True, check=True)
+    assert out.stdout == '42\n'
@@ -0,0 +1,34 @@
+import io
+
+import pytest
+
+import run_benchmarks
+from synthetic import SHAPES
+from DiagramData import build_graph
+from code_generator import CodeGenerator
+
+
+@pytest.mark.parametrize('shape', sorted(SHAPES))
+def test_synthetic_diagrams_compile(shape):
+    data = SHAPES[shape](300)
+    assert 250 <= len(data['nodes']) <= 310
+    code = CodeGenerator.generate_code(build_graph(data))
+    compile('\n'.join(code), shape, 'exec')
+
+
+def test_run_all_smoke():
+    out = io.StringIO()
+    # layout требует NumPy — его замер проверяется в test_layout
+    ops = [op for op in run_benchmarks.OPERATIONS if op != 'layout']
+    results = run_benchmarks.run_all(ops, ['linear'], [50],
+                                     repeat=1, memory=True, out=out)
+    assert set(results) == {'generate/linear/50', 'load/linear/50', 'collect/linear/50',
+                            'drag/linear/50'}
+    assert all(r['seconds'] > 0 and r['peak_kib'] > 0 for r in results.values())
+
+
+def test_compare_flags_regressions():
+    base = {'generate/linear/50': {'seconds': 1.0, 'peak_kib': 10.0}}
+    now = {'generate/linear/50': {'seconds': 1.1, 'peak_kib': 20.0}}
+    assert run_benchmarks.compare(now, base, 0.25, out=io.StringIO()) == \
+        ['generate/linear/50:peak_kib']
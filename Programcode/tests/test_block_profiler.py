@@ -0,0 +1,104 @@
+import os
+
+import BlockProfiler
+from standin import StandInApp
+from synthetic import SHAPES
+from DiagramData import build_graph
+from DiagramIO import DiagramIo
+from code_generator import CodeGenerator, RegionCache
+
+
+def edge(src, sport, dst, dport):
+    return {'from_node': src, 'from_port': sport, 'to_node': dst, 'to_port': dport,
+            'points': None}
+
+
+def loop_diagram():
+    """START -> INPUT n -> FOR k in range(n): ACTION -> OUTPUT -> END."""
+    nodes = [('s', 'START', ''), ('i', 'INPUT', 'n'),
+             ('f', 'FOR', 'k in range(int(n))'), ('a', 'ACTION', 't = sum(range(2000))'),
+             ('o', 'OUTPUT', '"done"'), ('e', 'END', '')]
+    return {
+        'nodes': [{'id': i, 'type': t, 'content': c, 'x': 0, 'y': 0} for i, t, c in nodes],
+        'edges': [edge('s', 'out', 'i', 'in'), edge('i', 'out', 'f', 'in'),
+                  edge('f', 'out_body', 'a', 'in'), edge('a', 'out', 'f', 'in_back'),
+                  edge('f', 'out_end', 'o', 'in'), edge('o', 'out', 'e', 'in')],
+    }
+
+
+def test_source_map_points_lines_to_blocks():
+    graph = build_graph(SHAPES['ladder'](60))
+    source_map = []
+    lines = CodeGenerator.generate_code(graph, source_map=source_map)
+    assert len(source_map) == len(lines)
+    # кэш при карте строк не мешает: текст тот же
+    assert lines == CodeGenerator.generate_code(graph, RegionCache())
+    by_id = {n.id: n for n in graph.nodes}
+    for line, node_id in zip(lines, source_map):
+        text = line.strip()
+        if node_id is None:
+            assert text in ('def main():', '', "if __name__=='__main__':", 'main()')
+        elif text == 'else:':
+            assert by_id[node_id].type == 'BRANCH'
+        elif by_id[node_id].type == 'BRANCH':
+            assert text.startswith('if ')
+        else:
+            assert text in (by_id[node_id].content, 'pass')
+
+
+def test_profile_counts_hits_per_block():
+    source_map = []
+    lines = CodeGenerator.generate_code(build_graph(loop_diagram()), source_map=source_map)
+    result = BlockProfiler.profile(lines, source_map, stdin='50\n', timeout=60)
+    assert result.returncode == 0 and result.stdout == 'done\n'
+    assert result.hits == {'i': 1, 'f': 51, 'a': 50, 'o': 1}
+    assert set(result.time) == {'i', 'f', 'a', 'o'}
+    # тело цикла — самый горячий блок
+    assert max(result.time, key=result.time.get) == 'a'
+
+
+def test_failing_program_keeps_partial_profile():
+    data = loop_diagram()
+    data['nodes'][3]['content'] = 't = 1 / (k - 3)'
+    source_map = []
+    lines = CodeGenerator.generate_code(build_graph(data), source_map=source_map)
+    result = BlockProfiler.profile(lines, source_map, stdin='10\n', timeout=60)
+    assert result.returncode != 0
+    assert 'ZeroDivisionError' in result.stderr
+    assert result.hits['a'] == 4 and result.hits['o'] == 0
+
+
+def test_heatmap_colors_shapes():
+    app = StandInApp()
+    DiagramIo(app)._load_data(loop_diagram())
+    ui = app.diagram_state.node('a')
+    base = app.canvas.items[ui.shape][1]['fill']
+    ui.set_heat(BlockProfiler.heat_color(1.0))
+    assert app.canvas.items[ui.shape][1]['fill'] == BlockProfiler.heat_color(1.0) != base
+    ui.set_heat(None)
+    assert app.canvas.items[ui.shape][1]['fill'] == base
+
+
+def test_run_past_deadline_is_stopped():
+    import time
+    source_map = []
+    g = build_graph({
+        'nodes': [{'id': i, 'type': t, 'content': c, 'x': 0, 'y': 0}
+                  for i, t, c in (('s', 'START', ''), ('w', 'WHILE', 'True'),
+                                  ('a', 'ACTION', 'k = 1'), ('e', 'END', ''))],
+        'edges': [edge('s', 'out', 'w', 'in'), edge('w', 'out_body', 'a', 'in'),
+                  edge('a', 'out', 'w', 'in_back'), edge('w', 'out_end', 'e', 'in')],
+    })
+    lines = CodeGenerator.generate_code(g, source_map=source_map)
+    run = BlockProfiler.ProfileRun(compile('\n'.join(lines), '<diagram>', 'exec'),
+                                   source_map, timeout=0.5)
+    deadline = time.monotonic() + 30
+    result = None
+    while result is None:
+        assert time.monotonic() < deadline
+        result = run.poll()
+        time.sleep(0.05)
+    assert result.error and result.returncode != 0
+    if os.name == 'posix':
+        # счётчики записаны при прерывании: видно, какой блок крутился
+        assert result.hits['a'] > 0
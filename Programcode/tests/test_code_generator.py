@@ -1,71 +1,10 @@
 import pytest
 from GraphModel import GraphModel
 from NodeModel import NodeModel
-from code_generator import CodeGenerator
+from code_generator import CodeGenerator, RegionCache
+from graphs import (connect, make_linear_graph, make_branch_graph, make_for_loop_graph,
+                    make_while_loop_graph, make_nested_ladder)
 
-def connect(a, from_name, b, to_name):
-    """Утилита: соединить порт a.from_name → b.to_name."""
-    sp = next(p for p in a.ports if p.name == from_name)
-    dp = next(p for p in b.ports if p.name == to_name)
-    sp.connection = dp
-    dp.connection = sp
-
-def make_linear_graph():
-    """START -> ACTION -> END."""
-    g = GraphModel()
-    s = NodeModel('s', 'START')
-    a = NodeModel('a', 'ACTION')
-    e = NodeModel('e', 'END')
-    g.add_node(s); g.add_node(a); g.add_node(e)
-    connect(s, 'out', a, 'in')
-    connect(a, 'out', e, 'in')
-    return g
-
-def make_branch_graph():
-    """START -> BRANCH -> two ACTIONs -> MERGE -> END."""
-    g = GraphModel()
-    s = NodeModel('s', 'START')
-    b = NodeModel('b', 'BRANCH')
-    t = NodeModel('t', 'ACTION')
-    f = NodeModel('f', 'ACTION')
-    m = NodeModel('m', 'MERGE')
-    e = NodeModel('e', 'END')
-    for n in (s,b,t,f,m,e): g.add_node(n)
-    connect(s, 'out', b, 'in')
-    connect(b, 'out_true',  t, 'in')
-    connect(b, 'out_false', f, 'in')
-    connect(t, 'out', m, 'in1')
-    connect(f, 'out', m, 'in2')
-    connect(m, 'out', e, 'in')
-    return g
-
-def make_for_loop_graph():
-    """START -> FOR -> ACTION -> END."""
-    g = GraphModel()
-    s = NodeModel('s', 'START')
-    c = NodeModel('c', 'FOR')
-    a = NodeModel('a', 'ACTION')
-    e = NodeModel('e', 'END')
-    for n in (s,c,a,e): g.add_node(n)
-    connect(s, 'out', c, 'in')
-    connect(c, 'out_body', a, 'in')
-    connect(a, 'out', c, 'in_back')
-    connect(c, 'out_end', e, 'in')
-    return g
-
-def make_while_loop_graph():
-    """START -> WHILE -> ACTION -> END."""
-    g = GraphModel()
-    s = NodeModel('s', 'START')
-    w = NodeModel('w', 'WHILE')
-    a = NodeModel('a', 'ACTION')
-    e = NodeModel('e', 'END')
-    for n in (s,w,a,e): g.add_node(n)
-    connect(s, 'out', w, 'in')
-    connect(w, 'out_body', a, 'in')
-    connect(a, 'out', w, 'in_back')
-    connect(w, 'out_end', e, 'in')
-    return g
 
 def test_linear():
     g = make_linear_graph()
@@ -137,5 +76,208 @@ def test_reentrance_prevention():
     # генерация должна завершиться, хоть и без тела
     assert 'while' in '\n'.join(code)
 
+def test_nested_branch_ladder():
+    code = CodeGenerator.generate_code(make_nested_ladder(3))
+    assert code[1:11] == [
+        '    if x > 0:',
+        '        if x > 1:',
+        '            if x > 2:',
+        '                z = 0',
+        '            else:',
+        '                y = 2',
+        '        else:',
+        '            y = 1',
+        '    else:',
+        '        y = 0',
+    ]
+
+def test_deep_nesting_beyond_recursion_limit():
+    import sys
+    depth = sys.getrecursionlimit() + 200
+    code = CodeGenerator.generate_code(make_nested_ladder(depth))
+    assert code[depth] == '    ' * depth + 'if x > %d:' % (depth - 1)
+
+def test_generate_code_iter_streams_same_lines():
+    it = CodeGenerator.generate_code_iter(make_branch_graph())
+    assert next(it) == 'def main():'
+    rest = list(it)
+    assert ['def main():'] + rest == CodeGenerator.generate_code(make_branch_graph())
+
+@pytest.mark.parametrize('make, body', [
+    (make_linear_graph,     ['    pass']),
+    (make_branch_graph,     ['    if condition:', '        pass', '    else:', '        pass']),
+    (make_for_loop_graph,   ['    for item in iterable:', '        pass']),
+    (make_while_loop_graph, ['    while condition:', '        pass']),
+])
+def test_exact_output(make, body):
+    code = CodeGenerator.generate_code(make())
+    assert code == ['def main():'] + body + ['', "if __name__=='__main__':", '    main()']
+
+def test_sibling_arms_do_not_share_visited():
+    # обе ветви ведут в один и тот же MERGE — каждая видит его заново
+    g = make_branch_graph()
+    code = CodeGenerator.generate_code(g)
+    assert code.count('        pass') == 2
+
+def test_region_cache_reuses_and_invalidates():
+    g = make_nested_ladder(5)
+    by_id = {n.id: n for n in g.nodes}
+    cache = RegionCache()
+    first = CodeGenerator.generate_code(g, cache)
+    assert first == CodeGenerator.generate_code(g)
+    assert CodeGenerator.generate_code(g, cache) == first
+
+    # правка блока во внутренней ветви сбрасывает только объемлющие участки
+    f3 = by_id['f3']
+    f3.content = 'y = 42'
+    cached = len(cache.entries)
+    cache.invalidate(f3)
+    assert 0 < len(cache.entries) < cached
+    assert ('f1', 'm1', 3) in cache.entries
+    assert ('b3', 'm2', 4) not in cache.entries
+    assert CodeGenerator.generate_code(g, cache) == CodeGenerator.generate_code(g)
+
+def test_region_cache_structure_change():
+    g = make_branch_graph()
+    by_id = {n.id: n for n in g.nodes}
+    cache = RegionCache()
+    CodeGenerator.generate_code(g, cache)
+    # вставляем ACTION между BRANCH и f
+    x = NodeModel('x', 'ACTION', 'x = 1')
+    g.add_node(x)
+    b, f = by_id['b'], by_id['f']
+    b.port('out_false').connection = None
+    f.port('in').connection = None
+    connect(b, 'out_false', x, 'in')
+    connect(x, 'out', f, 'in')
+    cache.invalidate(b, f, x, structure=True)
+    assert CodeGenerator.generate_code(g, cache) == CodeGenerator.generate_code(g)
+    assert '        x = 1' in CodeGenerator.generate_code(g, cache)
+
+def test_region_cache_defers_invalidation_while_busy():
+    g = make_branch_graph()
+    by_id = {n.id: n for n in g.nodes}
+    cache = RegionCache()
+    CodeGenerator.generate_code(g, cache)
+    cached = len(cache.entries)
+    cache.acquire()
+    with pytest.raises(RuntimeError):
+        cache.acquire()
+    cache.invalidate(by_id['t'])
+    assert len(cache.entries) == cached
+    cache.release()
+    assert len(cache.entries) < cached
+
+def test_empty_true_arm_and_main_get_pass():
+    g = make_branch_graph()
+    by_id = {n.id: n for n in g.nodes}
+    b, t, m = by_id['b'], by_id['t'], by_id['m']
+    by_id['f'].content = 'y = 2'
+    # ветвь «да» сразу в MERGE
+    connect(b, 'out_true', m, 'in1')
+    g.remove_node(t)
+    code = CodeGenerator.generate_code(g)
+    assert code[1:5] == ['    if condition:', '        pass', '    else:', '        y = 2']
+    compile('\n'.join(code), '<test>', 'exec')
+    assert CodeGenerator.generate_code(g, RegionCache()) == code
+
+    g = GraphModel()
+    s, e = NodeModel('s', 'START'), NodeModel('e', 'END')
+    g.add_node(s); g.add_node(e)
+    connect(s, 'out', e, 'in')
+    assert CodeGenerator.generate_code(g)[:2] == ['def main():', '    pass']
+
+@pytest.mark.parametrize('make', [make_linear_graph, make_branch_graph,
+                                  make_for_loop_graph, make_while_loop_graph])
+def test_ir_emits_same_text(make):
+    import ProgramIR
+    g = make()
+    direct, via_ir = [], []
+    assert (list(ProgramIR.emit(CodeGenerator.build_ir(g), via_ir))
+            == CodeGenerator.generate_code(g, source_map=direct))
+    assert via_ir == direct
+
+def make_io_graph():
+    """START -> INPUT a b -> FOR k in range(int(a)) -> OUTPUT -> END."""
+    g = GraphModel()
+    s = NodeModel('s', 'START')
+    i = NodeModel('i', 'INPUT', 'a b')
+    c = NodeModel('c', 'FOR', 'k in range(int(a))')
+    o = NodeModel('o', 'OUTPUT', 'k, b')
+    e = NodeModel('e', 'END')
+    for n in (s, i, c, o, e): g.add_node(n)
+    connect(s, 'out', i, 'in')
+    connect(i, 'out', c, 'in')
+    connect(c, 'out_body', o, 'in')
+    connect(o, 'out', c, 'in_back')
+    connect(c, 'out_end', e, 'in')
+    return g
+
+@pytest.mark.parametrize('optimize', [False, True])
+def test_fast_io_reads_tokens_and_buffers_output(optimize):
+    import subprocess, sys
+    g = make_io_graph()
+    plain = CodeGenerator.generate_code(g, optimize=optimize)
+    source_map = []
+    fast = CodeGenerator.generate_code(g, source_map=source_map, optimize=optimize,
+                                       fast_io=True)
+    assert len(source_map) == len(fast)
+    assert [fast[n] for n, nid in enumerate(source_map) if nid == 'i'] == [
+        '    a = _read()', '    b = _read()']
+    assert fast[source_map.index('o')] == '        print(k, b, file=_out)'
+    run = lambda lines, stdin: subprocess.run(
+        [sys.executable, '-c', '\n'.join(lines)], input=stdin,
+        capture_output=True, text=True, check=True).stdout
+    # токены могут идти в одной строке
+    assert run(fast, '3 x\n') == run(plain, '3\nx\n') == '0 x\n1 x\n2 x\n'
+    # нехватка ввода — та же ошибка, что у input()
+    broken = subprocess.run([sys.executable, '-c', '\n'.join(fast)], input='3',
+                            capture_output=True, text=True)
+    assert 'EOFError' in broken.stderr
+
+def test_region_cache_follows_io_mode():
+    g = make_io_graph()
+    cache = RegionCache()
+    plain = CodeGenerator.generate_code(g, cache)
+    fast = CodeGenerator.generate_code(g, cache, fast_io=True)
+    assert fast == CodeGenerator.generate_code(g, fast_io=True)
+    assert CodeGenerator.generate_code(g, cache) == plain
+
 if __name__ == '__main__':
     pytest.main() 
+
+def make_two_branches(swap):
+    """Две BRANCH подряд; swap — их закрывают MERGE с обменянными ID."""
+    g = GraphModel()
+    s, e = NodeModel('s', 'START'), NodeModel('e', 'END')
+    b1, b2 = NodeModel('b1', 'BRANCH', 'x > 0'), NodeModel('b2', 'BRANCH', 'y > 0')
+    arms = [NodeModel(i, 'ACTION', f'{i} = 1') for i in ('t1', 'f1', 't2', 'f2')]
+    m1, m2 = NodeModel('m1', 'MERGE'), NodeModel('m2', 'MERGE')
+    for n in (s, b1, b2, *arms, m1, m2, e):
+        g.add_node(n)
+    first, second = (m2, m1) if swap else (m1, m2)
+    connect(s, 'out', b1, 'in')
+    for b, (t, f), m in ((b1, arms[:2], first), (b2, arms[2:], second)):
+        connect(b, 'out_true', t, 'in')
+        connect(b, 'out_false', f, 'in')
+        connect(t, 'out', m, 'in1')
+        connect(f, 'out', m, 'in2')
+    connect(first, 'out', b2, 'in')
+    connect(second, 'out', e, 'in')
+    return g
+
+@pytest.mark.parametrize('finish', ['close', 'drain'])
+def test_stale_snapshot_does_not_fill_region_cache(finish):
+    # снимок взят до правки связей, а сброс пришёл раньше, чем генерация
+    # по снимку заняла кэш: её результаты не должны попасть в кэш
+    old, new = make_two_branches(False), make_two_branches(True)
+    cache = RegionCache()
+    CodeGenerator.generate_code(old, cache)
+    gen = CodeGenerator.generate_code_iter(old, cache, epoch=cache.epoch)
+    cache.invalidate(*new.nodes, structure=True)
+    if finish == 'close':
+        next(gen)
+        gen.close()
+    else:
+        assert list(gen) == CodeGenerator.generate_code(old)
+    assert CodeGenerator.generate_code(new, cache) == CodeGenerator.generate_code(new)
@@ -0,0 +1,129 @@
+import contextlib
+import io
+
+from synthetic import SHAPES
+from DiagramData import build_graph
+from code_generator import CodeGenerator
+from graphs import program
+
+
+def run(lines):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        exec('\n'.join(lines), {'__name__': '__main__'})
+    return out.getvalue()
+
+
+def outcome(lines):
+    try:
+        return run(lines)
+    except Exception as e:
+        return type(e).__name__
+
+
+def both(g):
+    plain = CodeGenerator.generate_code(g)
+    fast = CodeGenerator.generate_code(g, optimize=True)
+    assert run(plain) == run(fast)
+    return plain, fast
+
+
+def test_constant_branch_keeps_only_live_arm():
+    g = program(('ACTION', 'x = 1'),
+                ('IF', '2 > 1 and not 0', [('OUTPUT', 'x')], [('OUTPUT', '-x')]))
+    plain, fast = both(g)
+    assert fast[1:3] == ['    x = 1', '    print(x)']
+    assert not any('if ' in line for line in fast[:-3])
+
+
+def test_constant_loops():
+    g = program(('WHILE', '1 < 0', [('ACTION', 'y = 1')]),
+                ('FOR', 'k in ()', [('ACTION', 'y = 2')]),
+                ('ACTION', 'i = 0'),
+                ('WHILE', '1', [('ACTION', 'i += 1'),
+                                ('IF', 'i > 3', [('ACTION', 'break')], [])]),
+                ('OUTPUT', 'i'))
+    plain, fast = both(g)
+    assert '    while True:' in fast
+    assert not any('y =' in line for line in fast)
+
+
+def test_redundant_pass_and_dead_arms():
+    g = program(('ACTION', 'x = 5'),
+                ('ACTION', ''),
+                ('IF', 'x > 3', [('ACTION', '')], [('OUTPUT', 'x')]),
+                ('FOR', 'k in range(2)', [('ACTION', '')]),
+                ('IF', 'print("side") is None', [], []))
+    plain, fast = both(g)
+    assert fast[1:6] == ['    x = 5', '    if not (x > 3):', '        print(x)',
+                         '    for k in range(2):', '        pass']
+    assert '    print("side") is None' in fast
+
+
+def test_invariant_is_hoisted_from_loop_that_runs():
+    g = program(('ACTION', 'n = 7'), ('ACTION', 's = 0'),
+                ('FOR', 'k in range(3)', [('FOR', 'j in range(2)', [
+                    ('ACTION', 'm = n * 2'), ('ACTION', 's = s + m + j')])]),
+                ('OUTPUT', 's'))
+    plain, fast = both(g)
+    # из обоих циклов
+    assert fast[3] == '    m = n * 2'
+    assert fast[4:6] == ['    for k in range(3):', '        for j in range(2):']
+
+
+def test_constant_is_hoisted_when_only_used_inside():
+    g = program(('ACTION', 'i = 0'),
+                ('WHILE', 'i < 3', [('ACTION', 'step = 1'), ('ACTION', 'i = i + step')]),
+                ('OUTPUT', 'i'))
+    plain, fast = both(g)
+    assert fast.index('    step = 1') < fast.index('    while i < 3:')
+
+
+def test_unsafe_hoists_are_refused():
+    cases = [
+        # цикл может не выполниться, а выражение может бросить
+        [('ACTION', 'n = 0'), ('FOR', 'k in range(n)', [('ACTION', 'm = 1 / n')])],
+        # имя читается до присваивания
+        [('ACTION', 'm = 0'), ('FOR', 'k in range(2)', [('OUTPUT', 'm'), ('ACTION', 'm = 5')])],
+        # выражение зависит от переменной цикла
+        [('FOR', 'k in range(2)', [('ACTION', 'm = k + 1'), ('OUTPUT', 'm')])],
+        # присваивается не только здесь
+        [('FOR', 'k in range(2)', [('ACTION', 'm = 1'),
+                                   ('IF', 'k', [('ACTION', 'm = 2')], []), ('OUTPUT', 'm')])],
+        # значение после пустого цикла было бы другим
+        [('ACTION', 'm = 0'), ('WHILE', 'm > 0', [('ACTION', 'm = 1')]), ('OUTPUT', 'm')],
+        # изменяемый объект создаётся заново на каждом проходе
+        [('FOR', 'k in range(2)', [('ACTION', 'acc = []'), ('ACTION', 'acc.append(k)'),
+                                   ('OUTPUT', 'acc')])],
+        # до оператора есть другой, а выражение может бросить
+        [('ACTION', 'n = 0'), ('FOR', 'k in range(2)', [('OUTPUT', 'k'), ('ACTION', 'm = 1 // n')])],
+        # объект меняется на месте без присваивания имени
+        [('ACTION', 'b = []'), ('FOR', 'i in range(2)', [
+            ('ACTION', 'found = 3 in b'), ('OUTPUT', 'found'), ('ACTION', 'b.append(3)')])],
+        [('ACTION', 'a = [0]'), ('ACTION', 'b = [0]'), ('FOR', 'i in range(2)', [
+            ('ACTION', 'same = a == b'), ('OUTPUT', 'same'), ('ACTION', 'b[0] = 1')])],
+        # … в том числе через другое имя
+        [('ACTION', 'b = [1]'), ('ACTION', 'c = b'), ('FOR', 'i in range(2)', [
+            ('ACTION', 't = b + b'), ('OUTPUT', 't'), ('ACTION', 'c += [2]')])],
+    ]
+    for items in cases:
+        g = program(*items)
+        plain = CodeGenerator.generate_code(g)
+        fast = CodeGenerator.generate_code(g, optimize=True)
+        assert fast == plain, items
+        assert outcome(fast) == outcome(plain), items
+
+
+def test_unparsable_deep_text_is_left_alone():
+    deep = 'not ' * 3000 + 'x'
+    g = program(('ACTION', 'x = 1'), ('WHILE', deep, [('ACTION', 'y = x')]))
+    assert CodeGenerator.generate_code(g, optimize=True) == CodeGenerator.generate_code(g)
+
+
+def test_synthetic_shapes_stay_valid():
+    for make in SHAPES.values():
+        g = build_graph(make(300))
+        source_map = []
+        lines = CodeGenerator.generate_code(g, source_map=source_map, optimize=True)
+        compile('\n'.join(lines), '<optimized>', 'exec')
+        assert len(source_map) == len(lines)
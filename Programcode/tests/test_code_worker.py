@@ -0,0 +1,95 @@
+import time
+
+from standin import StandInRoot
+from synthetic import SHAPES
+from CodeWorker import CodeWorker
+from DiagramData import build_models
+from GraphModel import GraphModel
+from NodeModel import NodeModel
+from code_generator import CodeGenerator, RegionCache
+
+
+def wait(root, worker, timeout=10):
+    """Крутит отложенные вызовы, пока worker не доставит результат."""
+    deadline = time.monotonic() + timeout
+    while worker.busy:
+        assert time.monotonic() < deadline
+        root.run_pending()
+        time.sleep(0.005)
+    root.run_pending()
+
+
+def models_of(data):
+    return [m for m, _, _ in build_models(data)[0]]
+
+
+def reference(models):
+    g = GraphModel()
+    for m in models:
+        g.add_node(m)
+    return CodeGenerator.generate_code(g)
+
+
+def test_result_matches_generator():
+    models = models_of(SHAPES['loops'](40))
+    root = StandInRoot()
+    worker = CodeWorker(root, RegionCache())
+    got = []
+    worker.submit(models, lambda lines, error: got.append((lines, error)))
+    wait(root, worker)
+    assert got == [(reference(models), None)]
+    worker.close()
+
+
+def test_error_is_delivered():
+    root = StandInRoot()
+    worker = CodeWorker(root)
+    got = []
+    worker.submit([NodeModel('a', 'ACTION')], lambda lines, error: got.append((lines, error)))
+    wait(root, worker)
+    assert got[0][0] is None and isinstance(got[0][1], ValueError)
+    worker.close()
+
+
+def test_unexpected_error_does_not_stop_worker():
+    root = StandInRoot()
+    worker = CodeWorker(root)
+    got = []
+    # неизвестный параметр: TypeError ещё при создании генератора
+    worker.submit([NodeModel('a', 'ACTION')], lambda lines, error: got.append(error),
+                  no_such_option=True)
+    wait(root, worker)
+    assert isinstance(got[0], TypeError)
+    models = models_of(SHAPES['linear'](5))
+    worker.submit(models, lambda lines, error: got.append(lines))
+    wait(root, worker)
+    assert got[1] == reference(models)
+    worker.close()
+
+
+def test_superseded_job_is_not_delivered():
+    models = models_of(SHAPES['linear'](200))
+    root = StandInRoot()
+    worker = CodeWorker(root, RegionCache())
+    got = []
+    worker.submit(models, lambda lines, error: got.append('old'))
+    # правка после снятия копии не видна генерации
+    models[1].content = 'changed = 1'
+    worker.submit(models, lambda lines, error: got.append(lines))
+    wait(root, worker)
+    assert got == [reference(models)]
+    assert any('changed = 1' in line for line in got[0])
+    worker.close()
+
+
+def test_cancel_drops_result():
+    models = models_of(SHAPES['linear'](50))
+    root = StandInRoot()
+    worker = CodeWorker(root)
+    got = []
+    worker.submit(models, lambda lines, error: got.append(lines))
+    worker.cancel()
+    assert not worker.busy
+    worker.close()
+    root.run_pending()
+    assert got == []
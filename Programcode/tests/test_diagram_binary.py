@@ -0,0 +1,112 @@
+import json
+import os
+
+import pytest
+
+import DiagramBinary
+from DiagramBinary import BinaryDiagram, read_binary, write_binary
+from DiagramData import read_diagram, write_diagram
+
+
+def sample(n=20, step=35):
+    nodes = [{'id': f'n{i}', 'type': 'ACTION', 'content': f'x{i % 3} += 1',
+              'x': 100 + (i % 4) * step, 'y': 40 * i} for i in range(n)]
+    nodes[0].update(type='START', content='')
+    nodes[-1].update(type='END', content='')
+    nodes[1]['content'] = 'печать("привет")'
+    edges = [{'from_node': f'n{i}', 'from_port': 'out', 'to_node': f'n{i + 1}',
+              'to_port': 'in', 'points': None} for i in range(n - 1)]
+    edges[2]['points'] = [[10, 20], [-5, 400]]
+    return {'nodes': nodes, 'edges': edges}
+
+
+def test_roundtrip_integer_coordinates(tmp_path):
+    data = sample()
+    path = str(tmp_path / 'd.rgzd')
+    write_binary(data, path)
+    assert read_binary(path) == data
+    with BinaryDiagram(path) as d:
+        assert not d.flags & DiagramBinary.FLOAT_COORDS
+
+
+def test_fast_io_option_roundtrip(tmp_path):
+    data = sample()
+    data['options'] = {'fast_io': True}
+    for name in ('d.rgzd', 'd.json'):
+        path = str(tmp_path / name)
+        write_diagram(data, path)
+        assert read_diagram(path) == data
+    with BinaryDiagram(str(tmp_path / 'd.rgzd')) as d:
+        assert d.flags & DiagramBinary.FAST_IO
+
+
+def test_roundtrip_float_coordinates(tmp_path):
+    data = sample()
+    data['nodes'][3]['x'] = 12.25
+    data['edges'][2]['points'][1] = [0.1, 1e9]
+    path = str(tmp_path / 'd.rgzd')
+    write_binary(data, path)
+    assert read_binary(path) == data
+
+
+def test_strings_are_deduplicated_and_smaller_than_json(tmp_path):
+    data = sample(500)
+    bin_path, json_path = str(tmp_path / 'd.rgzd'), str(tmp_path / 'd.json')
+    write_diagram(data, bin_path)
+    write_diagram(data, json_path)
+    assert os.path.getsize(bin_path) * 3 < os.path.getsize(json_path)
+    assert read_diagram(bin_path) == json.load(open(json_path, encoding='utf-8'))
+
+
+def test_content_is_decoded_lazily(tmp_path):
+    path = str(tmp_path / 'd.rgzd')
+    write_binary(sample(), path)
+    with BinaryDiagram(path) as d:
+        assert d.node_count == 20 and d.edge_count == 19
+        assert d.node_content(1) == 'печать("привет")'
+        assert d.node_position(2) == (170, 80)
+        # декодированы только запрошенная строка и ничего больше
+        assert len(d._strings) == 1
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / 'd.rgzd'
+    path.write_bytes(b'{"nodes": [], "edges": []}' + b' ' * 40)
+    with pytest.raises(ValueError):
+        read_binary(str(path))
+
+
+def test_missing_coordinates_roundtrip(tmp_path):
+    data = sample()
+    del data['nodes'][3]['x'], data['nodes'][3]['y']
+    del data['nodes'][4]['y']
+    path = str(tmp_path / 'd.rgzd')
+    write_binary(data, path)
+    nodes = read_binary(path)['nodes']
+    assert (nodes[3]['x'], nodes[3]['y']) == (None, None)
+    assert (nodes[4]['x'], nodes[4]['y']) == (data['nodes'][4]['x'], None)
+    assert (nodes[5]['x'], nodes[5]['y']) == (data['nodes'][5]['x'], data['nodes'][5]['y'])
+
+
+@pytest.mark.parametrize('field, value', [(0, 999), (4, 1000)])
+def test_corrupt_edge_is_rejected(tmp_path, field, value):
+    path = tmp_path / 'd.rgzd'
+    write_binary(sample(), str(path))
+    with BinaryDiagram(str(path)) as d:
+        at = d._edges_at + 4 * field
+    raw = bytearray(path.read_bytes())
+    raw[at:at + 4] = value.to_bytes(4, 'little')
+    path.write_bytes(bytes(raw))
+    with pytest.raises(ValueError):
+        read_binary(str(path))
+
+
+def test_corrupt_string_offset_is_rejected(tmp_path):
+    path = tmp_path / 'd.rgzd'
+    write_binary(sample(), str(path))
+    raw = bytearray(path.read_bytes())
+    at = DiagramBinary._HEADER.size + 4
+    raw[at:at + 4] = (1 << 20).to_bytes(4, 'little')
+    path.write_bytes(bytes(raw))
+    with pytest.raises(ValueError):
+        read_binary(str(path))
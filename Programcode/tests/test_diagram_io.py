@@ -0,0 +1,33 @@
+import pytest
+
+from standin import StandInApp
+from synthetic import SHAPES
+from DiagramIO import DiagramIo
+from NodeModel import NodeModel
+
+
+def test_load_pauses_checks_and_code_generation():
+    app = StandInApp()
+    DiagramIo(app)._load_data(SHAPES['mixed'](200))
+    # связи при загрузке не запускают генерацию — одна после неё
+    assert app.code_requests == 1
+    assert not list(app.validator.all())
+
+
+def test_malformed_file_keeps_checks_and_code_generation():
+    app = StandInApp()
+    io = DiagramIo(app)
+    io._load_data(SHAPES['linear'](20))
+    bad = {'nodes': [{'id': 's', 'type': 'START', 'content': '', 'x': 0, 'y': 0}],
+           'edges': [{'from_node': 's', 'from_port': 'out', 'to_node': 'nowhere',
+                      'to_port': 'in', 'points': None}]}
+    with pytest.raises(KeyError):
+        io._load_data(bad)
+    # текущая схема не тронута, правки снова проверяются и генерируют код
+    assert len(app.diagram_state.nodes_ui) == 20
+    assert not app.code_paused
+    requests = app.code_requests
+    ui = app.add_node(NodeModel(app.diagram_state.new_id(), 'ACTION', 'a = 1'), 500, 500)
+    app.root.run_pending()
+    assert app.code_requests > requests
+    assert app.validator.diagnostics(ui.model.id)
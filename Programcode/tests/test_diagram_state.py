@@ -0,0 +1,68 @@
+import pytest
+
+from DiagramState import DiagramState
+from NodeModel import NodeModel
+
+
+class FakeNode:
+    def __init__(self, x=0, y=0, node_id=None, ntype='ACTION'):
+        self.x, self.y = x, y
+        self.model = NodeModel(node_id or f'f{x}_{y}', ntype)
+
+    def bbox(self):
+        return (self.x, self.y, self.x + 10, self.y + 10)
+
+
+class FakeConnection:
+    def __init__(self, src_ui, dst_ui):
+        self.src_ui, self.dst_ui = src_ui, dst_ui
+        self.points = [(0, 0), (10, 10)]
+
+
+def test_connections_of_tracks_incidence():
+    state = DiagramState()
+    a, b, c = FakeNode(), FakeNode(50), FakeNode(100)
+    for n in (a, b, c):
+        state.add_node(n)
+    ab, bc = FakeConnection(a, b), FakeConnection(b, c)
+    state.add_connection(ab)
+    state.add_connection(bc)
+    assert set(state.connections_of(b)) == {ab, bc}
+    assert state.connections_of(a) == [ab]
+
+    state.remove_connection(ab)
+    assert state.connections_of(a) == []
+    assert state.connections_of(b) == [bc]
+    state.clear()
+    assert state.connections_of(c) == []
+
+
+def test_ids_are_not_reused_after_delete():
+    state = DiagramState()
+    a = FakeNode(node_id=state.new_id())
+    b = FakeNode(10, node_id=state.new_id())
+    state.add_node(a)
+    state.add_node(b)
+    state.remove_node(a)
+    c = FakeNode(20, node_id=state.new_id())
+    assert c.model.id not in (a.model.id, b.model.id)
+    state.add_node(c)
+    assert list(state.nodes) == [b.model.id, c.model.id]
+
+
+def test_loaded_ids_advance_allocator():
+    state = DiagramState()
+    state.add_node(FakeNode(node_id='n41'))
+    assert state.new_id() == 'n42'
+    with pytest.raises(ValueError):
+        state.add_node(FakeNode(5, node_id='n41'))
+
+
+def test_type_counts():
+    state = DiagramState()
+    start = FakeNode(node_id='s', ntype='START')
+    state.add_node(start)
+    state.add_node(FakeNode(10, node_id='a'))
+    assert state.count('START') == 1 and state.count('END') == 0
+    state.remove_node(start)
+    assert state.count('START') == 0
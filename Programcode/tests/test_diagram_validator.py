@@ -0,0 +1,151 @@
+import random
+
+from standin import StandInApp
+from synthetic import SHAPES
+from DiagramIO import DiagramIo
+from DiagramValidator import DiagramValidator
+from NodeModel import NodeModel
+
+
+def add(app, ntype, x, y, content=''):
+    return app.add_node(NodeModel(app.diagram_state.new_id(), ntype, content), x, y)
+
+
+def link(app, su, sport, du, dport):
+    return app.connect(su, su.model.port(sport), du, du.model.port(dport))
+
+
+def codes(validator):
+    return sorted((d.node_id, d.code) for d in validator.all())
+
+
+def full_check(app):
+    """Диагностики той же схемы, проверенной с нуля."""
+    v = DiagramValidator()
+    v.check_all([ui.model for ui in app.diagram_state.nodes_ui])
+    return codes(v)
+
+
+def test_all_errors_are_collected():
+    app = StandInApp()
+    add(app, 'INPUT', 0, 0, 'x 1y')
+    add(app, 'ACTION', 0, 100, 'x = 1')
+    app.root.run_pending()
+    got = {(d.code, d.message) for d in app.validator.all()}
+    # генератор остановился бы на первой из них
+    assert ('start', "Отсутствует блок START") in got
+    assert any(code == 'input' and '1y' in msg for code, msg in got)
+    ports = [msg for code, msg in got if code == 'port']
+    assert len(ports) == 4
+
+
+def test_unreachable_block_and_cycle_outside_loop():
+    app = StandInApp()
+    s = add(app, 'START', 0, 0)
+    a = add(app, 'ACTION', 0, 100, 'a = 1')
+    e = add(app, 'END', 0, 200)
+    b = add(app, 'ACTION', 300, 100, 'b = 1')
+    c = add(app, 'ACTION', 300, 200, 'c = 1')
+    link(app, s, 'out', a, 'in')
+    link(app, a, 'out', e, 'in')
+    link(app, b, 'out', c, 'in')
+    link(app, c, 'out', b, 'in')
+    app.root.run_pending()
+    v = app.validator
+    assert not v.errors()
+    assert {(d.node_id, d.code) for d in v.all()} == {
+        (b.model.id, 'unreachable'), (c.model.id, 'unreachable'),
+        (b.model.id, 'cycle'), (c.model.id, 'cycle')}
+
+
+def test_loop_back_edge_is_not_a_cycle():
+    app = StandInApp()
+    s = add(app, 'START', 0, 0)
+    w = add(app, 'WHILE', 0, 100, 'i < 3')
+    body = add(app, 'ACTION', 0, 200, 'i += 1')
+    e = add(app, 'END', 200, 100)
+    link(app, s, 'out', w, 'in')
+    link(app, w, 'out_body', body, 'in')
+    link(app, body, 'out', w, 'in_back')
+    link(app, w, 'out_end', e, 'in')
+    app.root.run_pending()
+    assert app.validator.all() == []
+
+
+def test_branch_without_merge():
+    app = StandInApp()
+    s = add(app, 'START', 0, 0)
+    b = add(app, 'BRANCH', 0, 100, 'x > 0')
+    e1 = add(app, 'END', -200, 200)
+    e2 = add(app, 'END', 200, 200)
+    link(app, s, 'out', b, 'in')
+    link(app, b, 'out_true', e1, 'in')
+    link(app, b, 'out_false', e2, 'in')
+    app.root.run_pending()
+    assert codes(app.validator) == [(b.model.id, 'merge')]
+
+
+def test_incremental_update_matches_full_check():
+    app = StandInApp()
+    DiagramIo(app)._load_data(SHAPES['mixed'](120))
+    assert codes(app.validator) == full_check(app) == []
+    rnd = random.Random(7)
+    removed = []
+    for _ in range(60):
+        op = rnd.random()
+        if op < 0.5 and app.diagram_state.connections:
+            conn = rnd.choice(list(app.diagram_state.connections))
+            removed.append((conn.src_ui, conn.sp, conn.dst_ui, conn.dp))
+            app.disconnect(conn)
+        elif op < 0.8 and removed:
+            su, sp, du, dp = removed.pop(rnd.randrange(len(removed)))
+            if sp.connection is None and dp.connection is None:
+                app.connect(su, sp, du, dp)
+        else:
+            ui = rnd.choice(list(app.diagram_state.nodes_ui))
+            if ui.model.type == 'INPUT':
+                ui.set_content(rnd.choice(['x', 'x 2y', '']))
+        app.root.run_pending()
+        assert codes(app.validator) == full_check(app)
+
+
+def test_undo_of_node_removal_restores_diagnostics():
+    app = StandInApp()
+    s = add(app, 'START', 0, 0)
+    a = add(app, 'ACTION', 0, 100, 'a = 1')
+    link(app, s, 'out', a, 'in')
+    app.root.run_pending()
+    before = codes(app.validator)
+    app.delete_node(a)
+    app.root.run_pending()
+    assert codes(app.validator) == full_check(app)
+    app.history.undo()
+    app.root.run_pending()
+    assert codes(app.validator) == before
+
+
+def test_listeners_see_only_touched_nodes():
+    app = StandInApp()
+    data = SHAPES['linear'](200)
+    DiagramIo(app)._load_data(data)
+    ids = [n['id'] for n in data['nodes']]
+    seen = []
+    app.validator.listeners.append(seen.append)
+    app.disconnect(app.find_connection(ids[100], 'out'))
+    app.root.run_pending()
+    # оторванный хвост схемы недостижим, голова не затронута
+    assert set(seen) == set(ids[100:])
+
+
+def test_markers_follow_diagnostics():
+    app = StandInApp()
+    app.validator.listeners.append(
+        lambda node_id: node_id is not None and app.diagram_state.node(node_id)
+        .set_diagnostics(app.validator.diagnostics(node_id)))
+    s = add(app, 'START', 0, 0)
+    a = add(app, 'ACTION', 0, 100, 'a = 1')
+    app.root.run_pending()
+    assert a.marker_ids and s.marker_ids
+    link(app, s, 'out', a, 'in')
+    app.root.run_pending()
+    assert not s.marker_ids and a.marker_ids
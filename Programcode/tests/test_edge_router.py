@@ -0,0 +1,111 @@
+from standin import StandInApp
+from DiagramIO import DiagramIo
+from NodeModel import NodeModel
+
+
+def orthogonal(points):
+    return all(x0 == x1 or y0 == y1 for (x0, y0), (x1, y1) in zip(points, points[1:]))
+
+
+def crosses(points, box):
+    """Проходит ли ломаная через внутренность прямоугольника."""
+    bx0, by0, bx1, by1 = box
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        if y0 == y1 and by0 < y0 < by1 and min(x0, x1) < bx1 and bx0 < max(x0, x1):
+            return True
+        if x0 == x1 and bx0 < x0 < bx1 and min(y0, y1) < by1 and by0 < max(y0, y1):
+            return True
+    return False
+
+
+def add(app, ntype, x, y, content=''):
+    return app.add_node(NodeModel(app.diagram_state.new_id(), ntype, content), x, y)
+
+
+def test_route_goes_around_blocks():
+    app = StandInApp()
+    a = add(app, 'ACTION', 100, 50)
+    wall = add(app, 'ACTION', 60, 220, 'a rather wide block in the way')
+    b = add(app, 'ACTION', 100, 400)
+    conn = app.connect(a, a.model.port('out'), b, b.model.port('in'))
+    assert conn.routed and conn.materialized
+    pts = conn.points
+    assert pts[0] == a.port_position(a.model.port('out'))
+    assert pts[-1] == b.port_position(b.model.port('in'))
+    assert orthogonal(pts)
+    assert not crosses(pts, wall.bbox())
+
+
+def test_loop_back_edge_avoids_its_blocks():
+    app = StandInApp()
+    loop = add(app, 'WHILE', 200, 50, 'i < 3')
+    body = add(app, 'ACTION', 200, 200, 'i += 1')
+    app.connect(loop, loop.model.port('out_body'), body, body.model.port('in'))
+    back = app.connect(body, body.model.port('out'), loop, loop.model.port('in_back'))
+    assert orthogonal(back.points)
+    # вход in_back слева: последний отрезок подходит к нему слева направо
+    (x0, y0), (x1, y1) = back.points[-2:]
+    assert y0 == y1 and x0 < x1
+    inner = back.points[1:-1]
+    assert not crosses(inner, loop.bbox()) and not crosses(inner, body.bbox())
+
+
+def test_only_routes_near_a_moved_block_are_recomputed():
+    app = StandInApp()
+    a = add(app, 'ACTION', 100, 50)
+    b = add(app, 'ACTION', 100, 400)
+    far = add(app, 'ACTION', 600, 50)
+    app.connect(a, a.model.port('out'), b, b.model.port('in'))
+    app.root.run_pending()
+    routed = app.router.routed
+    far.move_by(0, 40)
+    app.root.run_pending()
+    assert app.router.routed == routed
+    # блок, поставленный поперёк маршрута, заставляет его перепроложить
+    far.move_by(-500, 180)
+    app.root.run_pending()
+    assert app.router.routed == routed + 1
+    conn = app.diagram_state.connections_of(a)[0]
+    assert orthogonal(conn.points) and not crosses(conn.points, far.bbox())
+
+
+def test_manual_bends_switch_off_routing():
+    app = StandInApp()
+    a = add(app, 'ACTION', 100, 50)
+    b = add(app, 'ACTION', 400, 400)
+    conn = app.connect(a, a.model.port('out'), b, b.model.port('in'))
+    io = DiagramIo(app)
+    assert io._collect_data()['edges'][0]['points'] is None
+    conn.insert_bend(1, (50.0, 300.0))
+    assert not conn.routed and len(conn.handles) == 1
+    assert io._collect_data()['edges'][0]['points'] == [(50.0, 300.0)]
+    # ручной маршрут не перепрокладывается при перемещении блока
+    b.move_by(20, 0)
+    app.root.run_pending()
+    assert conn.points[1:-1] == [(50.0, 300.0)]
+    app.history.undo()                   # перемещение
+    app.history.undo()                   # сгиб
+    assert conn.routed and not conn.handles and orthogonal(conn.points)
+    assert io._collect_data()['edges'][0]['points'] is None
+
+
+def test_double_click_keeps_the_computed_route():
+    app = StandInApp()
+    a = add(app, 'ACTION', 100, 50)
+    wall = add(app, 'ACTION', 60, 220, 'a rather wide block in the way')
+    b = add(app, 'ACTION', 100, 400)
+    conn = app.connect(a, a.model.port('out'), b, b.model.port('in'))
+    route = list(conn.points)
+    assert len(route) > 3
+    # щелчок посередине одного из отрезков маршрута
+    (x0, y0), (x1, y1) = route[2], route[3]
+    click = ((x0 + x1) / 2, (y0 + y1) / 2)
+    conn.add_bend_near(click)
+    assert not conn.routed
+    assert conn.points == route[:3] + [click] + route[3:]
+    assert not crosses(conn.points, wall.bbox())
+    assert len(conn.handles) == len(route) - 1
+    # одна отмена возвращает автоматический маршрут
+    app.history.undo()
+    assert conn.routed and not conn.handles
+    assert conn.points == route
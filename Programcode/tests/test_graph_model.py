@@ -0,0 +1,79 @@
+from GraphModel import GraphModel
+from NodeModel import NodeModel
+from graphs import connect, make_branch_graph, make_for_loop_graph, make_nested_ladder
+
+
+def test_find_start_tracks_add_and_remove():
+    g = GraphModel()
+    a = NodeModel('a', 'ACTION')
+    s1 = NodeModel('s1', 'START')
+    s2 = NodeModel('s2', 'START')
+    for n in (a, s1, s2):
+        g.add_node(n)
+    assert g.find_start() is s1
+    g.remove_node(s1)
+    assert g.find_start() is s2
+    g.remove_node(s2)
+    assert g.find_start() is None
+
+
+def test_port_map_and_target():
+    a = NodeModel('a', 'ACTION')
+    e = NodeModel('e', 'END')
+    assert a.port('out') is a.ports[1]
+    assert a.port('nope') is None
+    assert a.target('out') is None
+    connect(a, 'out', e, 'in')
+    assert a.target('out') is e
+
+
+def test_successor_index_branch():
+    g = make_branch_graph()
+    succ = g.build_index()
+    b = next(n for n in g.nodes if n.id == 'b')
+    assert succ[b]['out_true'].id == 't'
+    assert succ[b]['out_false'].id == 'f'
+    # основной поток BRANCH идёт по первому выходу
+    assert g.flow_next[b].id == 't'
+
+
+def test_successor_index_loop_flows_through_out_end():
+    g = make_for_loop_graph()
+    g.build_index()
+    c = next(n for n in g.nodes if n.id == 'c')
+    assert g.successors[c]['out_body'].id == 'a'
+    assert g.flow_next[c].id == 'e'
+
+
+def test_post_dominators_find_merge():
+    g = make_branch_graph()
+    ipdom = g.post_dominators()
+    by_id = {n.id: n for n in g.nodes}
+    assert ipdom[by_id['b']] is by_id['m']
+    assert ipdom[by_id['t']] is by_id['m']
+    assert ipdom[by_id['m']] is by_id['e']
+    assert ipdom[by_id['e']] is None
+
+
+def test_post_dominators_nested_ladder():
+    g = make_nested_ladder(50)
+    ipdom = g.post_dominators()
+    by_id = {n.id: n for n in g.nodes}
+    for i in range(50):
+        assert ipdom[by_id[f'b{i}']] is by_id[f'm{i}']
+
+
+def test_post_dominators_loop_without_exit():
+    g = GraphModel()
+    s = NodeModel('s', 'START')
+    w = NodeModel('w', 'WHILE')
+    a = NodeModel('a', 'ACTION')
+    for n in (s, w, a):
+        g.add_node(n)
+    connect(s, 'out', w, 'in')
+    connect(w, 'out_body', a, 'in')
+    connect(a, 'out', w, 'in_back')
+    ipdom = g.post_dominators()
+    # неподключённый out_end ведёт к виртуальному выходу
+    assert ipdom[a] is w
+    assert ipdom[w] is None
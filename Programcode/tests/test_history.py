@@ -0,0 +1,82 @@
+from standin import StandInApp
+from DiagramIO import DiagramIo
+from History import History, inverse
+from NodeModel import NodeModel
+
+
+def snapshot(app):
+    data = DiagramIo(app)._collect_data()
+    # восстановленный блок встаёт в конец списка — порядок не сравниваем
+    for e in data['edges']:
+        e['points'] = [tuple(p) for p in e['points']] if e['points'] else None
+    data['nodes'].sort(key=lambda n: n['id'])
+    data['edges'].sort(key=lambda e: (e['from_node'], e['from_port']))
+    return data
+
+
+def build(app):
+    a = app.add_node(NodeModel(app.diagram_state.new_id(), 'ACTION', 'x = 1'), 100, 100)
+    b = app.add_node(NodeModel(app.diagram_state.new_id(), 'OUTPUT', 'x'), 100, 300)
+    conn = app.connect(a, a.model.port('out'), b, b.model.port('in'))
+    return a, b, conn
+
+
+def test_undo_redo_restores_every_step():
+    app = StandInApp()
+    states = [snapshot(app)]
+    a, b, conn = build(app)
+    states.append(snapshot(app))        # 3 записи: два блока и связь
+    for _ in range(20):                  # поток перетаскивания — одна запись
+        a.move_by(3, 1)
+    app.history.seal()
+    states.append(snapshot(app))
+    b.set_content('x + 1')
+    states.append(snapshot(app))
+    conn.insert_bend(1, (10.0, 20.0))
+    conn.move_bend(1, (15.0, 25.0))
+    app.history.seal()
+    states.append(snapshot(app))
+    app.delete_node(a)                   # связь удаляется в той же записи
+    states.append(snapshot(app))
+
+    steps = [1, 1, 1, 2, 1]              # записей на каждый снимок после первого
+    assert len(app.history.undo_stack) == 3 + sum(steps[1:])
+    for i in range(len(states) - 1, 0, -1):
+        n = 3 if i == 1 else steps[i - 1]
+        for _ in range(n):
+            assert app.history.undo()
+        assert snapshot(app) == states[i - 1]
+    assert not app.history.undo()
+    for i in range(1, len(states)):
+        n = 3 if i == 1 else steps[i - 1]
+        for _ in range(n):
+            assert app.history.redo()
+        assert snapshot(app) == states[i]
+
+
+def test_new_action_clears_redo():
+    app = StandInApp()
+    a, _, _ = build(app)
+    a.move_by(5, 5)
+    app.history.undo()
+    assert app.history.can_redo()
+    a.move_by(1, 1)
+    assert not app.history.can_redo()
+
+
+def test_memory_cap_evicts_oldest():
+    app = StandInApp()
+    app.history = History(app, max_bytes=2000)
+    a = app.add_node(NodeModel('n0', 'ACTION'), 0, 0)
+    for i in range(100):
+        a.set_content(f'x = {i}')
+    assert app.history.bytes <= 2000
+    assert 0 < len(app.history.undo_stack) < 100
+    assert app.history.undo_stack[-1].ops == [('edit', 'n0', 'x = 98', 'x = 99')]
+
+
+def test_inverse_is_involution():
+    ops = [('add_node', 'n1', 'ACTION', '', 0, 0), ('move', 'n1', 2, -3),
+           ('edit', 'n1', 'a', 'b'), ('bend_move', 'n1', 'out', 1, (0, 0), (1, 1))]
+    for op in ops:
+        assert inverse(inverse(op)) == op
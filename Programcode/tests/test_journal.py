@@ -0,0 +1,134 @@
+import os
+
+import pytest
+
+from standin import StandInApp
+from DiagramIO import DiagramIo
+from Journal import Journal, recover, replay, set_aside
+from NodeModel import NodeModel
+
+EMPTY = {'nodes': [], 'edges': []}
+
+
+def normalized(data):
+    nodes = sorted(data['nodes'], key=lambda n: n['id'])
+    edges = sorted(({**e, 'points': [list(p) for p in e['points']] if e['points'] else None}
+                    for e in data['edges']), key=lambda e: (e['from_node'], e['from_port']))
+    return {'nodes': nodes, 'edges': edges}
+
+
+def edit_session(app):
+    """Набор правок, затрагивающий все виды операций, включая отмену."""
+    a = app.add_node(NodeModel('n0', 'ACTION', 'x = 1'), 100, 100)
+    b = app.add_node(NodeModel('n1', 'OUTPUT', 'x'), 100, 300)
+    c = app.add_node(NodeModel('n2', 'END'), 100, 500)
+    conn = app.connect(a, a.model.port('out'), b, b.model.port('in'))
+    app.connect(b, b.model.port('out'), c, c.model.port('in'))
+    a.move_by(10, 5)
+    a.move_by(1, 1)
+    b.set_content('x * 2')
+    conn.insert_bend(1, (50, 60))        # автоматический маршрут становится ручным
+    conn.insert_bend(2, (70, 60))
+    conn.move_bend(2, (75, 65))
+    conn.remove_bend(1)
+    app.history.undo()
+    app.delete_node(c)
+    app.history.undo()
+    app.history.redo()
+
+
+def test_replay_matches_editor_state():
+    app = StandInApp()
+    ops = []
+    app.history.listeners.append(ops.append)
+    edit_session(app)
+    expected = DiagramIo(app)._collect_data()
+    assert normalized(replay(EMPTY, ops)) == normalized(expected)
+
+
+def test_diagram_options_survive_load_save_and_replay():
+    app = StandInApp()
+    io = DiagramIo(app)
+    data = {'nodes': [{'id': 's', 'type': 'START', 'content': '', 'x': 0, 'y': 0}],
+            'edges': [], 'options': {'fast_io': True}}
+    io._load_data(data)
+    assert app.code_options['fast_io']
+    assert io._collect_data()['options'] == {'fast_io': True}
+    assert replay(data, [('move', 's', 5, 5)])['options'] == {'fast_io': True}
+    # схема без параметров возвращает режим по умолчанию
+    io._load_data(EMPTY)
+    assert not app.code_options['fast_io']
+    assert 'options' not in io._collect_data()
+
+
+def test_recover_after_crash(tmp_path):
+    app = StandInApp()
+    journal = Journal(str(tmp_path), flush_interval=0.01)
+    app.history.listeners.append(journal.append)
+    journal.reset(EMPTY)
+    edit_session(app)
+    assert journal.flush(5)
+    # процесс «падает»: поток не остановлен, файлы остаются
+    recovered = recover(str(tmp_path))
+    assert normalized(recovered) == normalized(DiagramIo(app)._collect_data())
+    journal.close()
+
+
+def test_compaction_folds_journal_into_snapshot(tmp_path):
+    app = StandInApp()
+    journal = Journal(str(tmp_path), flush_interval=0.01, compact_ops=5)
+    app.history.listeners.append(journal.append)
+    journal.reset(EMPTY)
+    edit_session(app)
+    journal.flush(5)
+    journal.close()
+    assert journal.gen > 1                 # после reset было хотя бы одно сворачивание
+    names = sorted(os.listdir(tmp_path))
+    assert len([n for n in names if n.startswith('snapshot-')]) == 1
+    assert normalized(recover(str(tmp_path))) == normalized(DiagramIo(app)._collect_data())
+
+
+def test_torn_last_record_is_ignored(tmp_path):
+    journal = Journal(str(tmp_path), flush_interval=0.01)
+    journal.reset(EMPTY)
+    journal.append(('add_node', 'n0', 'START', '', 0, 0))
+    journal.flush(5)
+    journal.close()
+    path = tmp_path / f'journal-{journal.gen}.jsonl'
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('["move", "n0", 1')
+    assert recover(str(tmp_path))['nodes'] == [
+        {'id': 'n0', 'type': 'START', 'content': '', 'x': 0, 'y': 0}]
+
+
+def test_corrupt_journal_is_set_aside(tmp_path):
+    directory = str(tmp_path / 'autosave')
+    journal = Journal(directory, flush_interval=0.01)
+    journal.reset(EMPTY)
+    journal.append(('add_node', 'n0', 'START', '', 0, 0))
+    journal.append(('move', 'n0', 1, 1))
+    journal.flush(5)
+    journal.close()
+    path = os.path.join(directory, f'journal-{journal.gen}.jsonl')
+    with open(path, encoding='utf-8') as f:
+        lines = f.read().split('\n')
+    lines[0] = lines[0][:-3]          # испорчена не последняя запись
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines))
+    with pytest.raises(ValueError):
+        recover(directory)
+    kept = set_aside(directory)
+    # новый журнал в прежнем каталоге не трогает отложенные файлы
+    journal = Journal(directory, flush_interval=0.01)
+    journal.reset(EMPTY)
+    journal.close()
+    assert os.path.exists(os.path.join(kept, os.path.basename(path)))
+    assert set_aside(directory) != kept
+
+
+def test_clean_exit_discards_autosave(tmp_path):
+    journal = Journal(str(tmp_path), flush_interval=0.01)
+    journal.reset(EMPTY)
+    journal.append(('add_node', 'n0', 'START', '', 0, 0))
+    journal.close(discard=True)
+    assert recover(str(tmp_path)) is None
@@ -0,0 +1,122 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from synthetic import SHAPES
+from DiagramData import build_models
+from Layout import DEFAULT_SIZE, layered_layout
+from NodeModel import NodeModel
+from graphs import connect, make_branch_graph, make_linear_graph
+
+W, H = DEFAULT_SIZE
+
+
+def centre(pos, m):
+    x, y = pos[m]
+    return x + W / 2, y + H / 2
+
+
+def assert_no_overlaps(pos):
+    boxes = sorted(pos.values())
+    for i, (x0, y0) in enumerate(boxes):
+        for x1, y1 in boxes[i + 1:]:
+            if x1 >= x0 + W:
+                break
+            assert abs(y1 - y0) >= H, ((x0, y0), (x1, y1))
+
+
+def test_linear_chain_is_vertical():
+    g = make_linear_graph()
+    pos = layered_layout(g.nodes)
+    xs = {pos[m][0] for m in g.nodes}
+    ys = [pos[m][1] for m in g.nodes]
+    assert len(xs) == 1
+    assert ys == sorted(ys) and len(set(ys)) == 3
+
+
+def test_branch_arms_follow_ports():
+    g = make_branch_graph()
+    by_id = {m.id: m for m in g.nodes}
+    pos = layered_layout(g.nodes)
+    b, t, f, m = (by_id[k] for k in ('b', 't', 'f', 'm'))
+    # out_false слева, out_true справа, MERGE под обеими ветвями по центру BRANCH
+    assert centre(pos, f)[0] < centre(pos, b)[0] < centre(pos, t)[0]
+    assert pos[m][1] > max(pos[t][1], pos[f][1])
+    assert centre(pos, m)[0] == pytest.approx(centre(pos, b)[0], abs=1)
+    assert_no_overlaps(pos)
+
+
+def test_loop_exit_goes_below_body():
+    s, loop, a, b, e = (NodeModel('s', 'START'), NodeModel('l', 'WHILE', 'i < 3'),
+                        NodeModel('a', 'ACTION'), NodeModel('b', 'ACTION'), NodeModel('e', 'END'))
+    connect(s, 'out', loop, 'in')
+    connect(loop, 'out_body', a, 'in')
+    connect(a, 'out', b, 'in')
+    connect(b, 'out', loop, 'in_back')
+    connect(loop, 'out_end', e, 'in')
+    pos = layered_layout([s, loop, a, b, e])
+    ys = [pos[m][1] for m in (s, loop, a, b, e)]
+    assert ys == sorted(ys) and len(set(ys)) == 5
+    assert_no_overlaps(pos)
+
+
+def test_cycle_without_back_port():
+    a, b, c = NodeModel('a', 'ACTION'), NodeModel('b', 'ACTION'), NodeModel('c', 'ACTION')
+    connect(a, 'out', b, 'in')
+    connect(b, 'out', c, 'in')
+    connect(c, 'out', a, 'in')
+    pos = layered_layout([a, b, c])
+    assert len({y for _, y in pos.values()}) == 3
+
+
+def test_custom_sizes_do_not_overlap():
+    g = make_branch_graph()
+    pos = layered_layout(g.nodes, size=lambda m: (300, 40), h_gap=10)
+    xs = sorted(x for x, y in pos.values() if y == pos[g.nodes[2]][1])
+    assert all(x1 - x0 >= 310 for x0, x1 in zip(xs, xs[1:]))
+
+
+@pytest.mark.parametrize('shape', sorted(SHAPES))
+def test_synthetic_shapes(shape):
+    models = [m for m, _, _ in build_models(SHAPES[shape](300))[0]]
+    pos = layered_layout(models)
+    assert len(pos) == len(models)
+    assert min(x for x, _ in pos.values()) == 40
+    assert_no_overlaps(pos)
+
+
+def test_build_models_lays_out_missing_coordinates():
+    data = SHAPES['ladder'](40)
+    for n in data['nodes']:
+        del n['x'], n['y']
+    nodes, _ = build_models(data)
+    assert all(x is not None and y is not None for _, x, y in nodes)
+    assert_no_overlaps({m: (x, y) for m, x, y in nodes})
+
+
+def test_auto_layout_is_one_undo_step():
+    from standin import StandInApp
+    from DiagramIO import DiagramIo
+    from test_history import snapshot
+    app = StandInApp()
+    DiagramIo(app)._load_data(SHAPES['mixed'](60))
+    before = snapshot(app)
+    app.auto_layout()
+    after = snapshot(app)
+    assert after != before
+    # концы связей сидят на портах блоков на новых местах
+    for conn in app.diagram_state.connections_ui:
+        assert conn.points[0] == conn.src_ui.port_position(conn.sp)
+        assert conn.points[-1] == conn.dst_ui.port_position(conn.dp)
+    assert app.history.undo()
+    assert snapshot(app) == before
+    assert app.history.redo()
+    assert snapshot(app) == after
+
+
+def test_layout_benchmark_smoke():
+    import io
+    import run_benchmarks
+    results = run_benchmarks.run_all(['layout'], ['ladder'], [50], repeat=1,
+                                     memory=False, out=io.StringIO())
+    assert results['layout/ladder/50']['seconds'] > 0
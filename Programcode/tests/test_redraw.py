@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+from standin import StandInApp
+from ConnectionUI import ConnectionUI
+from NodeModel import NodeModel
+from NodeUI import NodeUI
+
+
+def make_pair(app):
+    a = NodeUI(app.canvas, NodeModel('a', 'BRANCH', 'x'), 100, 100, app)
+    b = NodeUI(app.canvas, NodeModel('b', 'ACTION'), 100, 300, app)
+    for ui in (a, b):
+        app.diagram_state.add_node(ui)
+    conn = ConnectionUI(app.canvas, a, a.model.port('out_true'), b, b.model.port('in'), app)
+    return a, b, conn
+
+
+def test_text_edit_updates_items_in_place():
+    app = StandInApp()
+    a, _, _ = make_pair(app)
+    items = list(a.items)
+    a.model.content = 'very long condition text here'
+    a.redraw()
+    assert a.items == items
+    assert app.canvas.items[a.text_id][1]['text'] == 'very long condition text here'
+    x0, _, x1, _ = a.bbox()
+    assert x1 - x0 == a.WIDTH + 2 * a.PORT_RADIUS > NodeUI.MIN_WIDTH
+    # ромб и порт out_true следуют за новой шириной
+    assert max(app.canvas.items[a.shape][0][0::2]) == a.x + a.WIDTH
+    px, _ = a.port_position(a.model.port('out_true'))
+    assert app.canvas.items[a.port_item[a.model.port('out_true')]][0][0] == px - a.PORT_RADIUS
+
+
+def test_selected_port_survives_dematerialize():
+    app = StandInApp()
+    a, _, _ = make_pair(app)
+    port = a.model.port('out_true')
+    app.diagram_state.selected = (a, port)
+    a.set_port_selected(port, True)
+    # узел ушёл из видимой области: подсветка без элементов не падает
+    a.dematerialize()
+    a.set_port_selected(port, True)
+    a.materialize()
+    assert app.canvas.items[a.port_item[port]][1]['fill'] == 'red'
+    assert app.canvas.items[a.port_item[a.model.port('in')]][1]['fill'] == 'black'
+    # удаление узла снимает выбор порта
+    app.diagram_state.remove_node(a)
+    assert app.diagram_state.selected is None
+
+
+def test_bends_change_only_their_handles():
+    app = StandInApp()
+    _, _, conn = make_pair(app)
+    line, hit, handles = conn.line_id, conn.hit_id, list(conn.handles)
+    n_items = len(app.canvas.items)
+
+    x0, y0 = conn.points[1]
+    conn.on_line_double_click(SimpleNamespace(x=x0 + 1, y=y0 - 20))
+    assert (conn.line_id, conn.hit_id) == (line, hit)
+    # маршрут стал ручным: ручки получили его сгибы и новая точка
+    assert len(conn.handles) == len(conn.points) - 2
+    assert len(app.canvas.items) == n_items + len(conn.handles) - len(handles)
+    assert set(handles) < set(conn.handles)
+    assert len(app.canvas.coords(line)) == 2 * len(conn.points)
+
+
+def test_handle_events_are_dispatched_by_tag():
+    app = StandInApp()
+    ConnectionUI.bind_canvas(app.canvas)
+    _, _, conn = make_pair(app)
+    for i, pt in enumerate([(300, 135), (300, 250), (170, 250)], 1):
+        conn.insert_bend(i, pt)
+    points = list(conn.points)
+    app.canvas.current = conn.handles[1]
+    app.canvas.bindings[('conn_handle', '<Button-3>')](SimpleNamespace(x=0, y=0))
+    assert conn.points == points[:2] + points[3:]
+    assert len(conn.handles) == len(conn.points) - 2
@@ -0,0 +1,106 @@
+import random
+
+import SpatialIndex as spatial
+from SpatialIndex import SpatialIndex
+
+
+def brute_query(boxes, x0, y0, x1, y1):
+    return {k for k, (a, b, c, d) in boxes.items() if a <= x1 and x0 <= c and b <= y1 and y0 <= d}
+
+
+def brute_distance(box, x, y):
+    a, b, c, d = box
+    dx = max(a - x, 0, x - c)
+    dy = max(b - y, 0, y - d)
+    return (dx * dx + dy * dy) ** 0.5
+
+
+def random_boxes(rnd, n):
+    boxes = {}
+    for k in range(n):
+        x, y = rnd.uniform(-500, 3000), rnd.uniform(-500, 3000)
+        boxes[k] = (x, y, x + rnd.uniform(0, 400), y + rnd.uniform(0, 120))
+    return boxes
+
+
+def test_query_matches_brute_force_after_updates():
+    rnd = random.Random(3)
+    boxes = random_boxes(rnd, 300)
+    index = SpatialIndex(cell=150)
+    for k, b in boxes.items():
+        index.insert(k, b)
+    # перемещаем и удаляем часть элементов
+    for k in range(0, 300, 3):
+        x, y = rnd.uniform(0, 2000), rnd.uniform(0, 2000)
+        boxes[k] = (x, y, x + 140, y + 70)
+        index.insert(k, boxes[k])
+    for k in range(1, 300, 7):
+        del boxes[k]
+        index.remove(k)
+    assert len(index) == len(boxes)
+    for _ in range(200):
+        x, y = rnd.uniform(-600, 3200), rnd.uniform(-600, 3200)
+        q = (x, y, x + rnd.uniform(0, 800), y + rnd.uniform(0, 800))
+        assert index.query(*q) == brute_query(boxes, *q)
+
+
+def test_nearest_matches_brute_force():
+    rnd = random.Random(5)
+    boxes = random_boxes(rnd, 200)
+    index = SpatialIndex(cell=100)
+    for k, b in boxes.items():
+        index.insert(k, b)
+    for _ in range(200):
+        x, y = rnd.uniform(-1000, 4000), rnd.uniform(-1000, 4000)
+        k = index.nearest(x, y)
+        best = min(brute_distance(b, x, y) for b in boxes.values())
+        assert brute_distance(boxes[k], x, y) == best
+
+
+def test_nearest_respects_max_dist_and_empty():
+    index = SpatialIndex()
+    assert index.nearest(0, 0) is None
+    index.insert('a', (100, 100, 110, 110))
+    assert index.nearest(0, 0, max_dist=50) is None
+    assert index.nearest(105, 105, max_dist=0) == 'a'
+
+
+def test_nearest_with_max_dist_stops_early(monkeypatch):
+    index = SpatialIndex(cell=100)
+    index.insert('near', (0, 0, 10, 10))
+    index.insert('far', (100000, 100000, 100010, 100010))
+    rings = []
+    ring = spatial._ring
+    monkeypatch.setattr(spatial, '_ring', lambda ci, cj, r: rings.append(r) or ring(ci, cj, r))
+    # ничего ближе 50 нет: дальше второго кольца искать незачем
+    assert index.nearest(500, 500, max_dist=50) is None
+    assert max(rings) <= 2
+
+def test_bounds_track_moves():
+    index = SpatialIndex()
+    assert index.bounds() is None
+    index.insert('a', (0, 0, 10, 10))
+    index.insert('b', (50, 50, 60, 60))
+    assert index.bounds() == (0, 0, 60, 60)
+    index.insert('b', (20, 20, 30, 30))
+    assert index.bounds() == (0, 0, 30, 30)
+    index.remove('a')
+    assert index.bounds() == (20, 20, 30, 30)
+
+
+def test_bounds_match_brute_force_under_random_moves():
+    rng = random.Random(7)
+    index, boxes = SpatialIndex(cell=50), {}
+    for step in range(400):
+        key = rng.randrange(30)
+        if rng.random() < 0.2:
+            index.remove(key)
+            boxes.pop(key, None)
+        else:
+            x, y = rng.randrange(-300, 300), rng.randrange(-300, 300)
+            boxes[key] = (x, y, x + rng.randrange(1, 80), y + rng.randrange(1, 80))
+            index.insert(key, boxes[key])
+        if boxes:
+            expected = (min(b[0] for b in boxes.values()), min(b[1] for b in boxes.values()),
+                        max(b[2] for b in boxes.values()), max(b[3] for b in boxes.values()))
+            assert index.bounds() == expected
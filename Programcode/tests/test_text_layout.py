@@ -0,0 +1,57 @@
+from TextLayout import TextLayout
+
+
+class CountingMeasurer:
+    """Шрифт фиксированной ширины 7 px, считающий обращения."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def measure(self, text):
+        self.calls += 1
+        return 7 * len(text)
+
+    def linespace(self):
+        return 15
+
+
+def test_size_is_cached():
+    measurer = CountingMeasurer()
+    layout = TextLayout(measurer)
+    assert layout.size('abc\nde') == (21, 30)
+    calls = measurer.calls
+    assert layout.size('abc\nde') == (21, 30)
+    assert measurer.calls == calls
+
+
+def test_lru_evicts_oldest():
+    layout = TextLayout(CountingMeasurer(), capacity=2)
+    layout.measure('a')
+    layout.measure('b')
+    layout.measure('a')
+    layout.measure('c')
+    assert list(layout.widths) == ['a', 'c']
+
+
+def test_measure_many_measures_each_string_once():
+    measurer = CountingMeasurer()
+    layout = TextLayout(measurer)
+    layout.measure('x')
+    layout.measure_many(['x', 'yy', 'yy', 'zzz'])
+    assert measurer.calls == 3
+    assert layout.widths['zzz'] == 21
+
+
+def test_wrap_breaks_on_words_and_keeps_text():
+    layout = TextLayout(CountingMeasurer())
+    text = 'for i in range(10)'
+    lines = layout.wrap(text, 70)          # не больше 10 символов
+    assert lines == ['for i in ', 'range(10)']
+    assert ''.join(lines) == text
+    assert all(layout.measure(l.rstrip()) <= 70 for l in lines)
+
+
+def test_wrap_cuts_long_words():
+    layout = TextLayout(CountingMeasurer())
+    lines = layout.wrap('a ' + 'x' * 25, 70)
+    assert lines == ['a ', 'x' * 10, 'x' * 10, 'x' * 5]